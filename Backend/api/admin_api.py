@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from services.model_endpoints import MODEL_ENDPOINTS
+from services.model_scheduler import MODEL_SCHEDULER
+from services.page_render import PAGE_RENDERS
+from services.profiling import PROFILE_TOKEN, list_profiles, profile_path
+from services.response_cache import RESPONSE_CACHE
+from services.result_cache import RESULT_CACHE
+from services.session_store import SESSION_STORE
+from services.single_flight import MODEL_CALLS
+from services.vision_cache import VISION_CACHE
+
+router = APIRouter()
+
+# Guards admin endpoints that expose session ids / filenames (empty disables them)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "").strip()
+
+
+def _check_admin_token(token: Optional[str]) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoint is not enabled (set ADMIN_TOKEN)")
+    if not token or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/cache")
+def cache_stats():
+    """
+    Hit/miss counters for the model response cache, the persistent vision cache,
+    the session-versioned endpoint result cache and the page render cache.
+    """
+    return {
+        "response_cache": RESPONSE_CACHE.stats() if RESPONSE_CACHE else {"enabled": False},
+        "vision_cache": VISION_CACHE.stats() if VISION_CACHE else {"enabled": False},
+        "result_cache": RESULT_CACHE.stats(),
+        "page_renders": PAGE_RENDERS.stats(),
+    }
+
+
+@router.get("/model-calls")
+def model_call_stats():
+    """
+    Upstream model call counters: coalescing (executed vs. joined an in-flight call)
+    scheduler state (active calls, queue depth, wait times, rejections) and
+    per-endpoint routing state (health, circuit breaker, outstanding, latency).
+    """
+    return {
+        "single_flight": MODEL_CALLS.stats(),
+        "scheduler": MODEL_SCHEDULER.stats(),
+        "endpoints": MODEL_ENDPOINTS.stats(),
+    }
+
+
+@router.get("/memory")
+def memory_usage(top: int = Query(10, ge=0, le=1000), x_admin_token: Optional[str] = Header(None)):
+    """
+    Approximate memory per session (documents, page text, indexes, summaries,
+    mode results, model contexts, result cache entries, page renders), the
+    `top` largest sessions and global totals. Page renders are shared by
+    content, so they count for every session holding that document; the
+    global cache totals count them once.
+
+    Session ids grant access to their documents, so this needs X-Admin-Token: <ADMIN_TOKEN>.
+    """
+    _check_admin_token(x_admin_token)
+    results = RESULT_CACHE.session_bytes()
+    renders = PAGE_RENDERS.digest_bytes()
+
+    def cache_bytes(session):
+        digests = {d.content_digest for d in session.documents.values() if d.content_digest}
+        return {
+            "result_cache": results.get(session.session_id, 0),
+            "page_renders": sum(renders.get(d, 0) for d in digests),
+        }
+
+    usage = SESSION_STORE.memory_usage(top_n=top, extra=cache_bytes)
+    usage["structures"]["result_cache"] = RESULT_CACHE.stats()["bytes"]
+    usage["structures"]["page_renders"] = PAGE_RENDERS.stats()["bytes"]
+    usage["bytes"] = sum(usage["structures"].values())
+    return usage
+
+
+def _check_profile_token(token: Optional[str]) -> None:
+    if not PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is not enabled (set PROFILE_TOKEN)")
+    if not token or not secrets.compare_digest(token, PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+
+@router.get("/profiles")
+def profiles(x_profile: Optional[str] = Header(None)):
+    """Stored request profiles, newest first (X-Profile: <PROFILE_TOKEN>)."""
+    _check_profile_token(x_profile)
+    return {"profiles": list_profiles()}
+
+
+@router.get("/profiles/{name}")
+def download_profile(name: str, x_profile: Optional[str] = Header(None)):
+    """One profile file: open .speedscope.json at speedscope.app, feed .collapsed.txt to flamegraph.pl."""
+    _check_profile_token(x_profile)
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "application/json" if name.endswith(".json") else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=name)
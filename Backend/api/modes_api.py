@@ -1,15 +1,30 @@
 from __future__ import annotations
 
-from typing import List, Optional
+import base64
+import json
+from typing import List, Optional, Set, Tuple
 
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from services.conversation import (
+    MODEL_KEEP_ALIVE,
+    conversation_anchor,
+    followup_context,
+    remember_context,
+)
 from services.doc_extract import DocumentExtractionError, extract_pages
-from services.vision_model import VisionModelError, ask_vision_model
-from services.session_store import SESSION_STORE
-from services.mode_execute import generate_mode_explanation
+from services.fast_json import FastJSONResponse, dumps
+from services.metrics import set_doc_type, stage
+from services.pdf_images import iter_pdf_images
+from services.result_cache import RESULT_CACHE, result_key
+from services.vision_batch import analyze_images
+from services.session_store import SESSION_STORE, DocumentData, PageData
+from services.summarizer import SUMMARY_MAX_ITEMS, summarize_pages
+from services.mode_precompute import get_mode_explanation, mode_explanation_for
 from services.llm_text import LLMTextError, ask_llm_text
-import fitz  # PyMuPDF for image extraction
+from services.model_scheduler import SchedulerBusyError
 
 router = APIRouter()
 
@@ -32,12 +47,14 @@ async def get_session_status(session_id: str):
         "session_exists": True,
         "session_id": session_id,
         "document_count": len(session.documents),
+        "memory": session.memory_usage(),
         "documents": [
             {
                 "doc_id": d.doc_id,
                 "filename": d.filename,
                 "doc_type": d.doc_type,
                 "page_count": len(d.pages),
+                "memory_bytes": d.memory_bytes(),
             }
             for d in session.documents.values()
         ],
@@ -48,6 +65,10 @@ async def get_session_status(session_id: str):
 async def process_mode(
     mode: str = Form(...),
     session_id: str = Form(...),
+    fields: Optional[str] = Form(None),
+    cursor: Optional[str] = Form(None),
+    page_limit: Optional[int] = Form(None),
+    stream: bool = Form(False),
 ):
     """
     API endpoint to process modes such as Student, Teacher, Exam, and Revision.
@@ -56,6 +77,15 @@ async def process_mode(
     - Extracts text from all pages
     - Detects and analyzes images/diagrams using Vision Tutor
     - Generates mode-specific explanations
+
+    Response shaping:
+    - fields: comma-separated subset of "explanation", "pages", "text"
+      (default: all; "pages" without "text" lists page indexes only)
+    - page_limit / cursor: at most `page_limit` pages per response; pass the
+      returned `next_cursor` to continue. A document's explanation is sent
+      with its first page only.
+    - stream: NDJSON, one line per document as soon as it is ready, then a
+      final {"done": true, "next_cursor": ...} line
     """
     if mode not in {"student", "teacher", "exam", "revision"}:
         raise HTTPException(status_code=400, detail="Unsupported mode")
@@ -63,6 +93,11 @@ async def process_mode(
     if not session_id or not session_id.strip():
         raise HTTPException(status_code=400, detail="Missing session_id")
 
+    if page_limit is not None and page_limit < 1:
+        raise HTTPException(status_code=400, detail="page_limit must be at least 1")
+
+    selected = _parse_fields(fields)
+
     # Get session documents
     session = SESSION_STORE.get(session_id)
     if not session or not session.documents:
@@ -71,66 +106,193 @@ async def process_mode(
             detail="No documents found in session. Please upload documents first.",
         )
 
-    results = []
-
-    for doc_id, doc_data in session.documents.items():
-        filename = doc_data.filename
-        doc_type = doc_data.doc_type
-        pages = doc_data.pages
+    start_doc, start_page = 0, 0
+    if cursor:
+        version, start_doc, start_page = _decode_cursor(cursor)
+        if version != session.version:
+            raise HTTPException(
+                status_code=409,
+                detail="Session documents changed since this cursor was issued. Restart from the first page.",
+            )
 
-        mode_result = []
-        all_text = []
+    # Snapshot: uploads during a stream do not shift the remaining documents
+    documents = list(session.documents.values())
+    set_doc_type(d.doc_type for d in documents)
+    plan, next_pos = _plan_pages(
+        documents, start_doc, start_page, page_limit if "pages" in selected else None
+    )
+    next_cursor = _encode_cursor(session.version, *next_pos) if next_pos else None
+
+    async def iter_results():
+        for doc_pos, first, end in plan:
+            doc_data = documents[doc_pos]
+            mode_explanation = None
+            if "explanation" in selected and first == 0:
+                # Precomputed after upload (falls back to computing + memoizing now)
+                mode_explanation = await run_in_threadpool(get_mode_explanation, doc_data, mode)
+            yield _mode_result(doc_data, mode_explanation, selected, first, end)
+
+    if stream:
+
+        async def ndjson():
+            async for result in iter_results():
+                yield dumps(result) + b"\n"
+            done = {"done": True, "mode": mode, "session_id": session_id, "next_cursor": next_cursor}
+            yield dumps(done) + b"\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    results = [result async for result in iter_results()]
+    # Returned as a response object: skips FastAPI's jsonable_encoder walk over every page
+    return FastJSONResponse(
+        {"mode": mode, "session_id": session_id, "results": results, "next_cursor": next_cursor}
+    )
 
-        # Process each page
-        for page in pages:
-            text_content = page.text
-            all_text.append(text_content)
 
-            mode_result.append(
-                {
-                    "page_index": page.index,
-                    "text": text_content,
-                }
-            )
+_PROCESS_FIELDS = ("explanation", "pages", "text")
 
-        # Generate mode-specific explanation for the entire document
-        combined_text = "\n\n".join(all_text)
-        mode_explanation = generate_mode_explanation(mode, combined_text, filename)
 
-        results.append(
-            {
-                "filename": filename,
-                "doc_type": doc_type,
-                "page_count": len(pages),
-                "pages": mode_result,
-                "mode_explanation": mode_explanation,
-            }
+def _parse_fields(fields: Optional[str]) -> Set[str]:
+    if not fields or not fields.strip():
+        return set(_PROCESS_FIELDS)
+    selected = {f.strip().lower() for f in fields.split(",") if f.strip()}
+    unknown = selected - set(_PROCESS_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(_PROCESS_FIELDS)}",
         )
+    if "text" in selected:
+        selected.add("pages")
+    return selected
+
 
-    return {"mode": mode, "session_id": session_id, "results": results}
+def _encode_cursor(version: int, doc_pos: int, page_pos: int) -> str:
+    raw = json.dumps([version, doc_pos, page_pos]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, int, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        version, doc_pos, page_pos = (int(v) for v in json.loads(raw))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if doc_pos < 0 or page_pos < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return version, doc_pos, page_pos
+
+
+def _plan_pages(
+    documents: List[DocumentData],
+    start_doc: int,
+    start_page: int,
+    page_limit: Optional[int],
+) -> Tuple[List[Tuple[int, int, int]], Optional[Tuple[int, int]]]:
+    """
+    (doc position, first page, end page) slices for one response, and the
+    (doc position, page) to continue from, or None when nothing is left.
+    """
+    plan: List[Tuple[int, int, int]] = []
+    budget = page_limit
+    for pos in range(start_doc, len(documents)):
+        page_count = len(documents[pos].pages)
+        first = min(start_page, page_count) if pos == start_doc else 0
+        if budget is None:
+            plan.append((pos, first, page_count))
+            continue
+        if budget <= 0:
+            return plan, (pos, first)
+        end = min(page_count, first + budget)
+        plan.append((pos, first, end))
+        budget -= end - first
+        if end < page_count:
+            return plan, (pos, end)
+    return plan, None
+
+
+def _mode_result(
+    doc: DocumentData,
+    mode_explanation: Optional[dict],
+    selected: Set[str],
+    first: int,
+    end: int,
+) -> dict:
+    result = {
+        "doc_id": doc.doc_id,
+        "filename": doc.filename,
+        "doc_type": doc.doc_type,
+        "page_count": len(doc.pages),
+    }
+    if "pages" in selected:
+        result["page_offset"] = first
+        if "text" in selected:
+            result["pages"] = [{"page_index": p.index, "text": p.text} for p in doc.pages[first:end]]
+        else:
+            result["pages"] = [{"page_index": p.index} for p in doc.pages[first:end]]
+    if mode_explanation is not None:
+        result["mode_explanation"] = mode_explanation
+    return result
 
 
 @router.post("/process-mode-with-vision")
 async def process_mode_with_vision(
     mode: str = Form(...),
     session_id: str = Form(...),
-    files: List[UploadFile] = File(...),
+    files: Optional[List[UploadFile]] = File(None),
+    doc_ids: Optional[List[str]] = Form(None),
 ):
     """
     Process mode with vision analysis for images and diagrams.
-    This endpoint receives the actual file content to extract images.
+
+    Exactly one of:
+      - doc_ids: documents already uploaded to the session (no re-upload / re-extraction);
+        any id not in the session is a 400
+      - files: raw files, extracted here (legacy path)
     """
     if mode not in {"student", "teacher", "exam", "revision"}:
         raise HTTPException(status_code=400, detail="Unsupported mode")
 
-    if not files:
-        raise HTTPException(status_code=400, detail="No files provided")
+    doc_ids = [d for d in (doc_ids or []) if d and d.strip()]
+    if not files and not doc_ids:
+        raise HTTPException(status_code=400, detail="No files or doc_ids provided")
+    if files and doc_ids:
+        raise HTTPException(status_code=400, detail="Send either files or doc_ids, not both")
 
     results = []
 
+    if doc_ids:
+        documents = SESSION_STORE.get_documents(session_id=session_id, doc_ids=doc_ids)
+        if not documents:
+            raise HTTPException(
+                status_code=400,
+                detail="Selected documents not found in this session. Upload documents first.",
+            )
+        found = {d.doc_id for d in documents}
+        missing = [d for d in doc_ids if d not in found]
+        if missing:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Documents not found in this session: {', '.join(missing)}",
+            )
+        set_doc_type(d.doc_type for d in documents)
+        for doc in documents:
+            results.append(
+                await _process_document_with_vision(
+                    mode=mode,
+                    filename=doc.filename,
+                    doc_type=doc.doc_type,
+                    pages=doc.pages,
+                    content=doc.content,
+                    doc=doc,
+                )
+            )
+        return FastJSONResponse({"mode": mode, "session_id": session_id, "results": results})
+
     for uploaded_file in files:
         filename = uploaded_file.filename
-        content = await uploaded_file.read()
+        with stage("upload_read"):
+            content = await uploaded_file.read()
 
         if not content:
             raise HTTPException(status_code=400, detail=f"File {filename} is empty")
@@ -140,100 +302,69 @@ async def process_mode_with_vision(
         except DocumentExtractionError as e:
             raise HTTPException(status_code=400, detail=str(e))
 
-        mode_result = []
-        all_text = []
-        vision_analyses = []
-
-        # Extract images from PDF for vision analysis
-        images_data = []
-        if doc_type == "pdf":
-            try:
-                images_data = extract_images_from_pdf(content)
-            except Exception as e:
-                print(f"Error extracting images: {e}")
-
-        # Process pages for the given mode
-        for page in pages:
-            text_content = page.text
-            all_text.append(text_content)
-
-            mode_result.append(
-                {
-                    "page_index": page.index,
-                    "text": text_content,
-                }
-            )
-
-        # Analyze images with Vision Tutor if any found
-        for img_data in images_data:
-            try:
-                vision_result = ask_vision_model(
-                    query=f"Analyze this diagram or image from the document. Explain what it shows and how it relates to the learning content in {mode} mode.",
-                    image_bytes=img_data["bytes"],
-                    context_text="\n".join(all_text[:3]),  # First few pages context
-                )
-                vision_analyses.append(
-                    {
-                        "page_index": img_data["page"],
-                        "analysis": vision_result["answer"],
-                    }
-                )
-            except VisionModelError as e:
-                vision_analyses.append(
-                    {
-                        "page_index": img_data["page"],
-                        "analysis": f"Vision analysis unavailable: {str(e)}",
-                    }
-                )
-
-        # Generate mode-specific explanation
-        combined_text = "\n\n".join(all_text)
-        mode_explanation = generate_mode_explanation(mode, combined_text, filename)
-
         results.append(
-            {
-                "filename": filename,
-                "doc_type": doc_type,
-                "page_count": len(pages),
-                "pages": mode_result,
-                "mode_explanation": mode_explanation,
-                "vision_analyses": vision_analyses,
-                "has_images": len(images_data) > 0,
-            }
+            await _process_document_with_vision(
+                mode=mode,
+                filename=filename,
+                doc_type=doc_type,
+                pages=pages,
+                content=content,
+            )
         )
 
-    return {"mode": mode, "session_id": session_id, "results": results}
+    return FastJSONResponse({"mode": mode, "session_id": session_id, "results": results})
 
 
-def extract_images_from_pdf(pdf_content: bytes) -> List[dict]:
-    """Extract images from PDF using PyMuPDF"""
-    images = []
-    try:
-        pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
+async def _process_document_with_vision(
+    *,
+    mode: str,
+    filename: str,
+    doc_type: str,
+    pages: List[PageData],
+    content: Optional[bytes],
+    doc: Optional[DocumentData] = None,
+) -> dict:
+    mode_result = []
 
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
-            image_list = page.get_images(full=True)
+    # Distinct PDF images, largest first (lazy: analysis starts while extracting)
+    images_data = iter_pdf_images(content) if doc_type == "pdf" and content else []
 
-            for img_index, img in enumerate(image_list):
-                xref = img[0]
-                base_image = pdf_document.extract_image(xref)
-                image_bytes = base_image["image"]
+    # Process pages for the given mode
+    for page in pages:
+        mode_result.append(
+            {
+                "page_index": page.index,
+                "text": page.text,
+            }
+        )
 
-                # Only include reasonably sized images (filter out small icons)
-                if len(image_bytes) > 5000:  # At least 5KB
-                    images.append(
-                        {
-                            "page": page_num,
-                            "bytes": image_bytes,
-                        }
-                    )
+    # Analyze images with Vision Tutor if any found (bounded concurrency + deadline)
+    batch = await run_in_threadpool(
+        analyze_images,
+        images_data,
+        mode=mode,
+        pages=pages,  # per-image context is packed from the image's own page(s)
+    )
+    vision_analyses = batch.analyses
 
-        pdf_document.close()
-    except Exception as e:
-        print(f"Error in image extraction: {e}")
+    # Mode-specific explanation (stored / memoized by content hash)
+    if doc is not None:
+        mode_explanation = await run_in_threadpool(get_mode_explanation, doc, mode)
+    else:
+        mode_explanation = await run_in_threadpool(mode_explanation_for, pages, filename, mode)
 
-    return images
+    return {
+        "filename": filename,
+        "doc_type": doc_type,
+        "page_count": len(pages),
+        "pages": mode_result,
+        "mode_explanation": mode_explanation,
+        "vision_analyses": vision_analyses,
+        "has_images": batch.image_count > 0,
+        "vision_complete": batch.complete,
+        "vision_skipped": batch.skipped,
+        "vision_cache_hits": batch.cache_hits,
+    }
 
 
 @router.post("/ask")
@@ -242,13 +373,15 @@ async def ask_mode_question(
     question: str = Form(...),
     doc_id: Optional[str] = Form(None),
     mode: Optional[str] = Form(None),
+    conversation: bool = Form(False),
 ):
     """
     Lightweight QA over already-processed documents (no external LLM).
 
     - Looks up session documents
-    - Finds best matching page text by keyword overlap
-    - Returns a snippet and metadata
+    - Finds best matching passages (sliding windows over pages) by idf-weighted term overlap
+    - Returns passage snippets with highlight spans and metadata
+    - conversation=true: LLM fallback follow-ups continue the session's model context
     """
     if not session_id or not session_id.strip():
         raise HTTPException(status_code=400, detail="Missing session_id")
@@ -263,6 +396,15 @@ async def ask_mode_question(
             detail="No documents found in session. Upload and process first.",
         )
 
+    # Same question on unchanged documents -> cached result (conversation turns are stateful)
+    cache_key = result_key(
+        session_id, session.version, "ask", question=question, doc_id=doc_id, mode=mode
+    )
+    if not conversation:
+        cached = RESULT_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
     # choose documents to search
     documents = (
         [session.documents[doc_id]]
@@ -270,45 +412,61 @@ async def ask_mode_question(
         else list(session.documents.values())
     )
 
-    q_words = _tokenize(question)
+    set_doc_type(d.doc_type for d in documents)
     hits = []
 
-    for doc in documents:
-        for page in doc.pages:
-            text = page.text or ""
-            score = _overlap_score(q_words, _tokenize(text))
-            if score == 0:
-                continue
-            snippet = text[:800] + ("..." if len(text) > 800 else "")
-            hits.append(
-                {
-                    "doc_id": doc.doc_id,
-                    "filename": doc.filename,
-                    "doc_type": doc.doc_type,
-                    "page_index": page.index,
-                    "score": score,
-                    "snippet": snippet,
-                }
-            )
+    # Best overlapping passage per page from each document's ingest-time index
+    with stage("retrieval"):
+        for doc in documents:
+            for hit in doc.get_passage_index().search(question, top_k=3):
+                hits.append(
+                    {
+                        "doc_id": doc.doc_id,
+                        "filename": doc.filename,
+                        "doc_type": doc.doc_type,
+                        "page_index": hit.page_index,
+                        "score": hit.score,
+                        "snippet": hit.text,
+                        "start": hit.start,
+                        "end": hit.end,
+                        "highlights": hit.highlights,
+                    }
+                )
 
     if not hits:
         # No matching passage found in uploaded documents -> treat as unrelated
         # Fallback to LLM to answer concisely with bullet points
+        anchor = conversation_anchor("llm-fallback")
+        previous_context = followup_context(session_id, "ask", anchor) if conversation else None
         try:
-            llm = ask_llm_text(
+            llm = await run_in_threadpool(
+                ask_llm_text,
                 query=question.strip(),
                 system_hint=(
                     "You are a helpful tutor. Respond in short, clear bullet points only."
                 ),
+                conversation_context=previous_context,
+                keep_alive=MODEL_KEEP_ALIVE if conversation else None,
             )
+            if conversation:
+                remember_context(
+                    session_id, "ask", anchor, llm.get("raw"), followup=bool(previous_context)
+                )
             bullets = _to_bullets(llm.get("answer", ""), max_items=4)
-            return {
+            result = {
                 "session_id": session_id,
                 "mode": mode,
                 "answer": bullets,
                 "hits": [],
                 "source": "llm-fallback",
             }
+            if not conversation:
+                RESULT_CACHE.put(cache_key, result)
+            return result
+        except SchedulerBusyError as e:
+            raise HTTPException(
+                status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+            ) from e
         except LLMTextError as e:
             return {
                 "session_id": session_id,
@@ -324,7 +482,7 @@ async def ask_mode_question(
 
     answers = []
     for h in top_hits:
-        bullets = _to_bullets(h["snippet"], max_items=2)
+        bullets = _to_bullets(_focus_text(h["snippet"], h["highlights"]), max_items=2)
         answers.append(
             {
                 "page_index": h["page_index"],
@@ -333,12 +491,14 @@ async def ask_mode_question(
             }
         )
 
-    return {
+    result = {
         "session_id": session_id,
         "mode": mode,
         "answer": answers,
         "hits": top_hits,
     }
+    RESULT_CACHE.put(cache_key, result)
+    return result
 
 
 @router.post("/summarize")
@@ -351,6 +511,7 @@ async def summarize_documents(
     Summarize uploaded documents into short, easy bullet points.
 
     - Uses only extracted text stored in the session
+    - Picks the most central, non-redundant sentences (local extractive summary)
     - Returns bullets per document (no paragraphs)
     """
     if not session_id or not session_id.strip():
@@ -363,16 +524,32 @@ async def summarize_documents(
             detail="No documents found in session. Please upload documents first.",
         )
 
+    cache_key = result_key(
+        session_id, session.version, "summarize", doc_id=doc_id, max_items=max_items
+    )
+    cached = RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
     documents = (
         [session.documents[doc_id]]
         if doc_id and doc_id in session.documents
         else list(session.documents.values())
     )
 
+    set_doc_type(d.doc_type for d in documents)
     summaries = []
     for doc in documents:
-        all_text = "\n\n".join([p.text or "" for p in doc.pages])
-        bullets = _to_bullets(all_text, max_items=max_items)
+        # Extractive summary (TextRank + MMR), computed once per document; longer
+        # summaries than the stored SUMMARY_MAX_ITEMS are built for this request
+        if max_items > SUMMARY_MAX_ITEMS:
+            summary = await run_in_threadpool(summarize_pages, doc.pages, max_items)
+        else:
+            summary = await run_in_threadpool(doc.get_summary)
+        bullets = [f"• {s}" for s in summary.top(max_items)]
+        if not bullets:
+            all_text = "\n\n".join([p.text or "" for p in doc.pages])
+            bullets = _to_bullets(all_text, max_items=max_items)
         summaries.append(
             {
                 "doc_id": doc.doc_id,
@@ -382,18 +559,18 @@ async def summarize_documents(
             }
         )
 
-    return {"session_id": session_id, "summaries": summaries}
-
-
-def _tokenize(text: str) -> List[str]:
-    return [t for t in (text or "").lower().split() if t]
+    result = {"session_id": session_id, "summaries": summaries}
+    RESULT_CACHE.put(cache_key, result)
+    return result
 
 
-def _overlap_score(q_tokens: List[str], doc_tokens: List[str]) -> int:
-    if not q_tokens or not doc_tokens:
-        return 0
-    doc_set = set(doc_tokens)
-    return sum(1 for t in q_tokens if t in doc_set)
+def _focus_text(snippet: str, highlights: List[Tuple[int, int]]) -> str:
+    """Start the snippet at the sentence holding the first highlighted term."""
+    if not highlights:
+        return snippet
+    first = highlights[0][0]
+    cut = max(snippet.rfind(". ", 0, first), snippet.rfind("? ", 0, first), snippet.rfind("! ", 0, first))
+    return snippet[cut + 2 :] if cut >= 0 else snippet
 
 
 def _to_bullets(text: str, max_items: int = 2) -> List[str]:
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import secrets
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Body, Header, HTTPException
+
+from services.session_store import SESSION_STORE
+from services.shard_router import SHARD_TOKEN
+
+router = APIRouter()
+
+
+def _check_token(token: Optional[str]) -> None:
+    # Without a SHARD_TOKEN this process is not part of a sharded deployment
+    if not SHARD_TOKEN:
+        raise HTTPException(status_code=404, detail="Sharding is not enabled")
+    if not token or not secrets.compare_digest(token, SHARD_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid shard token")
+
+
+@router.get("/sessions")
+def list_sessions(x_shard_token: Optional[str] = Header(None)):
+    """
+    Session ids held by this shard with their versions (the router diffs them
+    against the new ring and keeps the newest copy of a session found twice).
+    """
+    _check_token(x_shard_token)
+    versions = SESSION_STORE.session_versions()
+    return {"session_ids": list(versions), "versions": versions}
+
+
+@router.get("/sessions/{session_id}")
+def export_session(session_id: str, x_shard_token: Optional[str] = Header(None)):
+    """Full session snapshot for a handoff to another shard."""
+    _check_token(x_shard_token)
+    data = SESSION_STORE.export_session(session_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return data
+
+
+@router.put("/sessions/{session_id}")
+def import_session(
+    session_id: str,
+    data: Dict[str, Any] = Body(...),
+    x_shard_token: Optional[str] = Header(None),
+):
+    """Install a session handed off by another shard."""
+    _check_token(x_shard_token)
+    if data.get("session_id") != session_id:
+        raise HTTPException(status_code=400, detail="session_id does not match the snapshot")
+    try:
+        session = SESSION_STORE.import_session(data)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid session snapshot: {e}") from e
+    return {"session_id": session_id, "documents": len(session.documents), "version": session.version}
+
+
+@router.delete("/sessions/{session_id}")
+def drop_session(session_id: str, x_shard_token: Optional[str] = Header(None)):
+    """Forget a session after it was handed off."""
+    _check_token(x_shard_token)
+    deleted = SESSION_STORE.delete(session_id)
+    return {"session_id": session_id, "deleted": deleted}
@@ -1,12 +1,48 @@
 from __future__ import annotations
 
-from typing import List
-
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
-
-from services.context_selector import match_pages_by_screenshot
-from services.doc_extract import DocumentExtractionError, extract_pages
+import json
+from typing import List, Optional
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Query,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+
+from services.context_selector import (
+    MatchedPage,
+    match_pages_by_ocr_text,
+    match_pages_by_screenshot,
+    match_referenced_page,
+    ocr_image_to_text,
+)
+from services.conversation import (
+    MODEL_KEEP_ALIVE,
+    conversation_anchor,
+    followup_context,
+    remember_context,
+)
+from services.doc_extract import DocumentExtractionError, doc_type_for_filename, extract_pages
+from services.metrics import set_doc_type, stage
+from services.mode_precompute import precompute_mode_explanations
+from services.model_scheduler import SchedulerBusyError
+from services.page_render import (
+    RENDER_FORMATS,
+    PageRenderError,
+    page_render_key,
+    render_document_page,
+)
 from services.session_store import SESSION_STORE
+from services.vision_follow import VISION_FOLLOW_MAX_FRAME_BYTES, FollowState
 from services.vision_model import VisionModelError, ask_vision_model
 
 router = APIRouter()
@@ -23,6 +59,7 @@ def vision_test():
 @router.post("/session/{session_id}/documents")
 async def upload_documents(
     session_id: str,
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(
         ..., description="Upload one or more PDF/PPTX/DOCX files"
     ),
@@ -33,6 +70,7 @@ async def upload_documents(
     - Extract text per page (PDF) / slide (PPTX) / chunk (DOCX)
     - Store temporarily in SESSION_STORE for that session
     - Return doc metadata for UI selection
+    - After responding: precompute all learning-mode explanations per document
     """
     if not session_id or not session_id.strip():
         raise HTTPException(status_code=400, detail="Missing session_id")
@@ -41,10 +79,12 @@ async def upload_documents(
         raise HTTPException(status_code=400, detail="No files uploaded")
 
     uploaded_docs = []
+    set_doc_type(doc_type_for_filename(f.filename or "") for f in files)
 
     for f in files:
         filename = f.filename or "uploaded"
-        content = await f.read()
+        with stage("upload_read"):
+            content = await f.read()
 
         if not content:
             raise HTTPException(status_code=400, detail=f"Empty file: {filename}")
@@ -57,13 +97,15 @@ async def upload_documents(
         # MVP doc_id (stable per session). If you want true uniqueness later, swap to uuid.
         doc_id = f"{session_id}:{filename}"
 
-        SESSION_STORE.upsert_document(
+        doc = SESSION_STORE.upsert_document(
             session_id=session_id,
             doc_id=doc_id,
             filename=filename,
             doc_type=doc_type,
             pages=pages,
+            content=content,
         )
+        background_tasks.add_task(precompute_mode_explanations, doc)
 
         uploaded_docs.append(
             {
@@ -100,18 +142,68 @@ def list_documents(session_id: str):
     }
 
 
+# Width of the page image sent to the vision model for (doc_id, page_index) questions
+VISION_PAGE_RENDER_WIDTH = 1280
+
+
+@router.get("/session/{session_id}/render")
+async def render_page(
+    session_id: str,
+    doc_id: str = Query(..., description="Document to render (PDF)"),
+    page_index: int = Query(..., ge=0),
+    width: Optional[int] = Query(None, description="Target width in pixels"),
+    fmt: str = Query("webp", alias="format", description=f"One of: {', '.join(RENDER_FORMATS)}"),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Render one page of an uploaded PDF to an image (server-side, cached).
+
+    - Responses carry a strong ETag; a matching If-None-Match returns 304
+    - Renders are cached in memory and on disk, keyed by file content
+    """
+    if not session_id or not session_id.strip():
+        raise HTTPException(status_code=400, detail="Missing session_id")
+
+    docs = SESSION_STORE.get_documents(session_id=session_id, doc_ids=[doc_id])
+    if not docs:
+        raise HTTPException(status_code=404, detail="Document not found in this session")
+    doc = docs[0]
+    if page_index >= len(doc.pages):
+        raise HTTPException(status_code=404, detail=f"Page {page_index} not found in {doc.filename}")
+
+    try:
+        # Content-addressed key: revalidation needs neither a render nor a cache lookup
+        etag = f'"{page_render_key(doc, page_index, width, fmt)}"'
+        headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+        if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        rendered = await run_in_threadpool(render_document_page, doc, page_index, width, fmt)
+    except PageRenderError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    return Response(content=rendered.data, media_type=rendered.media_type, headers=headers)
+
+
 @router.post("/session/{session_id}/ask")
 async def vision_ask(
     session_id: str,
     query: str = Form(...),
     selected_doc_ids: List[str] = Form(..., description="At least one selected doc_id"),
-    image: UploadFile = File(..., description="Screenshot image"),
+    image: Optional[UploadFile] = File(None, description="Screenshot image"),
+    doc_id: Optional[str] = Form(None, description="Page reference instead of a screenshot"),
+    page_index: Optional[int] = Form(None, description="Page reference instead of a screenshot"),
+    conversation: bool = Form(False, description="Continue the session's model context"),
 ):
     """
     Vision Tutor ask endpoint (multipart):
-      - Requires: query + screenshot + selected_doc_ids (>=1)
-      - OCR screenshot to locate best matching page text from selected documents
-      - Calls unified vision model with screenshot + query + matched text context
+      - Requires: query + selected_doc_ids (>=1) + either a screenshot or a
+        (doc_id, page_index) page reference
+      - Screenshot: OCR it to locate best matching page text from selected documents
+      - Page reference (PDF): the page is rendered server-side and its own text
+        is the context, so no screenshot upload or OCR is needed
+      - Calls unified vision model with page image + query + matched text context
+      - conversation=true: follow-ups on the same matched pages continue the
+        model's previous context instead of re-sending system + reference text
     """
     if not session_id or not session_id.strip():
         raise HTTPException(status_code=400, detail="Missing session_id")
@@ -131,53 +223,289 @@ async def vision_ask(
             status_code=400,
             detail="Selected documents not found in this session. Upload documents first.",
         )
+    set_doc_type(d.doc_type for d in selected_docs)
 
-    image_bytes = await image.read()
-    if not image_bytes:
-        raise HTTPException(status_code=400, detail="Empty screenshot image")
-
-    # Build best page context using OCR + overlap scoring (text-only context)
     context_text = None
+    context_tokens = 0
     matched_pages = []
-    try:
-        ctx, matches = match_pages_by_screenshot(
-            image_bytes=image_bytes,
-            selected_docs=selected_docs,
-            top_k=4,
-        )
-        context_text = ctx if ctx.strip() else None
-        matched_pages = matches
-    except Exception:
-        # OCR not available / failed -> still answer via vision model without extra context
-        context_text = None
-        matched_pages = []
+
+    if image is None:
+        if not doc_id or page_index is None:
+            raise HTTPException(
+                status_code=400, detail="Send a screenshot or a doc_id + page_index reference"
+            )
+        if doc_id not in selected_doc_ids:
+            raise HTTPException(status_code=400, detail="Referenced document is not among the selected documents")
+        doc = next((d for d in selected_docs if d.doc_id == doc_id), None)
+        if doc is None:
+            raise HTTPException(status_code=400, detail="Referenced document not found in this session")
+        if page_index < 0 or page_index >= len(doc.pages):
+            raise HTTPException(status_code=400, detail=f"Page {page_index} not found in {doc.filename}")
+        try:
+            rendered = await run_in_threadpool(
+                render_document_page, doc, page_index, VISION_PAGE_RENDER_WIDTH, "png"
+            )
+        except PageRenderError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        image_bytes = rendered.data
+
+        # The page is known: its own text is the context (no OCR / page scoring)
+        packed, matched_pages = match_referenced_page(doc=doc, page_index=page_index, query=query)
+        context_text = packed.text if packed.text.strip() else None
+        context_tokens = packed.tokens_used if context_text else 0
+    else:
+        with stage("upload_read"):
+            image_bytes = await image.read()
+        if not image_bytes:
+            raise HTTPException(status_code=400, detail="Empty screenshot image")
+
+        # Build best page context using OCR + overlap scoring (text-only, token-budgeted)
+        try:
+            packed, matches = match_pages_by_screenshot(
+                image_bytes=image_bytes,
+                selected_docs=selected_docs,
+                top_k=4,
+                query=query,
+            )
+            context_text = packed.text if packed.text.strip() else None
+            context_tokens = packed.tokens_used if context_text else 0
+            matched_pages = matches
+        except Exception:
+            # OCR not available / failed -> still answer via vision model without extra context
+            context_text = None
+            matched_pages = []
+
+    return await _answer_vision_query(
+        session_id=session_id,
+        query=query,
+        selected_doc_ids=selected_doc_ids,
+        image_bytes=image_bytes,
+        context_text=context_text,
+        context_tokens=context_tokens,
+        matched_pages=matched_pages,
+        conversation=conversation,
+    )
+
+
+async def _answer_vision_query(
+    *,
+    session_id: str,
+    query: str,
+    selected_doc_ids: List[str],
+    image_bytes: bytes,
+    context_text: Optional[str],
+    context_tokens: int,
+    matched_pages: List[MatchedPage],
+    conversation: bool,
+) -> dict:
+    """Model call + conversation bookkeeping + response shape shared by the HTTP ask and follow mode."""
+    # Same selected docs + matched pages -> same anchor -> the follow-up reuses the model context
+    anchor = conversation_anchor(
+        *selected_doc_ids, *[f"{m.doc_id}#{m.page_index}" for m in matched_pages]
+    )
+    previous_context = (
+        followup_context(session_id, "vision", anchor) if conversation else None
+    )
 
     try:
-        model_result = ask_vision_model(
+        model_result = await run_in_threadpool(
+            ask_vision_model,
             query=query,
             image_bytes=image_bytes,
-            context_text=context_text,
+            context_text=None if previous_context else context_text,
+            conversation_context=previous_context,
+            keep_alive=MODEL_KEEP_ALIVE if conversation else None,
         )
+    except SchedulerBusyError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+        ) from e
     except VisionModelError as e:
         raise HTTPException(status_code=502, detail=str(e)) from e
 
+    turns = 0
+    if conversation:
+        turns = remember_context(
+            session_id, "vision", anchor, model_result["raw"], followup=bool(previous_context)
+        )
+
     return {
         "session_id": session_id,
         "query": query,
         "selected_doc_ids": selected_doc_ids,
         "answer": model_result["answer"],
-        "matched_pages": [
-            {
-                "doc_id": m.doc_id,
-                "filename": m.filename,
-                "page_index": m.page_index,
-                "score": m.score,
-            }
-            for m in matched_pages
-        ],
+        "context_tokens": 0 if previous_context else context_tokens,
+        "conversation": {"followup": bool(previous_context), "turns": turns},
+        "matched_pages": _matched_pages_payload(matched_pages),
     }
 
 
+def _matched_pages_payload(matched_pages: List[MatchedPage]) -> List[dict]:
+    return [
+        {
+            "doc_id": m.doc_id,
+            "filename": m.filename,
+            "page_index": m.page_index,
+            "score": m.score,
+            "snippet": m.snippet,
+            "highlights": m.highlights,
+        }
+        for m in matched_pages
+    ]
+
+
+@router.websocket("/session/{session_id}/follow")
+async def vision_follow(websocket: WebSocket, session_id: str):
+    """
+    "Follow my screen" mode over one WebSocket.
+
+    Client -> server:
+      - {"type": "select", "doc_ids": [...]}      documents to match against
+      - binary message                             a frame (PNG/JPEG) of the current view
+      - {"type": "ask", "query": "...", "conversation": bool}
+
+    Server -> client:
+      - {"type": "frame", "changed": bool, "diff": float}   after every frame
+      - {"type": "view", "matched_pages": [...]}            when a changed view was re-matched
+      - {"type": "answer", ...}                             same body as POST /ask
+      - {"type": "error", "detail": "..."}
+
+    OCR + page matching only run when a frame differs materially from the view
+    that was last matched (and at most once per VISION_FOLLOW_MIN_MATCH_INTERVAL);
+    questions reuse that OCR text, so scrolling costs no uploads or OCR per ask.
+    """
+    await websocket.accept()
+    state = FollowState(session_id=session_id)
+
+    async def send_error(detail: str) -> None:
+        await websocket.send_json({"type": "error", "detail": detail})
+
+    async def refresh_match(session_version: int) -> None:
+        docs = SESSION_STORE.get_documents(session_id=session_id, doc_ids=state.selected_doc_ids)
+        try:
+            ocr_text = await run_in_threadpool(ocr_image_to_text, state.frame)
+            _, matches = await run_in_threadpool(
+                match_pages_by_ocr_text, ocr_text=ocr_text, selected_docs=docs, top_k=4
+            )
+        except Exception:
+            # OCR not available / failed -> answers still go to the vision model without context
+            ocr_text, matches = "", []
+        state.remember_match(ocr_text, matches, session_version)
+        await websocket.send_json(
+            {"type": "view", "matched_pages": _matched_pages_payload(matches)}
+        )
+
+    def session_version() -> int:
+        session = SESSION_STORE.get(session_id)
+        return session.version if session is not None else -1
+
+    async def handle(message) -> None:
+        frame = message.get("bytes")
+        if frame is not None:
+            if not frame or len(frame) > VISION_FOLLOW_MAX_FRAME_BYTES:
+                await send_error(f"Frame must be 1..{VISION_FOLLOW_MAX_FRAME_BYTES} bytes")
+                return
+            try:
+                diff = await run_in_threadpool(state.observe, frame)
+            except Exception:
+                await send_error("Frame is not a readable image")
+                return
+            version = session_version()
+            changed = state.needs_match(version, diff)
+            await websocket.send_json({"type": "frame", "changed": changed, "diff": round(diff, 4)})
+            if changed and state.selected_doc_ids and state.match_due():
+                await refresh_match(version)
+            return
+
+        try:
+            payload = json.loads(message.get("text") or "")
+        except ValueError:
+            await send_error("Expected a JSON message or a binary frame")
+            return
+        if not isinstance(payload, dict):
+            await send_error("Expected a JSON object")
+            return
+        kind = payload.get("type")
+
+        if kind == "select":
+            doc_ids = [d for d in payload.get("doc_ids") or [] if isinstance(d, str) and d.strip()]
+            docs = SESSION_STORE.get_documents(session_id=session_id, doc_ids=doc_ids)
+            if not docs:
+                await send_error("Selected documents not found in this session. Upload documents first.")
+                return
+            set_doc_type(d.doc_type for d in docs)
+            if doc_ids != state.selected_doc_ids:
+                state.selected_doc_ids = doc_ids
+                state.ocr_text = None  # matches were against other documents
+            await websocket.send_json({"type": "selected", "doc_ids": doc_ids})
+            return
+
+        if kind != "ask":
+            await send_error(f"Unknown message type: {kind}")
+            return
+
+        query = str(payload.get("query") or "").strip()
+        if not query:
+            await send_error("Missing query")
+            return
+        if not state.selected_doc_ids:
+            await send_error("Select at least one document")
+            return
+        if state.frame is None:
+            await send_error("Send a frame of the current view before asking")
+            return
+
+        # Lazily catch up on a view change that was throttled (or new uploads)
+        version = session_version()
+        if state.needs_match(version):
+            await refresh_match(version)
+
+        docs = SESSION_STORE.get_documents(session_id=session_id, doc_ids=state.selected_doc_ids)
+        context_text, context_tokens, matched_pages = None, 0, []
+        if state.ocr_text:
+            packed, matched_pages = await run_in_threadpool(
+                match_pages_by_ocr_text,
+                ocr_text=state.ocr_text,
+                selected_docs=docs,
+                top_k=4,
+                query=query,
+            )
+            context_text = packed.text if packed.text.strip() else None
+            context_tokens = packed.tokens_used if context_text else 0
+
+        state.questions += 1
+        # HTTPException (busy / model errors) becomes an error frame in the receive loop
+        result = await _answer_vision_query(
+            session_id=session_id,
+            query=query,
+            selected_doc_ids=state.selected_doc_ids,
+            image_bytes=state.frame,
+            context_text=context_text,
+            context_tokens=context_tokens,
+            matched_pages=matched_pages,
+            conversation=bool(payload.get("conversation")),
+        )
+        await websocket.send_json({"type": "answer", **result})
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                await handle(message)
+            except WebSocketDisconnect:
+                raise
+            except HTTPException as e:
+                await send_error(str(e.detail))
+            except Exception as e:
+                # One failed OCR / match / model call is reported; the socket stays open
+                print(f"Follow mode message failed ({session_id}): {type(e).__name__}: {e}")
+                await send_error(f"Request failed: {e}")
+    except WebSocketDisconnect:
+        pass
+
+
 @router.delete("/session/{session_id}")
 def delete_session(session_id: str):
     """
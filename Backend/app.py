@@ -2,11 +2,18 @@ from __future__ import annotations
 
 import os
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import find_dotenv, load_dotenv
 
 from api.vision_tutor import router as vision_router
 from api.modes_api import router as modes_router
+from api.admin_api import router as admin_router
+from api.shard_api import router as shard_router
+from services.fast_json import FastJSONResponse
+from services.http_compression import COMPRESSION_ENABLED, CompressionMiddleware
+from services.metrics import METRICS_ENABLED, STAGE_METRICS, StageMetricsMiddleware
+from services.profiling import PROFILING_ENABLED, ProfilingMiddleware
 
 
 def create_app() -> FastAPI:
@@ -17,6 +24,7 @@ def create_app() -> FastAPI:
         title="InsightHub-AI Backend",
         version="0.1.0",
         description="FastAPI backend for InsightHub-AI (starting with Vision Tutor).",
+        default_response_class=FastJSONResponse,
     )
 
     # CORS (dev-friendly; tighten later)
@@ -31,6 +39,18 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # brotli/gzip for large text payloads (negotiated; small bodies pass through)
+    if COMPRESSION_ENABLED:
+        app.add_middleware(CompressionMiddleware)
+
+    # Opt-in request profiling (PROFILE_TOKEN header / 1-in-N sampling)
+    if PROFILING_ENABLED:
+        app.add_middleware(ProfilingMiddleware)
+
+    # Per-stage latency histograms (outermost, so "request" includes compression)
+    if METRICS_ENABLED:
+        app.add_middleware(StageMetricsMiddleware)
+
     @app.get("/")
     def root():
         return {"message": "InsightHub-AI backend is running"}
@@ -39,12 +59,25 @@ def create_app() -> FastAPI:
     def health():
         return {"status": "ok"}
 
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        """Stage latency histograms in Prometheus text format (scrape target)."""
+        return PlainTextResponse(
+            STAGE_METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
     # Vision Tutor
     app.include_router(vision_router, prefix="/vision", tags=["vision-tutor"])
 
     # Learning Modes
     app.include_router(modes_router, prefix="/modes", tags=["learning-modes"])
 
+    # Operational introspection (caches, ...)
+    app.include_router(admin_router, prefix="/admin", tags=["admin"])
+
+    # Session handoff between shards (only with SHARD_TOKEN; see router_app.py)
+    app.include_router(shard_router, prefix="/shard", tags=["sharding"])
+
     return app
 
 
@@ -0,0 +1,93 @@
+"""
+Benchmark: vision payload size and end-to-end latency with / without the image budget.
+
+Usage (from Backend/):
+    python -m benchmarks.bench_image_budget --runs 5 --bandwidth 12500000
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import random
+import statistics
+import time
+
+from PIL import Image, ImageDraw
+
+from benchmarks.mock_ollama import MockOllamaServer
+
+
+def _synthetic_screenshot(width: int, height: int, seed: int = 7) -> bytes:
+    """A page-like PNG: white background, dark text-ish strokes and a noisy 'diagram'."""
+    rng = random.Random(seed)
+    img = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    for y in range(40, height // 2, 28):
+        x = 40
+        while x < width - 80:
+            w = rng.randint(20, 90)
+            draw.rectangle([x, y, x + w, y + 12], fill=(30, 30, 30))
+            x += w + rng.randint(8, 16)
+    box = (width // 8, height // 2 + 40, width - width // 8, height - 40)
+    noise = Image.effect_noise((box[2] - box[0], box[3] - box[1]), 64).convert("RGB")
+    img.paste(noise, box[:2])
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+
+def _run(label: str, image_bytes: bytes, server: MockOllamaServer, runs: int) -> None:
+    from services import image_budget
+    from services.vision_model import ask_vision_model
+
+    latencies = []
+    server.reset_counters()
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        ask_vision_model(query="Explain this page.", image_bytes=image_bytes)
+        latencies.append(time.perf_counter() - t0)
+
+    payload = server.received_bytes / max(server.request_count, 1)
+    budget = "on " if image_budget.IMAGE_BUDGET.enabled else "off"
+    print(
+        f"{label:<22} budget={budget} input={len(image_bytes) / 1024:9.1f} KiB "
+        f"payload={payload / 1024:9.1f} KiB "
+        f"p50={statistics.median(latencies) * 1000:8.1f} ms "
+        f"max={max(latencies) * 1000:8.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock model seconds/request")
+    parser.add_argument(
+        "--bandwidth", type=float, default=12_500_000, help="simulated upload bytes/second"
+    )
+    args = parser.parse_args()
+
+    with MockOllamaServer(latency_seconds=args.latency, bytes_per_second=args.bandwidth) as server:
+        # Model clients read the endpoint at import time.
+        os.environ["OLLAMA_UNIFIED_URL"] = server.url
+
+        from services import image_budget
+        from services.image_budget import ImageBudget
+
+        images = {
+            "small (640x400)": _synthetic_screenshot(640, 400),
+            "screenshot (1920x1080)": _synthetic_screenshot(1920, 1080),
+            "scan (3508x2480)": _synthetic_screenshot(3508, 2480),
+        }
+
+        for enabled in (False, True):
+            image_budget.IMAGE_BUDGET = ImageBudget(
+                **{**image_budget.ImageBudget.from_env().__dict__, "enabled": enabled}
+            )
+            for label, data in images.items():
+                _run(label, data, server, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: JSON serialization time and bytes-on-wire for representative payloads.
+
+- encode: FastAPI's previous default path (jsonable_encoder + stdlib json)
+  vs FastJSONResponse (orjson when installed) returned directly
+- wire: identity vs gzip vs brotli at the middleware's settings
+
+Usage (from Backend/):
+    python -m benchmarks.bench_json_compression --pages 1000 --runs 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import statistics
+import time
+
+from benchmarks.bench_mode_precompute import _synthetic_pages
+
+
+def _payloads(pages_count: int):
+    from services.mode_precompute import mode_explanation_for
+
+    pages = _synthetic_pages(pages_count)
+    explanation = mode_explanation_for(pages, "bench.pdf", "revision")
+    process_mode = {
+        "mode": "revision",
+        "session_id": "bench",
+        "results": [
+            {
+                "doc_id": f"bench:doc{d}.pdf",
+                "filename": f"doc{d}.pdf",
+                "doc_type": "pdf",
+                "page_count": len(pages),
+                "page_offset": 0,
+                "pages": [{"page_index": p.index, "text": p.text} for p in pages],
+                "mode_explanation": explanation,
+            }
+            for d in range(2)
+        ],
+        "next_cursor": None,
+    }
+    explanations_only = {
+        "mode": "revision",
+        "session_id": "bench",
+        "results": [{k: v for k, v in r.items() if k not in ("pages", "page_offset")} for r in process_mode["results"]],
+        "next_cursor": None,
+    }
+    summarize = {
+        "session_id": "bench",
+        "summaries": [
+            {"doc_id": "bench:doc0.pdf", "filename": "doc0.pdf", "bullets": [f"• {p}" for p in explanation["key_points"]], "page_count": len(pages)}
+        ],
+    }
+    return {
+        f"process-mode ({pages_count}p x2)": process_mode,
+        "process-mode fields=explanation": explanations_only,
+        "summarize": summarize,
+    }
+
+
+def _time(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    from fastapi.encoders import jsonable_encoder
+
+    from services import fast_json, http_compression
+
+    def stdlib(content):
+        return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    backend = "orjson" if fast_json.orjson is not None else "stdlib"
+    print(f"fast_json backend: {backend}; brotli: {'yes' if http_compression.brotli else 'no'}")
+
+    for label, payload in _payloads(args.pages).items():
+        t_old = _time(lambda: stdlib(payload), args.runs)
+        t_new = _time(lambda: fast_json.dumps(payload), args.runs)
+        body = fast_json.dumps(payload)
+        print(f"\n{label}")
+        print(f"  encode  jsonable_encoder+json {t_old * 1000:9.2f} ms   fast_json {t_new * 1000:9.2f} ms")
+
+        t_gz = _time(lambda: gzip.compress(body, http_compression.COMPRESSION_GZIP_LEVEL), args.runs)
+        gz = gzip.compress(body, http_compression.COMPRESSION_GZIP_LEVEL)
+        print(f"  wire    identity {len(body) / 1024:10.1f} KiB")
+        print(f"          gzip     {len(gz) / 1024:10.1f} KiB  ({t_gz * 1000:7.2f} ms)")
+        if http_compression.brotli is not None:
+            brotli = http_compression.brotli
+            quality = http_compression.COMPRESSION_BROTLI_QUALITY
+            t_br = _time(lambda: brotli.compress(body, quality=quality), args.runs)
+            br = brotli.compress(body, quality=quality)
+            print(f"          br       {len(br) / 1024:10.1f} KiB  ({t_br * 1000:7.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: /modes/process-mode latency with explanations computed per request
+vs precomputed at upload (and memoized by content hash).
+
+Usage (from Backend/):
+    python -m benchmarks.bench_mode_precompute --pages 1000 --runs 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+_WORDS = (
+    "photosynthesis chlorophyll energy light cell membrane protein enzyme reaction "
+    "equation velocity force mass acceleration history empire trade economy market "
+    "algorithm function variable loop definition important example formula process"
+).split()
+
+
+def _synthetic_pages(count: int, seed: int = 3):
+    from services.session_store import PageData
+
+    rng = random.Random(seed)
+    pages = []
+    for i in range(count):
+        lines = []
+        for _ in range(rng.randint(12, 20)):
+            words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 14))]
+            lines.append(" ".join(words).capitalize() + ".")
+        pages.append(PageData(index=i, text="\n".join(lines)))
+    return pages
+
+
+def _time(fn, runs: int):
+    latencies = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def _report(label: str, latencies) -> None:
+    print(
+        f"{label:<36} p50={statistics.median(latencies) * 1000:9.2f} ms "
+        f"max={max(latencies) * 1000:9.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+
+    from app import create_app
+    from services import mode_precompute
+    from services.doc_stats import build_document_stats
+    from services.mode_execute import generate_mode_explanation
+    from services.session_store import SESSION_STORE
+
+    pages = _synthetic_pages(args.pages)
+    combined = "\n\n".join(p.text for p in pages)
+    print(f"{args.pages} pages, {len(combined) / 1024:.0f} KiB of text")
+
+    SESSION_STORE.delete("bench")
+    doc = SESSION_STORE.upsert_document(
+        session_id="bench", doc_id="bench:bench.pdf", filename="bench.pdf", doc_type="pdf", pages=pages
+    )
+    client = TestClient(create_app())
+
+    def request_all_modes():
+        for mode in mode_precompute.MODES:
+            r = client.post("/modes/process-mode", data={"mode": mode, "session_id": "bench"})
+            r.raise_for_status()
+
+    def cold():
+        # What process-mode did before: generate the explanation inside the request
+        doc.mode_explanations = {}
+        doc.stats = None
+        mode_precompute._memo.clear()
+        request_all_modes()
+
+    def generate_all():
+        stats = build_document_stats(p.text for p in pages)
+        for m in mode_precompute.MODES:
+            generate_mode_explanation(m, "", "bench.pdf", stats=stats)
+
+    _report("stats + generate (4 modes, no HTTP)", _time(generate_all, args.runs))
+    _report("process-mode x4, computed inline", _time(cold, args.runs))
+
+    doc.mode_explanations = {}
+    doc.stats = None
+    mode_precompute._memo.clear()
+    t0 = time.perf_counter()
+    mode_precompute.precompute_mode_explanations(doc)
+    print(f"{'precompute after upload':<36} {(time.perf_counter() - t0) * 1000:9.2f} ms (background task)")
+    _report("process-mode x4, precomputed", _time(request_all_modes, args.runs))
+
+    # Same content re-uploaded (another session): served from the content-hash memo
+    SESSION_STORE.delete("bench2")
+    doc2 = SESSION_STORE.upsert_document(
+        session_id="bench2", doc_id="bench2:bench.pdf", filename="bench.pdf", doc_type="pdf", pages=pages
+    )
+    _report("re-upload precompute (memo hit)", _time(lambda: mode_precompute.precompute_mode_explanations(doc2), 1))
+
+
+if __name__ == "__main__":
+    main()
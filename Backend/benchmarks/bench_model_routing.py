@@ -0,0 +1,91 @@
+"""
+Benchmark: multi-endpoint routing against local stand-in replicas.
+
+Starts three mock Ollama servers (one healthy, one with a slow tail, one
+failing) and drives the EndpointPool with and without hedging, reporting
+latency percentiles, per-endpoint request counts and breaker state.
+
+Usage (from Backend/):
+    python -m benchmarks.bench_model_routing --requests 200 --concurrency 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.mock_ollama import MockOllamaServer
+from services.model_endpoints import EndpointPool
+
+
+def _pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1)))]
+
+
+def _drive(pool: EndpointPool, n: int, concurrency: int, hedge: bool):
+    payload = {"model": "mock", "prompt": "hello", "stream": False}
+    latencies = []
+    errors = 0
+
+    def one(_):
+        t0 = time.perf_counter()
+        try:
+            resp = pool.post(payload, timeout=10, hedge=hedge)
+            ok = resp.status_code == 200
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - t0
+
+    with ThreadPoolExecutor(concurrency) as ex:
+        for ok, latency in ex.map(one, range(n)):
+            latencies.append(latency)
+            errors += 0 if ok else 1
+    return latencies, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    servers = [
+        MockOllamaServer(latency_seconds=0.05, seed=1),
+        MockOllamaServer(latency_seconds=0.05, tail_fraction=0.2, tail_latency_seconds=1.0, seed=2),
+        MockOllamaServer(latency_seconds=0.01, error_status=500, seed=3),
+    ]
+    for s in servers:
+        s.start()
+
+    try:
+        for hedge in (False, True):
+            pool = EndpointPool(
+                [s.url for s in servers],
+                failure_threshold=3,
+                open_seconds=5,
+                health_interval=1,
+                hedge_enabled=hedge,
+                hedge_min_samples=20,
+            )
+            latencies, errors = _drive(pool, args.requests, args.concurrency, hedge)
+            stats = pool.stats()
+            pool.close()
+            print(
+                f"hedge={'on ' if hedge else 'off'} "
+                f"p50={statistics.median(latencies) * 1000:7.1f} ms "
+                f"p95={_pct(latencies, 0.95) * 1000:7.1f} ms "
+                f"p99={_pct(latencies, 0.99) * 1000:7.1f} ms "
+                f"errors={errors} hedges={stats['hedges_sent']}/{stats['hedges_won']} won"
+            )
+            for ep in stats["endpoints"]:
+                print(f"    {ep['url']:<40} requests={ep['requests']:4d} breaker={ep['breaker']}")
+    finally:
+        for s in servers:
+            s.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark: throughput of the sharded deployment vs shard count.
+
+For each shard count, starts that many backend processes plus the shard
+router (real uvicorn processes on localhost) and drives a CPU-bound
+per-session workload through the router: upload a synthetic PDF, then
+/modes/summarize and /modes/process-mode for the same session. Reports
+sessions/s, request latency percentiles and scaling vs one shard; with
+--handoff it also adds a shard at the end and times the rebalance.
+
+Scaling can only be near-linear up to the number of CPU cores (reported).
+
+Usage (from Backend/):
+    python -m benchmarks.bench_sharding --shards 1,2,4 --sessions 64 --concurrency 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import secrets
+import subprocess
+import sys
+import time
+from typing import List
+
+import httpx
+
+from benchmarks.bench_mode_precompute import _synthetic_pages
+
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1)))]
+
+
+def _synthetic_pdf(pages: int) -> bytes:
+    import fitz  # PyMuPDF
+
+    pdf = fitz.open()
+    for page in _synthetic_pages(pages):
+        pdf.new_page().insert_textbox(fitz.Rect(36, 36, 576, 806), page.text, fontsize=9)
+    data = pdf.tobytes()
+    pdf.close()
+    return data
+
+
+def _spawn(app: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=_BACKEND,
+        env=env,
+    )
+
+
+def _wait_healthy(urls: List[str], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    for url in urls:
+        while True:
+            try:
+                if httpx.get(url + "/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up")
+            time.sleep(0.1)
+
+
+async def _drive(router: str, run_id: str, sessions: int, concurrency: int, pdf: bytes):
+    latencies = []
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one_session(client: httpx.AsyncClient, i: int) -> None:
+        sid = f"{run_id}-{i}"
+        steps = [
+            ("post", f"/vision/session/{sid}/documents", {"files": [("files", ("bench.pdf", pdf, "application/pdf"))]}),
+            ("post", "/modes/summarize", {"data": {"session_id": sid}}),
+            ("post", "/modes/process-mode", {"data": {"session_id": sid, "mode": "revision"}}),
+        ]
+        async with limit:
+            for method, path, kwargs in steps:
+                t0 = time.perf_counter()
+                r = await client.request(method, path, **kwargs)
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+    async with httpx.AsyncClient(base_url=router, timeout=300) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one_session(client, i) for i in range(sessions)))
+        elapsed = time.perf_counter() - t0
+    return elapsed, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shards", default="1,2,4", help="comma separated shard counts")
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--pages", type=int, default=40, help="pages per uploaded PDF")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--handoff", action="store_true", help="add a shard after each run and time the rebalance")
+    args = parser.parse_args()
+
+    pdf = _synthetic_pdf(args.pages)
+    token = secrets.token_urlsafe(16)
+    env = {**os.environ, "SHARD_TOKEN": token, "VISION_CACHE_PATH": "", "PAGE_RENDER_DISK_PATH": ""}
+    print(f"cpu cores: {os.cpu_count()}; {args.sessions} sessions x 3 requests, concurrency {args.concurrency}, {len(pdf) // 1024} KiB PDF")
+
+    baseline = None
+    for count in [int(c) for c in args.shards.split(",") if c.strip()]:
+        nodes = [f"http://127.0.0.1:{args.port + 1 + i}" for i in range(count + (1 if args.handoff else 0))]
+        router = f"http://127.0.0.1:{args.port}"
+        procs = [_spawn("app:app", args.port + 1 + i, env) for i in range(len(nodes))]
+        procs.append(_spawn("router_app:app", args.port, {**env, "SHARD_NODES": ",".join(nodes[:count])}))
+        try:
+            _wait_healthy(nodes + [router])
+            elapsed, latencies = asyncio.run(_drive(router, f"run{count}", args.sessions, args.concurrency, pdf))
+            rate = args.sessions / elapsed
+            baseline = baseline or rate
+            print(
+                f"shards={count:2d}  {rate:7.2f} sessions/s  x{rate / baseline:4.2f}"
+                f"  p50={_pct(latencies, 0.5) * 1000:7.1f} ms  p95={_pct(latencies, 0.95) * 1000:7.1f} ms"
+            )
+            if args.handoff:
+                r = httpx.put(
+                    router + "/router/shards",
+                    json={"nodes": nodes},
+                    headers={"X-Shard-Token": token},
+                    timeout=300,
+                )
+                r.raise_for_status()
+                report = r.json()
+                print(f"           +1 shard: moved {report['moved']}/{report['sessions']} sessions in {report['seconds']:.2f}s")
+        finally:
+            for proc in procs:
+                proc.terminate()
+            for proc in procs:
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Benchmark suite: end-to-end HTTP latency and throughput of the main endpoints.
+
+Builds a seeded synthetic corpus (benchmarks.corpus), starts a mock Ollama
+server (configurable latency, jitter and streaming) and the backend as a real
+uvicorn process pointed at it, then drives each scenario at several
+concurrency levels:
+
+    upload      POST /vision/session/{id}/documents (PDF + PPTX + DOCX, new session each time)
+    modes_ask   POST /modes/ask (unique question per request)
+    summarize   POST /modes/summarize
+    process     POST /modes/process-mode
+    vision_ask  POST /vision/session/{id}/ask (screenshot, unique query per request)
+
+Reports requests/s and p50/p95/p99 per (scenario, concurrency) and writes
+them with the run metadata to a JSON file. --compare checks a run against an
+earlier JSON file and exits with status 1 if any scenario regressed by more
+than --threshold (p95 latency up or throughput down).
+
+Usage (from Backend/):
+    python -m benchmarks.bench_suite --concurrency 1,4,16 --requests 64 --out bench.json
+    python -m benchmarks.bench_suite --out new.json --compare bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.bench_mode_precompute import _WORDS
+from benchmarks.bench_sharding import _BACKEND, _pct, _spawn, _wait_healthy
+from benchmarks.corpus import build_corpus
+from benchmarks.mock_ollama import MockOllamaServer
+
+SCENARIOS = ("upload", "modes_ask", "summarize", "process", "vision_ask")
+
+
+def _question(i: int) -> str:
+    # Unique per request so response/result caches never answer for the backend
+    words = [_WORDS[(i * 7 + k * 13) % len(_WORDS)] for k in range(4)]
+    return f"Explain {' '.join(words)} (#{i})?"
+
+
+class _Workload:
+    def __init__(self, corpus: List[tuple], sessions: List[str], run_id: str):
+        self.documents = [(n, d) for n, d in corpus if not n.endswith(".png")]
+        self.screenshot = next(d for n, d in corpus if n.endswith(".png"))
+        self.sessions = sessions
+        self.run_id = run_id
+        self.pdf_name = next(n for n, _ in corpus if n.endswith(".pdf"))
+
+    def _files(self) -> list:
+        return [("files", (name, data, "application/octet-stream")) for name, data in self.documents]
+
+    def request(self, scenario: str, i: int) -> tuple:
+        sid = self.sessions[i % len(self.sessions)]
+        if scenario == "upload":
+            return "/vision/session/{}/documents".format(f"{self.run_id}-up{i}"), {"files": self._files()}
+        if scenario == "modes_ask":
+            return "/modes/ask", {"data": {"session_id": sid, "question": _question(i)}}
+        if scenario == "summarize":
+            return "/modes/summarize", {"data": {"session_id": sid}}
+        if scenario == "process":
+            return "/modes/process-mode", {"data": {"session_id": sid, "mode": "revision"}}
+        if scenario == "vision_ask":
+            return f"/vision/session/{sid}/ask", {
+                "data": {"query": _question(i), "selected_doc_ids": [f"{sid}:{self.pdf_name}"]},
+                "files": {"image": ("screen.png", self.screenshot, "image/png")},
+            }
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def _run_level(
+    client: httpx.AsyncClient, make: Callable[[int], tuple], start: int, requests: int, concurrency: int
+) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        path, kwargs = make(i)
+        async with limit:
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(path, **kwargs)
+                ok = r.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(start + i) for i in range(requests)))
+    elapsed = time.perf_counter() - t0
+    result = {"requests": requests, "errors": errors, "seconds": round(elapsed, 4)}
+    result["throughput"] = round(len(latencies) / elapsed, 3) if elapsed > 0 else 0.0
+    if latencies:
+        result.update(
+            {
+                "p50_ms": round(_pct(latencies, 0.50) * 1000, 2),
+                "p95_ms": round(_pct(latencies, 0.95) * 1000, 2),
+                "p99_ms": round(_pct(latencies, 0.99) * 1000, 2),
+                "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+            }
+        )
+    return result
+
+
+async def _drive(base_url: str, args, corpus: List[tuple], levels: List[int], scenarios: List[str]) -> List[dict]:
+    run_id = f"suite{os.getpid()}"
+    sessions = [f"{run_id}-s{i}" for i in range(max(levels))]
+    workload = _Workload(corpus, sessions, run_id)
+    results = []
+
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        timeout=300,
+        limits=httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels)),
+    ) as client:
+        for sid in sessions:
+            r = await client.post(f"/vision/session/{sid}/documents", files=workload._files())
+            r.raise_for_status()
+
+        counter = 0
+        for scenario in scenarios:
+            make = lambda i, s=scenario: workload.request(s, i)  # noqa: E731
+            for concurrency in levels:
+                await _run_level(client, make, counter, args.warmup, concurrency)
+                counter += args.warmup
+                result = await _run_level(client, make, counter, args.requests, concurrency)
+                counter += args.requests
+                result.update({"scenario": scenario, "concurrency": concurrency})
+                results.append(result)
+                print(
+                    f"{scenario:11s} c={concurrency:3d}  {result['throughput']:8.2f} req/s"
+                    f"  p50={result.get('p50_ms', 0):8.1f}  p95={result.get('p95_ms', 0):8.1f}"
+                    f"  p99={result.get('p99_ms', 0):8.1f} ms  errors={result['errors']}"
+                )
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=_BACKEND, capture_output=True, text=True, timeout=10
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Regressions of `current` vs `baseline` (same scenario and concurrency)."""
+    before: Dict[tuple, dict] = {(r["scenario"], r["concurrency"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in current.get("results", []):
+        old = before.get((r["scenario"], r["concurrency"]))
+        if old is None:
+            continue
+        label = f"{r['scenario']} c={r['concurrency']}"
+        if old.get("p95_ms") and r.get("p95_ms", float("inf")) > old["p95_ms"] * (1 + threshold):
+            regressions.append(f"{label}: p95 {old['p95_ms']:.1f} -> {r.get('p95_ms', float('inf')):.1f} ms")
+        if old.get("throughput") and r["throughput"] < old["throughput"] * (1 - threshold):
+            regressions.append(f"{label}: throughput {old['throughput']:.2f} -> {r['throughput']:.2f} req/s")
+        if r["errors"] > old.get("errors", 0):
+            regressions.append(f"{label}: errors {old.get('errors', 0)} -> {r['errors']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="measured requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=20, help="pages/slides per corpus document")
+    parser.add_argument("--images-per-page", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--model-latency", type=float, default=0.05, help="mock model seconds per request")
+    parser.add_argument("--model-jitter", type=float, default=0.0)
+    parser.add_argument("--model-stream-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--out", default="bench_suite.json")
+    parser.add_argument("--compare", default=None, help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    corpus = build_corpus(docs=1, pages=args.pages, images_per_page=args.images_per_page, seed=args.seed)
+    mock = MockOllamaServer(
+        latency_seconds=args.model_latency,
+        jitter_seconds=args.model_jitter,
+        stream_token_seconds=args.model_stream_delay,
+        seed=args.seed,
+    )
+    mock.start()
+    env = {
+        **os.environ,
+        "OLLAMA_UNIFIED_URL": mock.url,
+        "OLLAMA_UNIFIED_URLS": "",
+        "VISION_CACHE_PATH": "",
+        "PAGE_RENDER_DISK_PATH": "",
+    }
+    base_url = f"http://127.0.0.1:{args.port}"
+    backend = _spawn("app:app", args.port, env)
+    print(f"cpu cores: {os.cpu_count()}; corpus: " + ", ".join(f"{n} {len(d) // 1024} KiB" for n, d in corpus))
+    try:
+        _wait_healthy([base_url])
+        results = asyncio.run(_drive(base_url, args, corpus, levels, scenarios))
+    finally:
+        backend.terminate()
+        backend.wait()
+        mock.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions vs {args.compare} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: extractive summarizer throughput (sentences/second) and peak memory.
+
+Usage (from Backend/):
+    python -m benchmarks.bench_summarizer --pages 1000 --sentences-per-page 25
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import textwrap
+import time
+import tracemalloc
+
+_TOPICS = [
+    "cell membrane protein enzyme transport diffusion osmosis receptor signal",
+    "force mass acceleration velocity momentum energy friction gravity motion",
+    "market supply demand price inflation trade currency interest economy",
+    "empire dynasty war treaty century revolution colony trade kingdom",
+    "function variable loop recursion algorithm array complexity compiler",
+]
+_FILLER = "the a of and to in is for that with as on by this are be it from".split()
+
+
+def _synthetic_pages(count: int, sentences_per_page: int, seed: int = 11):
+    from services.session_store import PageData
+
+    rng = random.Random(seed)
+    topics = [t.split() for t in _TOPICS]
+    pages = []
+    for i in range(count):
+        vocab = topics[(i // 20) % len(topics)]  # chapters of 20 pages per topic
+        sentences = []
+        for _ in range(sentences_per_page):
+            words = [rng.choice(vocab if rng.random() < 0.4 else _FILLER) for _ in range(rng.randint(8, 20))]
+            sentences.append(" ".join(words).capitalize() + ".")
+        # wrapped like extracted PDF text (layout line breaks inside sentences)
+        pages.append(PageData(index=i, text="\n".join(textwrap.wrap(" ".join(sentences), 90))))
+    return pages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--sentences-per-page", type=int, default=25)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--items", type=int, default=6)
+    args = parser.parse_args()
+
+    from services.summarizer import summarize_pages
+
+    for pages_count in sorted({max(1, args.pages // 10), args.pages}):
+        pages = _synthetic_pages(pages_count, args.sentences_per_page)
+        timings = []
+        summary = None
+        for _ in range(args.runs):
+            t0 = time.perf_counter()
+            summary = summarize_pages(pages)
+            timings.append(time.perf_counter() - t0)
+
+        tracemalloc.start()
+        summarize_pages(pages)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        best = min(timings)
+        print(
+            f"pages={pages_count:<6} sentences={summary.sentence_count:<7} "
+            f"best={best * 1000:9.1f} ms  {summary.sentence_count / best:10.0f} sentences/s  "
+            f"peak={peak / 1024 / 1024:6.1f} MiB"
+        )
+    for line in summary.top(args.items):
+        print(f"  • {line[:100]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Synthetic, seeded document corpora for benchmarks: PDF, PPTX, DOCX and
+screenshot-like images built from the same study-text vocabulary, so the
+same arguments always produce byte-identical files.
+
+Write a corpus to disk (from Backend/):
+    python -m benchmarks.corpus --out /tmp/corpus --docs 2 --pages 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import io
+import os
+import random
+import zipfile
+from typing import List, Tuple
+
+from benchmarks.bench_mode_precompute import _WORDS, _synthetic_pages
+
+CORPUS_KINDS = ("pdf", "pptx", "docx", "png")
+# Office metadata timestamps (keeps generated files byte-identical across runs)
+_FIXED_TIME = datetime.datetime(2024, 1, 1)
+
+
+def _page_texts(pages: int, seed: int) -> List[str]:
+    return [p.text for p in _synthetic_pages(pages, seed=seed)]
+
+
+def _stable_zip(data: bytes) -> bytes:
+    """Re-pack an OOXML zip with fixed entry timestamps."""
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as src, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as dst:
+        for item in src.infolist():
+            dst.writestr(zipfile.ZipInfo(item.filename, date_time=(1980, 1, 1, 0, 0, 0)), src.read(item))
+    return out.getvalue()
+
+
+def make_pdf(pages: int = 10, images_per_page: int = 0, seed: int = 1) -> bytes:
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+    rng = random.Random(seed)
+    pdf = fitz.open()
+    for text in _page_texts(pages, seed):
+        page = pdf.new_page()
+        page.insert_textbox(fitz.Rect(36, 36, 576, 520), text, fontsize=9)
+        for i in range(images_per_page):
+            size = (240 + rng.randint(0, 160), 160)
+            img = Image.frombytes("L", size, rng.randbytes(size[0] * size[1])).convert("RGB")
+            buf = io.BytesIO()
+            img.save(buf, "PNG")
+            page.insert_image(fitz.Rect(36 + i * 180, 540, 200 + i * 180, 800), stream=buf.getvalue())
+    pdf.set_metadata({})
+    data = pdf.tobytes(no_new_id=True)
+    pdf.close()
+    return data
+
+
+def make_pptx(slides: int = 10, seed: int = 1) -> bytes:
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation()
+    prs.core_properties.created = _FIXED_TIME
+    prs.core_properties.modified = _FIXED_TIME
+    layout = prs.slide_layouts[1]  # title + content
+    for i, text in enumerate(_page_texts(slides, seed)):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Lecture part {i + 1}"
+        body = slide.placeholders[1].text_frame
+        lines = text.split("\n")
+        body.text = lines[0]
+        for line in lines[1:8]:
+            body.add_paragraph().text = line
+        slide.shapes.add_textbox(Inches(0.5), Inches(6.5), Inches(9), Inches(0.8)).text_frame.text = (
+            " ".join(lines[8:])
+        )
+    out = io.BytesIO()
+    prs.save(out)
+    return _stable_zip(out.getvalue())
+
+
+def make_docx(pages: int = 10, seed: int = 1) -> bytes:
+    import docx  # python-docx
+
+    document = docx.Document()
+    document.core_properties.created = _FIXED_TIME
+    document.core_properties.modified = _FIXED_TIME
+    for i, text in enumerate(_page_texts(pages, seed)):
+        document.add_heading(f"Section {i + 1}", level=2)
+        for line in text.split("\n"):
+            document.add_paragraph(line)
+    out = io.BytesIO()
+    document.save(out)
+    return _stable_zip(out.getvalue())
+
+
+def make_screenshot(width: int = 1280, height: int = 800, seed: int = 1) -> bytes:
+    """A page-like PNG with rendered study text (what a student would share)."""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    y = 24
+    while y < height - 24:
+        words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 14))]
+        draw.text((32, y), " ".join(words).capitalize() + ".", fill="black")
+        y += 18
+    out = io.BytesIO()
+    img.save(out, "PNG")
+    return out.getvalue()
+
+
+def build_corpus(docs: int = 1, pages: int = 10, images_per_page: int = 0, seed: int = 1) -> List[Tuple[str, bytes]]:
+    """[(filename, bytes)]: `docs` files of every kind in CORPUS_KINDS."""
+    files: List[Tuple[str, bytes]] = []
+    for d in range(docs):
+        s = seed + d
+        files.append((f"lecture{d}.pdf", make_pdf(pages, images_per_page, seed=s)))
+        files.append((f"slides{d}.pptx", make_pptx(pages, seed=s)))
+        files.append((f"notes{d}.docx", make_docx(pages, seed=s)))
+        files.append((f"screen{d}.png", make_screenshot(seed=s)))
+    return files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--docs", type=int, default=1, help="files of each kind")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--images-per-page", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for name, data in build_corpus(args.docs, args.pages, args.images_per_page, args.seed):
+        with open(os.path.join(args.out, name), "wb") as f:
+            f.write(data)
+        print(f"{name:20s} {len(data) / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
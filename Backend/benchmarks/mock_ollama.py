@@ -0,0 +1,192 @@
+"""
+Local stand-in for the Ollama /api/generate endpoint (benchmarks only).
+
+- Fixed latency per request plus an optional simulated upload bandwidth,
+  so payload size shows up in end-to-end timings.
+- Optional random jitter, tail latency (a fraction of requests is slow) and
+  forced error status, to stand in for a degraded replica.
+- "stream": true requests get Ollama-style NDJSON chunks (one per answer
+  word, stream_token_seconds apart) ending with a done line.
+- Records request count and received bytes for reporting.
+
+Run standalone:
+    python -m benchmarks.mock_ollama --port 11500 --latency 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class MockOllamaServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_seconds: float = 0.0,
+        bytes_per_second: Optional[float] = None,
+        answer: str = "Mock answer from the local model stand-in.",
+        tail_fraction: float = 0.0,
+        tail_latency_seconds: float = 0.0,
+        error_status: Optional[int] = None,
+        seed: Optional[int] = None,
+        jitter_seconds: float = 0.0,
+        stream_token_seconds: float = 0.0,
+    ):
+        self.latency_seconds = latency_seconds
+        self.bytes_per_second = bytes_per_second
+        self.answer = answer
+        self.tail_fraction = tail_fraction
+        self.tail_latency_seconds = tail_latency_seconds
+        self.error_status = error_status
+        self.jitter_seconds = jitter_seconds
+        self.stream_token_seconds = stream_token_seconds
+        self._rng = random.Random(seed)
+        self.request_count = 0
+        self.received_bytes = 0
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):  # keep benchmark output clean
+                pass
+
+            def do_GET(self):
+                self._send(200, b"Ollama is running", "text/plain")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                with server._lock:
+                    server.request_count += 1
+                    server.received_bytes += len(body)
+
+                delay = server.latency_seconds
+                with server._lock:
+                    if server.tail_fraction and server._rng.random() < server.tail_fraction:
+                        delay += server.tail_latency_seconds
+                    if server.jitter_seconds:
+                        delay += server._rng.uniform(0.0, server.jitter_seconds)
+                if server.bytes_per_second:
+                    delay += len(body) / server.bytes_per_second
+                if delay > 0:
+                    time.sleep(delay)
+
+                if server.error_status:
+                    self._send(server.error_status, b'{"error":"mock failure"}', "application/json")
+                    return
+
+                try:
+                    payload = json.loads(body or b"{}")
+                except Exception:
+                    self._send(400, b'{"error":"invalid json"}', "application/json")
+                    return
+
+                # Grow a fake `context` token array like Ollama does (prompt + answer tokens)
+                prompt_tokens = len((payload.get("prompt") or "").split())
+                previous = payload.get("context") or []
+                data = {
+                    "model": payload.get("model", "mock"),
+                    "response": server.answer,
+                    "done": True,
+                    "context": previous + list(range(prompt_tokens + 8)),
+                }
+                if payload.get("stream"):
+                    self._send_stream(data)
+                    return
+                self._send(200, json.dumps(data).encode("utf-8"), "application/json")
+
+            def _send_stream(self, data: dict):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                words = data["response"].split(" ")
+                for i, word in enumerate(words):
+                    if i and server.stream_token_seconds:
+                        time.sleep(server.stream_token_seconds)
+                    piece = word if i == 0 else f" {word}"
+                    self._chunk({"model": data["model"], "response": piece, "done": False})
+                self._chunk({**data, "response": ""})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, obj: dict):
+                line = json.dumps(obj).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/generate"
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.request_count = 0
+            self.received_bytes = 0
+
+    def start(self) -> "MockOllamaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per request")
+    parser.add_argument("--bandwidth", type=float, default=None, help="simulated bytes/second")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds (uniform 0..jitter)")
+    parser.add_argument("--stream-token-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    args = parser.parse_args()
+
+    server = MockOllamaServer(
+        host=args.host,
+        port=args.port,
+        latency_seconds=args.latency,
+        bytes_per_second=args.bandwidth,
+        jitter_seconds=args.jitter,
+        stream_token_seconds=args.stream_token_delay,
+    )
+    print(f"Mock Ollama listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Sharded deployment entry point.
+
+    # router only (shards started elsewhere with the same SHARD_TOKEN)
+    SHARD_NODES=http://127.0.0.1:8001,http://127.0.0.1:8002 SHARD_TOKEN=... \
+        uvicorn router_app:app --port 8000
+
+    # local: spawn N shard processes on port+1.. and the router on port
+    python router_app.py --shards 4 --port 8000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import secrets
+import subprocess
+import sys
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from dotenv import find_dotenv, load_dotenv
+from fastapi import Body, FastAPI, Header, HTTPException, Request, WebSocket
+
+from services.fast_json import FastJSONResponse
+from services.shard_router import SHARD_NODES, SHARD_TOKEN, ShardRouter
+
+_FORWARD_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"]
+
+
+def create_router_app(nodes: Optional[List[str]] = None, token: Optional[str] = None) -> FastAPI:
+    load_dotenv(find_dotenv())
+
+    nodes = nodes or SHARD_NODES
+    if not nodes:
+        raise RuntimeError("Set SHARD_NODES to the shard base URLs (comma separated)")
+    token = SHARD_TOKEN if token is None else token
+    shards = ShardRouter(nodes, token=token)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        await shards.close()
+
+    app = FastAPI(
+        title="InsightHub-AI shard router",
+        version="0.1.0",
+        description="Routes session traffic to the backend shard that owns the session.",
+        default_response_class=FastJSONResponse,
+        lifespan=lifespan,
+    )
+    app.state.shards = shards
+
+    # No CORS/compression middleware here: shard responses already carry both
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok", "shards": len(shards.ring.nodes)}
+
+    @app.get("/router/shards")
+    def shard_stats():
+        """Ring, per-shard forwarding counters and handoff state."""
+        return shards.stats()
+
+    @app.put("/router/shards")
+    async def set_shards(
+        nodes: List[str] = Body(..., embed=True),
+        x_shard_token: Optional[str] = Header(None),
+    ):
+        """Replace the shard list; sessions whose owner changed are handed off."""
+        if not token or not x_shard_token or not secrets.compare_digest(x_shard_token, token):
+            raise HTTPException(status_code=403, detail="Invalid shard token")
+        try:
+            return await shards.set_nodes(nodes)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+
+    @app.websocket("/vision/session/{session_id}/follow")
+    async def follow(websocket: WebSocket, session_id: str):
+        await shards.forward_websocket(websocket)
+
+    @app.api_route("/vision/{path:path}", methods=_FORWARD_METHODS, include_in_schema=False)
+    async def vision(request: Request, path: str):
+        return await shards.forward(request)
+
+    @app.api_route("/modes/{path:path}", methods=_FORWARD_METHODS, include_in_schema=False)
+    async def modes(request: Request, path: str):
+        return await shards.forward(request)
+
+    return app
+
+
+# `uvicorn router_app:app` needs SHARD_NODES; `python router_app.py` builds its own
+app = create_router_app() if SHARD_NODES else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run N backend shards and the shard router locally")
+    parser.add_argument("--shards", type=int, default=2)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="router port; shards use port+1..port+N")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    token = SHARD_TOKEN or secrets.token_urlsafe(24)
+    env = {**os.environ, "SHARD_TOKEN": token}
+    here = os.path.dirname(os.path.abspath(__file__))
+    nodes, procs = [], []
+    for i in range(1, args.shards + 1):
+        port = args.port + i
+        nodes.append(f"http://{args.host}:{port}")
+        procs.append(
+            subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app:app", "--host", args.host, "--port", str(port)],
+                cwd=here,
+                env=env,
+            )
+        )
+    print(f"Shards: {', '.join(nodes)}")
+    try:
+        uvicorn.run(create_router_app(nodes, token=token), host=args.host, port=args.port)
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from services.metrics import timed
+
+# Token budgets for reference text sent to the models (num_ctx is 4096).
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+IMAGE_CONTEXT_TOKEN_BUDGET = int(os.getenv("IMAGE_CONTEXT_TOKEN_BUDGET", "500"))
+
+# Sentences per candidate passage and the hard cap for one passage.
+_PASSAGE_SENTENCES = 3
+_PASSAGE_MAX_TOKENS = 160
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_RE = re.compile(r"[a-zA-Z0-9]{3,}")
+
+
+@dataclass
+class PackedPassage:
+    label: str
+    text: str
+    score: float
+    tokens: int
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens_used: int
+    budget: int
+    passages: List[PackedPassage] = field(default_factory=list)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars per token for English BPE vocabularies)."""
+    return math.ceil(len(text or "") / 4)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_RE.split(text or "") if s.strip()]
+
+
+def _query_terms(query: Optional[str]) -> Set[str]:
+    return set(_WORD_RE.findall((query or "").lower()))
+
+
+def _trim_to_budget(sentences: List[str], budget: int) -> List[str]:
+    """Keep leading whole sentences that fit; hard-cut a single oversized sentence at a word."""
+    out: List[str] = []
+    used = 0
+    for s in sentences:
+        cost = estimate_tokens(s) + 1
+        if used + cost > budget:
+            break
+        out.append(s)
+        used += cost
+    if not out and sentences and budget > 8:
+        words = sentences[0][: budget * 4].rsplit(" ", 1)[0]
+        out.append(words + " …")
+    return out
+
+
+@timed("prompt_build")
+def pack_context(
+    sources: Sequence[Tuple[str, str]],
+    *,
+    query: Optional[str] = None,
+    budget: Optional[int] = None,
+) -> PackedContext:
+    """
+    Pick the best passages from `sources` ((label, text) pairs, in priority order)
+    to fill a token budget.
+
+    - Texts are split into sentences, grouped into short passages.
+    - Passages are scored by query-term overlap (length-normalized); sources
+      earlier in the list and passages earlier in a source win ties, so with
+      no query the result is the lead of the top sources.
+    - Passages are trimmed to sentence boundaries and emitted in document
+      order under their source label.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    terms = _query_terms(query)
+
+    candidates = []  # (score, source_rank, position, label, sentences)
+    for rank, (label, text) in enumerate(sources):
+        sentences = split_sentences(text)
+        for pos in range(0, len(sentences), _PASSAGE_SENTENCES):
+            chunk = sentences[pos : pos + _PASSAGE_SENTENCES]
+            score = 0.0
+            if terms:
+                words = set(_WORD_RE.findall(" ".join(chunk).lower()))
+                hits = len(terms & words)
+                score = hits / math.sqrt(len(words) or 1)
+            candidates.append((score, rank, pos, label, chunk))
+
+    # Highest score first; earlier source / position breaks ties.
+    candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+
+    selected = []
+    seen: Set[str] = set()
+    used = 0
+    for score, rank, pos, label, chunk in candidates:
+        if terms and score <= 0 and selected:
+            break
+        remaining = budget - used - estimate_tokens(label) - 2
+        if remaining <= 8:
+            break
+        kept = _trim_to_budget(chunk, min(remaining, _PASSAGE_MAX_TOKENS))
+        if not kept:
+            continue
+        text = " ".join(kept)
+        if text in seen:  # repeated boilerplate (headers, footers) costs tokens twice
+            continue
+        seen.add(text)
+        tokens = estimate_tokens(text)
+        used += tokens + estimate_tokens(label) + 2
+        selected.append((rank, pos, PackedPassage(label=label, text=text, score=score, tokens=tokens)))
+
+    selected.sort(key=lambda s: (s[0], s[1]))
+    passages = [p for _, _, p in selected]
+
+    parts: List[str] = []
+    last_label = None
+    for p in passages:
+        if p.label != last_label:
+            parts.append(f"[{p.label}]")
+            last_label = p.label
+        parts.append(p.text)
+    text = "\n".join(parts).strip()
+
+    return PackedContext(text=text, tokens_used=estimate_tokens(text), budget=budget, passages=passages)
+
+
+def page_sources(pages: Iterable, label_prefix: str = "page") -> List[Tuple[str, str]]:
+    """(label, text) pairs for PageData-like objects, skipping empty pages."""
+    return [(f"{label_prefix} {p.index + 1}", p.text) for p in pages if (p.text or "").strip()]
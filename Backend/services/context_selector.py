@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import io
-import re
-from dataclasses import dataclass
-from typing import List, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
 
 from PIL import Image
 
+from services.context_packer import PackedContext, pack_context
+from services.metrics import stage, timed
+from services.passage_index import index_terms
 from services.session_store import DocumentData
 
 
@@ -17,14 +19,7 @@ class MatchedPage:
     page_index: int
     score: float
     snippet: str
-
-
-_WORD_RE = re.compile(r"[a-zA-Z0-9]{3,}")
-
-
-def _normalize_words(text: str) -> List[str]:
-    text = (text or "").lower()
-    return _WORD_RE.findall(text)
+    highlights: List[Tuple[int, int]] = field(default_factory=list)
 
 
 def _keyword_overlap_score(a_words: List[str], b_words: List[str]) -> float:
@@ -41,6 +36,7 @@ def _keyword_overlap_score(a_words: List[str], b_words: List[str]) -> float:
     return inter / union
 
 
+@timed("ocr")
 def ocr_image_to_text(image_bytes: bytes) -> str:
     """
     OCR screenshot to get visible text.
@@ -66,47 +62,137 @@ def match_pages_by_screenshot(
     selected_docs: List[DocumentData],
     top_k: int = 4,
     snippet_chars: int = 1400,
-) -> Tuple[str, List[MatchedPage]]:
+    query: Optional[str] = None,
+    token_budget: Optional[int] = None,
+) -> Tuple[PackedContext, List[MatchedPage]]:
     """
     Returns:
-      (context_text, matched_pages)
+      (packed_context, matched_pages)
 
     Strategy:
       1) OCR screenshot -> ocr_text
       2) Score each page in selected docs by keyword overlap
-      3) Select top_k pages and concatenate snippets as context_text
+      3) Select top_k pages and pack their most relevant passages (w.r.t. the
+         query and OCR text) into the context token budget
     """
     ocr_text = ocr_image_to_text(image_bytes)
-    ocr_words = _normalize_words(ocr_text)
+    return match_pages_by_ocr_text(
+        ocr_text=ocr_text,
+        selected_docs=selected_docs,
+        top_k=top_k,
+        snippet_chars=snippet_chars,
+        query=query,
+        token_budget=token_budget,
+    )
 
-    scored: List[MatchedPage] = []
 
-    for doc in selected_docs:
-        for page in doc.pages:
-            page_words = _normalize_words(page.text)
-            score = _keyword_overlap_score(ocr_words, page_words)
-            if score <= 0:
-                continue
-            snippet = (page.text or "")[:snippet_chars]
-            scored.append(
-                MatchedPage(
-                    doc_id=doc.doc_id,
-                    filename=doc.filename,
-                    page_index=page.index,
-                    score=float(score),
-                    snippet=snippet,
+def match_pages_by_ocr_text(
+    *,
+    ocr_text: str,
+    selected_docs: List[DocumentData],
+    top_k: int = 4,
+    snippet_chars: int = 1400,
+    query: Optional[str] = None,
+    token_budget: Optional[int] = None,
+) -> Tuple[PackedContext, List[MatchedPage]]:
+    """
+    Steps 2-3 of match_pages_by_screenshot for already OCR'd text, so a caller
+    that keeps the OCR of an unchanged view can re-pack it for each query.
+    """
+    with stage("retrieval"):
+        ocr_words = index_terms(ocr_text)
+
+        scored: List[MatchedPage] = []
+        page_texts: Dict[Tuple[str, int], str] = {}
+
+        for doc in selected_docs:
+            index = doc.get_passage_index()
+            for page in doc.pages:
+                # Page term sets are precomputed at ingest (no per-request tokenizing)
+                page_words = index.page_terms.get(page.index, ())
+                score = _keyword_overlap_score(ocr_words, page_words)
+                if score <= 0:
+                    continue
+                page_texts[(doc.doc_id, page.index)] = page.text or ""
+                scored.append(
+                    MatchedPage(
+                        doc_id=doc.doc_id,
+                        filename=doc.filename,
+                        page_index=page.index,
+                        score=float(score),
+                        snippet="",
+                    )
                 )
-            )
 
-    scored.sort(key=lambda x: x.score, reverse=True)
-    top = scored[:top_k]
+        scored.sort(key=lambda x: x.score, reverse=True)
+        top = scored[:top_k]
 
-    # Build context text (text-only, as you requested)
-    parts: List[str] = []
-    for m in top:
-        parts.append(
-            f"[{m.filename} | page/part {m.page_index + 1} | score={m.score:.3f}]\n{m.snippet}"
+        # Snippet = best passage of each matched page (not just the page head)
+        passage_query = " ".join(filter(None, [query, ocr_text]))
+        best_by_page = {}
+        for doc in selected_docs:
+            if not any(m.doc_id == doc.doc_id for m in top):
+                continue
+            for hit in doc.get_passage_index().search(passage_query, top_k=len(doc.pages)):
+                best_by_page[(doc.doc_id, hit.page_index)] = hit
+        for m in top:
+            best = best_by_page.get((m.doc_id, m.page_index))
+            if best is not None:
+                m.snippet = best.text
+                m.highlights = best.highlights
+            else:
+                m.snippet = page_texts[(m.doc_id, m.page_index)][:snippet_chars]
+
+    # Build context text (text-only, as you requested), best pages first
+    sources = [
+        (
+            f"{m.filename} | page/part {m.page_index + 1} | score={m.score:.3f}",
+            page_texts[(m.doc_id, m.page_index)],
         )
+        for m in top
+    ]
+    packed = pack_context(
+        sources,
+        query=passage_query,
+        budget=token_budget,
+    )
+    return packed, top
+
 
-    context_text = "\n\n---\n\n".join(parts).strip()
-    return context_text, top
\ No newline at end of file
+def match_referenced_page(
+    *,
+    doc: DocumentData,
+    page_index: int,
+    query: Optional[str] = None,
+    snippet_chars: int = 1400,
+    token_budget: Optional[int] = None,
+) -> Tuple[PackedContext, List[MatchedPage]]:
+    """
+    Same result shape as match_pages_by_screenshot, for a page the client
+    named directly (doc_id + page_index): no OCR or page scoring needed.
+    """
+    page = next((p for p in doc.pages if p.index == page_index), None)
+    if page is None:
+        raise ValueError(f"Page {page_index} not found in {doc.filename}")
+
+    text = page.text or ""
+    match = MatchedPage(
+        doc_id=doc.doc_id,
+        filename=doc.filename,
+        page_index=page_index,
+        score=1.0,
+        snippet=text[:snippet_chars],
+    )
+    with stage("retrieval"):
+        for hit in doc.get_passage_index().search(query or "", top_k=len(doc.pages)):
+            if hit.page_index == page_index:
+                match.snippet = hit.text
+                match.highlights = hit.highlights
+                break
+
+    packed = pack_context(
+        [(f"{doc.filename} | page/part {page_index + 1}", text)],
+        query=query,
+        budget=token_budget,
+    )
+    return packed, [match]
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from services.session_store import SESSION_STORE, ModelContext
+
+# Keep the model loaded between turns, and start over before the context
+# array would overflow num_ctx (4096) once the next prompt is appended.
+MODEL_KEEP_ALIVE = os.getenv("MODEL_KEEP_ALIVE", "30m").strip()
+MODEL_CONTEXT_MAX_TOKENS = int(os.getenv("MODEL_CONTEXT_MAX_TOKENS", "3000"))
+
+
+def conversation_anchor(*parts: str) -> str:
+    """Stable id for the reference material a conversation is built on."""
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def followup_context(session_id: str, slot: str, anchor: str) -> Optional[List[int]]:
+    """
+    Token context to continue from, or None when this turn must send the full
+    prompt (first turn, different reference material, or context too long).
+    """
+    handle = SESSION_STORE.get_model_context(session_id, slot)
+    if handle is None or handle.anchor != anchor:
+        return None
+    if len(handle.tokens) > MODEL_CONTEXT_MAX_TOKENS:
+        return None
+    return handle.tokens
+
+
+def remember_context(
+    session_id: str, slot: str, anchor: str, raw: Dict[str, Any], followup: bool
+) -> int:
+    """Store the answer's context array for the next turn; returns the turn count."""
+    tokens = raw.get("context") if isinstance(raw, dict) else None
+    if not tokens:
+        SESSION_STORE.set_model_context(session_id, slot, None)
+        return 0
+
+    previous = SESSION_STORE.get_model_context(session_id, slot)
+    turns = previous.turns + 1 if followup and previous else 1
+    SESSION_STORE.set_model_context(
+        session_id,
+        slot,
+        ModelContext(anchor=anchor, tokens=list(tokens), turns=turns, updated_at=time.time()),
+    )
+    return turns
@@ -3,6 +3,7 @@ from __future__ import annotations
 import io
 from typing import List
 
+from .metrics import stage
 from .session_store import PageData
 
 
@@ -17,6 +18,16 @@ def _ext_from_filename(filename: str) -> str:
     return name.rsplit(".", 1)[-1]
 
 
+def doc_type_for_filename(filename: str) -> str:
+    """doc_type extract_pages would return for this file ("" when unsupported)."""
+    ext = _ext_from_filename(filename)
+    if ext in ["pdf", "pptx", "docx"]:
+        return ext
+    if ext in ["jpg", "jpeg", "png"]:
+        return "image"
+    return ""
+
+
 def extract_pages(filename: str, content: bytes) -> tuple[str, List[PageData]]:
     """
     Extract text per page/slide/chunk for:
@@ -34,11 +45,14 @@ def extract_pages(filename: str, content: bytes) -> tuple[str, List[PageData]]:
     ext = _ext_from_filename(filename)
 
     if ext == "pdf":
-        return "pdf", _extract_pdf_pages(content)
+        with stage("extract", doc_type="pdf"):
+            return "pdf", _extract_pdf_pages(content)
     if ext == "pptx":
-        return "pptx", _extract_pptx_slides(content)
+        with stage("extract", doc_type="pptx"):
+            return "pptx", _extract_pptx_slides(content)
     if ext == "docx":
-        return "docx", _extract_docx_chunks(content)
+        with stage("extract", doc_type="docx"):
+            return "docx", _extract_docx_chunks(content)
     if ext in ["jpg", "jpeg", "png"]:
         # Images are treated as single-page docs with no extracted text (for now)
         # The Vision Tutor uses the raw file/image bytes, not the text.
@@ -0,0 +1,162 @@
+"""
+Per-document statistics for the mode generators, built in one pass over the pages.
+
+mode_execute used to rescan the joined document text once per statistic
+(lower-casing + 25 substring searches, a full word split, a line split, ...),
+and again for every mode. DocumentStats is built once at ingest from the
+pages and holds everything the generators read, with the same results as
+running the original helpers on "\\n\\n".join(page texts).
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+# Subject -> keywords, in priority order (first subject with any hit wins)
+SUBJECT_KEYWORDS: Dict[str, List[str]] = {
+    "mathematics": ["equation", "theorem", "proof", "calculate", "formula"],
+    "science": ["experiment", "hypothesis", "research", "theory", "observation"],
+    "programming": ["code", "function", "algorithm", "variable", "class"],
+    "history": ["century", "war", "empire", "dynasty", "period"],
+    "literature": ["author", "poem", "novel", "character", "theme"],
+}
+
+# Pages are joined with this separator when the generators see one text
+PAGE_SEPARATOR = "\n\n"
+
+# Leading characters kept for previews (revision gist, unknown-mode fallback)
+HEAD_CHARS = 500
+
+# Lead sentences / key lines kept for the generators
+LEAD_ITEMS = 3
+LEAD_MAX_LEN = 120
+KEY_LINES = 5
+
+
+# Flat keyword list for the per-page scan. No keyword overlaps itself, so
+# str.count gives the same totals as overlapping substring matching.
+_KEYWORDS = [kw for kws in SUBJECT_KEYWORDS.values() for kw in kws]
+
+
+def first_bits(content: str, max_items: int = 3, max_len: int = 120) -> List[str]:
+    flat = " ".join((content or "").split())
+    parts = [p.strip() for p in flat.replace("?", ".").replace("!", ".").split(".") if p.strip()]
+    out: List[str] = []
+    if parts:
+        for p in parts:
+            out.append(p)
+            if len(out) >= max_items:
+                break
+    else:
+        step = max_len
+        for i in range(0, len(flat), step):
+            out.append(flat[i : i + step] + ("…" if len(flat) > i + step else ""))
+            if len(out) >= max_items:
+                break
+    return out
+
+
+_TERMINATORS_RE = re.compile(r"[.?!]")
+
+
+@dataclass
+class DocumentStats:
+    char_count: int = 0
+    line_count: int = 1  # len(text.split("\n")) is never 0
+    word_count: int = 0
+    word_chars: int = 0
+    # keyword -> occurrences in the lower-cased text
+    keyword_hits: Dict[str, int] = field(default_factory=dict)
+    head: str = ""
+    lead_sentences: List[str] = field(default_factory=list)
+    key_lines: List[str] = field(default_factory=list)
+
+    @property
+    def subject(self) -> str:
+        for subject, keywords in SUBJECT_KEYWORDS.items():
+            if any(self.keyword_hits.get(k) for k in keywords):
+                return subject
+        return "this topic"
+
+    @property
+    def difficulty(self) -> str:
+        avg_word_length = self.word_chars / max(self.word_count, 1)
+        if avg_word_length < 5:
+            return "Beginner"
+        elif avg_word_length < 7:
+            return "Intermediate"
+        else:
+            return "Advanced"
+
+
+def build_document_stats(texts: Iterable[str]) -> DocumentStats:
+    """
+    Stats for PAGE_SEPARATOR.join(texts), streaming page by page.
+
+    The joined text is never built: the separator is whitespace-only, so
+    words, lines and keywords never span pages, and only the leading
+    characters / sentences / lines are buffered.
+    """
+    stats = DocumentStats()
+    hits: Dict[str, int] = dict.fromkeys(_KEYWORDS, 0)
+    lead_words: List[str] = []
+    closed_parts = 0  # non-empty sentence parts already ended by . ? !
+    open_part = False  # words seen since the last terminator
+    fallback_lines: List[str] = []
+    sep_len = len(PAGE_SEPARATOR)
+
+    for n, text in enumerate(texts):
+        text = text or ""
+        if n:
+            stats.char_count += sep_len
+            stats.line_count += PAGE_SEPARATOR.count("\n")
+            if len(stats.head) < HEAD_CHARS:
+                stats.head = (stats.head + PAGE_SEPARATOR)[:HEAD_CHARS]
+        stats.char_count += len(text)
+        stats.line_count += text.count("\n")
+        if len(stats.head) < HEAD_CHARS:
+            stats.head += text[: HEAD_CHARS - len(stats.head)]
+
+        words = text.split()
+        stats.word_count += len(words)
+        stats.word_chars += sum(map(len, words))
+
+        # One lowered copy per page, scanned while it is still in cache
+        lowered = text.lower()
+        for kw in _KEYWORDS:
+            hits[kw] += lowered.count(kw)
+
+        if closed_parts < LEAD_ITEMS and words:
+            lead_words.extend(words)
+            pieces = _TERMINATORS_RE.split(" ".join(words))
+            if len(pieces) > 1:
+                closed_parts += 1 if (open_part or pieces[0].strip()) else 0
+                closed_parts += sum(1 for p in pieces[1:-1] if p.strip())
+                open_part = bool(pieces[-1].strip())
+            else:
+                open_part = open_part or bool(pieces[0].strip())
+
+        if len(stats.key_lines) < KEY_LINES:
+            for line in text.split("\n"):
+                line = line.strip()
+                if not line:
+                    continue
+                if len(fallback_lines) < KEY_LINES and len(line) > 20:
+                    fallback_lines.append(line)
+                if 30 < len(line) < 150:
+                    stats.key_lines.append(line)
+                    if len(stats.key_lines) >= KEY_LINES:
+                        break
+
+    stats.keyword_hits = {kw: n for kw, n in hits.items() if n}
+    stats.lead_sentences = first_bits(" ".join(lead_words), max_items=LEAD_ITEMS, max_len=LEAD_MAX_LEN)
+    if not stats.key_lines:
+        stats.key_lines = fallback_lines
+    return stats
+
+
+def build_text_stats(content: Optional[str]) -> DocumentStats:
+    """Stats for one already-joined text (callers without per-page input)."""
+    return build_document_stats([content or ""])
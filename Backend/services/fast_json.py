@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from services.metrics import timed
+
+try:  # optional: several times faster than the stdlib encoder on text-heavy payloads
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@timed("serialize")
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON (orjson when installed, stdlib otherwise)."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Default response class for the app.
+
+    FastAPI still runs jsonable_encoder on plain return values; handlers with
+    large payloads return FastJSONResponse(result) directly to skip that walk.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
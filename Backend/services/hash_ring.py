@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import os
+from typing import Dict, Iterable, List
+
+# Virtual nodes per shard: more -> evener split, slightly slower ring rebuilds
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "128"))
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hashing of keys (session ids) onto nodes (shard base URLs).
+
+    Each node owns SHARD_VNODES points on a 64-bit ring; a key belongs to the
+    first point clockwise of its hash. Adding or removing one node only moves
+    the keys of that node's arcs (~1/N of all keys), not a full reshuffle.
+    """
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = SHARD_VNODES):
+        self.vnodes = vnodes
+        self.nodes: List[str] = list(dict.fromkeys(n for n in nodes if n))
+        if not self.nodes:
+            raise ValueError("HashRing needs at least one node")
+        points: Dict[int, str] = {}
+        for node in self.nodes:
+            for i in range(vnodes):
+                points.setdefault(_hash(f"{node}#{i}"), node)
+        self._points = sorted(points)
+        self._owners = [points[p] for p in self._points]
+
+    def owner(self, key: str) -> str:
+        i = bisect.bisect_right(self._points, _hash(key))
+        return self._owners[i % len(self._points)]
+
+    def share(self) -> Dict[str, float]:
+        """Fraction of the ring each node owns (balance check)."""
+        span = 1 << 64
+        out = {n: 0.0 for n in self.nodes}
+        prev = self._points[-1] - span
+        for point, node in zip(self._points, self._owners):
+            out[node] += (point - prev) / span
+            prev = point
+        return out
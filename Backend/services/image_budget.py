@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import io
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image
+
+
+@dataclass
+class ImageBudget:
+    """
+    Size budget applied to images before they are base64-encoded for the model.
+
+    - max_pixels: images above this pixel count are downscaled (aspect kept)
+    - image_format: re-encode target ("JPEG" | "WEBP" | "PNG")
+    - quality: encoder quality for lossy formats
+    - fast_path_bytes: images at or below this size that also fit max_pixels
+      are sent untouched (no decode / re-encode)
+    """
+
+    enabled: bool = True
+    max_pixels: int = 1_600_000
+    image_format: str = "JPEG"
+    quality: int = 85
+    fast_path_bytes: int = 200_000
+
+    @classmethod
+    def from_env(cls) -> "ImageBudget":
+        return cls(
+            enabled=os.getenv("VISION_IMAGE_BUDGET", "1").strip() not in {"0", "false", "no"},
+            max_pixels=int(os.getenv("VISION_IMAGE_MAX_PIXELS", "1600000")),
+            image_format=os.getenv("VISION_IMAGE_FORMAT", "JPEG").strip().upper() or "JPEG",
+            quality=int(os.getenv("VISION_IMAGE_QUALITY", "85")),
+            fast_path_bytes=int(os.getenv("VISION_IMAGE_FAST_PATH_BYTES", "200000")),
+        )
+
+
+# Process-wide default budget (env-configurable)
+IMAGE_BUDGET = ImageBudget.from_env()
+
+
+def _flatten_alpha(img: Image.Image) -> Image.Image:
+    """JPEG has no alpha channel: composite transparent images onto white."""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.split()[-1])
+        return background
+    return img.convert("RGB")
+
+
+def fit_image_to_budget(image_bytes: bytes, budget: Optional[ImageBudget] = None) -> bytes:
+    """
+    Downscale / re-encode image bytes so they fit the budget.
+
+    Returns the original bytes when:
+      - the budget is disabled
+      - the image is already small (fast path, header-only check)
+      - the image cannot be decoded (the model call will report the problem)
+      - re-encoding would not make the payload smaller
+    """
+    budget = budget or IMAGE_BUDGET
+    if not budget.enabled or not image_bytes:
+        return image_bytes
+
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        width, height = img.size  # header only, no pixel decode yet
+    except Exception:
+        return image_bytes
+
+    pixels = width * height
+    needs_resize = budget.max_pixels > 0 and pixels > budget.max_pixels
+
+    if not needs_resize and len(image_bytes) <= budget.fast_path_bytes:
+        return image_bytes
+
+    try:
+        if needs_resize:
+            scale = (budget.max_pixels / float(pixels)) ** 0.5
+            target = (max(1, int(width * scale)), max(1, int(height * scale)))
+            # draft() lets JPEG decode at reduced size directly (no-op for other formats)
+            img.draft("RGB", target)
+            img = img.resize(target, Image.LANCZOS, reducing_gap=2.0)
+
+        fmt = budget.image_format
+        if fmt == "JPEG":
+            img = _flatten_alpha(img)
+        elif img.mode not in ("RGB", "RGBA", "L"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+        out = io.BytesIO()
+        save_kwargs = {}
+        if fmt in ("JPEG", "WEBP"):
+            save_kwargs["quality"] = budget.quality
+        img.save(out, format=fmt, **save_kwargs)
+        encoded = out.getvalue()
+    except Exception as e:
+        print(f"Image budget re-encode failed, sending original: {e}")
+        return image_bytes
+
+    if not needs_resize and len(encoded) >= len(image_bytes):
+        return image_bytes
+    return encoded
@@ -1,16 +1,21 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import requests
 
+from services.metrics import timed
+from services.model_endpoints import MODEL_ENDPOINTS
+from services.model_scheduler import MODEL_SCHEDULER, PRIORITY_INTERACTIVE
+from services.response_cache import RESPONSE_CACHE, payload_cache_keys
+from services.single_flight import MODEL_CALLS
+
 
 class LLMTextError(RuntimeError):
     pass
 
 
-OLLAMA_UNIFIED_URL = os.getenv("OLLAMA_UNIFIED_URL", "").strip()
 OLLAMA_MODEL_ID = os.getenv(
     "OLLAMA_MODEL_ID",
     "redule26/huihui_ai_qwen2.5-vl-7b-abliterated",
@@ -20,11 +25,22 @@ _DEFAULT_SYSTEM = "You are a concise, accurate tutor. Keep answers short and gro
 
 
 def ask_llm_text(
-    *, query: str, system_hint: Optional[str] = None, timeout_seconds: int = 60
+    *,
+    query: str,
+    system_hint: Optional[str] = None,
+    timeout_seconds: int = 60,
+    priority: int = PRIORITY_INTERACTIVE,
+    conversation_context: Optional[List[int]] = None,
+    keep_alive: Optional[str] = None,
 ) -> Dict[str, Any]:
-    """Send a text-only prompt to the unified Ollama endpoint."""
-    if not OLLAMA_UNIFIED_URL:
-        raise LLMTextError("Missing OLLAMA_UNIFIED_URL in environment")
+    """
+    Send a text-only prompt to the unified Ollama endpoint.
+
+    conversation_context continues a previous answer's `context` token array
+    (see ask_vision_model); such follow-ups bypass the cache and coalescing.
+    """
+    if not MODEL_ENDPOINTS.endpoints:
+        raise LLMTextError("Missing OLLAMA_UNIFIED_URL(S) in environment")
     if not query or not query.strip():
         raise LLMTextError("Missing query")
 
@@ -41,9 +57,55 @@ def ask_llm_text(
             "max_tokens": 400,
         },
     }
+    if keep_alive:
+        payload["keep_alive"] = keep_alive
+
+    if conversation_context:
+        payload.pop("system")
+        payload["context"] = list(conversation_context)
+        return MODEL_SCHEDULER.run(
+            lambda: _post_generate(payload, timeout_seconds, hedge=priority == PRIORITY_INTERACTIVE),
+            priority=priority,
+        )
+
+    cache = RESPONSE_CACHE
+    cache_keys = payload_cache_keys(payload)
+    if cache is not None:
+        cached = cache.get(*cache_keys)
+        if cached is not None:
+            return dict(cached)
+
+    def call_model() -> Dict[str, Any]:
+        # Waits for a scheduler slot; raises SchedulerBusyError when overloaded.
+        result = MODEL_SCHEDULER.run(
+            # Only interactive calls are worth a hedged duplicate request
+            # (read at run time: an interactive caller may have joined meanwhile).
+            lambda: _post_generate(
+                payload, timeout_seconds, hedge=admission.priority == PRIORITY_INTERACTIVE
+            ),
+            admission=admission,
+        )
+        if cache is not None:
+            cache.put(result, *cache_keys)
+        return result
+
+    # Identical concurrent prompts share one upstream generation;
+    # a more urgent caller joining a queued call promotes it to its priority.
+    admission = MODEL_SCHEDULER.admission(priority)
+    return dict(
+        MODEL_CALLS.do(
+            f"text:{cache_keys[0]}",
+            call_model,
+            shared=admission,
+            on_join=lambda leader: MODEL_SCHEDULER.promote(leader, admission),
+        )
+    )
+
 
+@timed("model_call")
+def _post_generate(payload: Dict[str, Any], timeout_seconds: int, hedge: bool) -> Dict[str, Any]:
     try:
-        resp = requests.post(OLLAMA_UNIFIED_URL, json=payload, timeout=timeout_seconds)
+        resp = MODEL_ENDPOINTS.post(payload, timeout=timeout_seconds, hedge=hedge)
     except requests.RequestException as e:  # network / connection issues
         raise LLMTextError(f"Failed to reach text model: {e}") from e
 
@@ -0,0 +1,105 @@
+"""
+Approximate memory footprint of session data, per derived structure.
+
+Sizes come from sys.getsizeof on the containers and strings a structure
+holds (shared small objects and allocator overhead are ignored), so they are
+estimates meant for ranking sessions, not exact RSS. Each estimate is taken
+once when its structure is built (upload, import, first lazy use) and cached
+on the document, so reading the accounting never walks the data again.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from typing import Any, Dict, Iterable, List, Optional
+
+# Document structures, in the order they are reported
+DOC_STRUCTURES = ("content", "pages", "passage_index", "stats", "summary", "mode_explanations")
+
+_INT = sys.getsizeof(10**6)  # a non-cached int object
+_OBJECT = 56 + 104  # small instance + its __dict__ (dataclasses without slots)
+
+
+def _str_bytes(values: Iterable[Optional[str]]) -> int:
+    return sum(sys.getsizeof(v) for v in values if v is not None)
+
+
+def _list_bytes(values: List[Any]) -> int:
+    return sys.getsizeof(values)
+
+
+def pages_bytes(pages: List[Any]) -> int:
+    return _list_bytes(pages) + sum(_OBJECT + sys.getsizeof(p.text) for p in pages)
+
+
+def passage_index_bytes(index: Any) -> int:
+    if index is None:
+        return 0
+    total = _list_bytes(index.passages) + len(index.passages) * (_OBJECT + 3 * _INT)
+    total += sys.getsizeof(index.postings)
+    for term, ids in index.postings.items():
+        total += sys.getsizeof(term) + _list_bytes(ids)
+    total += sys.getsizeof(index.page_terms) + sum(sys.getsizeof(t) for t in index.page_terms.values())
+    # _page_text holds references to the page strings, counted under "pages"
+    total += sys.getsizeof(index._page_text)
+    return total
+
+
+def stats_bytes(stats: Any) -> int:
+    if stats is None:
+        return 0
+    return (
+        _OBJECT
+        + sys.getsizeof(stats.keyword_hits)
+        + _str_bytes(stats.keyword_hits)
+        + sys.getsizeof(stats.head)
+        + _list_bytes(stats.lead_sentences)
+        + _str_bytes(stats.lead_sentences)
+        + _list_bytes(stats.key_lines)
+        + _str_bytes(stats.key_lines)
+    )
+
+
+def summary_bytes(summary: Any) -> int:
+    if summary is None:
+        return 0
+    total = _OBJECT + _list_bytes(summary.sentences)
+    for s in summary.sentences:
+        total += _OBJECT + sys.getsizeof(s.text) + _list_bytes(s.terms) + _str_bytes(s.terms)
+    return total
+
+
+def json_bytes(value: Any) -> int:
+    """Serialized size as a stand-in for nested dicts/lists of plain values."""
+    if not value:
+        return 0
+    return len(json.dumps(value, ensure_ascii=False, default=str))
+
+
+def model_context_bytes(contexts: Dict[str, Any]) -> int:
+    return sum(
+        _OBJECT + sys.getsizeof(c.anchor) + _list_bytes(c.tokens) + len(c.tokens) * _INT
+        for c in contexts.values()
+    )
+
+
+def measure_document(doc: Any, structures: Iterable[str] = DOC_STRUCTURES) -> Dict[str, int]:
+    """Refresh doc.memory for `structures` (all by default) and return it."""
+    for name in structures:
+        if name == "content":
+            size = len(doc.content) if doc.content else 0
+        elif name == "pages":
+            size = pages_bytes(doc.pages)
+        elif name == "passage_index":
+            size = passage_index_bytes(doc.passage_index)
+        elif name == "stats":
+            size = stats_bytes(doc.stats)
+        elif name == "summary":
+            size = summary_bytes(doc.summary)
+        elif name == "mode_explanations":
+            size = json_bytes(doc.mode_explanations)
+        else:
+            raise ValueError(f"Unknown document structure: {name}")
+        doc.memory[name] = size
+    return doc.memory
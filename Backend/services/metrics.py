@@ -0,0 +1,220 @@
+"""
+Per-stage latency histograms, exposed at /metrics in Prometheus text format.
+
+- `with stage("ocr"):` / `@timed("ocr")` times one pipeline stage
+  (upload_read, extract, ocr, retrieval, prompt_build, model_call,
+  serialize, ...); the outcome label is "error" when the block raises.
+- StageMetricsMiddleware labels everything observed while serving a request
+  with its route template (endpoint) and records the whole request as the
+  "request" stage (outcome from the status code), ending at the last body
+  chunk so background tasks that run after the response are not included.
+- The doc type label is passed explicitly where a stage knows it (the
+  extraction backend) or set per request with set_doc_type().
+- Labels travel in a contextvar, so stages that run in the threadpool or in
+  background tasks keep the endpoint they were started from.
+"""
+
+from __future__ import annotations
+
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from starlette.routing import Match
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").strip().lower() not in {"0", "false", "no"}
+
+# Histogram bucket upper bounds (seconds)
+STAGE_BUCKETS = tuple(
+    float(b)
+    for b in os.getenv(
+        "METRICS_STAGE_BUCKETS",
+        "0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60",
+    ).split(",")
+    if b.strip()
+)
+
+_METRIC = "insighthub_stage_duration_seconds"
+_F = TypeVar("_F", bound=Callable)
+_NO_DOC_TYPE = "none"
+
+
+class _RequestLabels:
+    __slots__ = ("endpoint", "doc_type")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.doc_type = _NO_DOC_TYPE
+
+
+_labels: ContextVar[Optional[_RequestLabels]] = ContextVar("metrics_labels", default=None)
+
+
+class StageHistograms:
+    def __init__(self, buckets: Tuple[float, ...] = STAGE_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # (stage, endpoint, doc_type, outcome) -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, str, str, str], list] = {}
+
+    def observe(self, stage: str, seconds: float, endpoint: str, doc_type: str, outcome: str) -> None:
+        key = (stage, endpoint, doc_type, outcome)
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            snapshot = [(key, list(s[0]), s[1], s[2]) for key, s in sorted(self._series.items())]
+        lines = [
+            f"# HELP {_METRIC} Time spent in each request pipeline stage.",
+            f"# TYPE {_METRIC} histogram",
+        ]
+        bounds = [_format_bound(b) for b in self.buckets] + ["+Inf"]
+        for (stage, endpoint, doc_type, outcome), counts, total, count in snapshot:
+            labels = (
+                f'stage="{_escape(stage)}",endpoint="{_escape(endpoint)}",'
+                f'doc_type="{_escape(doc_type)}",outcome="{_escape(outcome)}"'
+            )
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                lines.append(f'{_METRIC}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{_METRIC}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{_METRIC}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_bound(bound: float) -> str:
+    return repr(bound) if bound != int(bound) else f"{int(bound)}.0"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def set_doc_type(doc_types: Iterable[str]) -> None:
+    """Doc type label for the rest of the current request ("mixed" for several)."""
+    labels = _labels.get()
+    if labels is None:
+        return
+    kinds = {t for t in doc_types if t}
+    labels.doc_type = kinds.pop() if len(kinds) == 1 else ("mixed" if kinds else _NO_DOC_TYPE)
+
+
+def observe_stage(stage_name: str, seconds: float, doc_type: Optional[str] = None, outcome: str = "ok") -> None:
+    if not METRICS_ENABLED:
+        return
+    labels = _labels.get()
+    STAGE_METRICS.observe(
+        stage_name,
+        seconds,
+        labels.endpoint if labels is not None else "background",
+        doc_type or (labels.doc_type if labels is not None else _NO_DOC_TYPE),
+        outcome,
+    )
+
+
+@contextmanager
+def stage(stage_name: str, doc_type: Optional[str] = None) -> Iterator[None]:
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        observe_stage(stage_name, time.perf_counter() - started, doc_type, outcome)
+
+
+def timed(stage_name: str) -> Callable[[_F], _F]:
+    """Decorator form of stage() for functions that are one stage as a whole."""
+
+    def decorate(fn: _F) -> _F:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def route_template(scope) -> str:
+    app = scope.get("app")
+    partial = None
+    for route in getattr(getattr(app, "router", None), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+        if match == Match.PARTIAL and partial is None:
+            partial = getattr(route, "path", None)
+    return partial or "unmatched"
+
+
+def _outcome(status: Optional[int]) -> str:
+    if status is None or status >= 500:
+        return "error"
+    if status >= 400:
+        return "client_error"
+    return "ok"
+
+
+class StageMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        labels = _RequestLabels(route_template(scope))
+        token = _labels.set(labels)
+        status: List[Optional[int]] = [None if scope["type"] == "http" else 101]
+        finished = [False]
+        started = time.perf_counter()
+
+        def finish() -> None:
+            if not finished[0]:
+                finished[0] = True
+                observe_stage("request", time.perf_counter() - started, outcome=_outcome(status[0]))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+            # Starlette runs BackgroundTasks after the last body chunk, still inside self.app
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            if not finished[0]:
+                status[0] = None
+            raise
+        finally:
+            finish()
+            _labels.reset(token)
+
+
+# Global registry (process-wide; one scrape target per backend process / shard)
+STAGE_METRICS = StageHistograms()
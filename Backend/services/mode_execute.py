@@ -2,7 +2,9 @@
 Service for generating mode-specific explanations and content.
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+from services.doc_stats import DocumentStats, build_text_stats
 
 
 def _bullets(lines: List[str], max_items: int = 4, max_len: int = 120) -> str:
@@ -19,25 +21,13 @@ def _bullets(lines: List[str], max_items: int = 4, max_len: int = 120) -> str:
     return "\n".join(out)
 
 
-def _first_bits(content: str, max_items: int = 3, max_len: int = 120) -> List[str]:
-    flat = " ".join((content or "").split())
-    parts = [p.strip() for p in flat.replace("?", ".").replace("!", ".").split(".") if p.strip()]
-    out: List[str] = []
-    if parts:
-        for p in parts:
-            out.append(p)
-            if len(out) >= max_items:
-                break
-    else:
-        step = max_len
-        for i in range(0, len(flat), step):
-            out.append(flat[i : i + step] + ("…" if len(flat) > i + step else ""))
-            if len(out) >= max_items:
-                break
-    return out
-
-
-def generate_mode_explanation(mode: str, content: str, filename: str) -> Dict[str, Any]:
+def generate_mode_explanation(
+    mode: str,
+    content: str,
+    filename: str,
+    stats: Optional[DocumentStats] = None,
+    key_points: Optional[List[str]] = None,
+) -> Dict[str, Any]:
     """
     Generate mode-specific explanations based on the learning mode.
 
@@ -45,34 +35,42 @@ def generate_mode_explanation(mode: str, content: str, filename: str) -> Dict[st
         mode: The learning mode (student, teacher, exam, revision)
         content: The extracted text content
         filename: Name of the document
+        stats: Precomputed DocumentStats for `content` (built from it when missing;
+            when given, `content` is not read)
+        key_points: Ranked summary sentences for revision mode (the document's
+            extractive summary); the stats' leading key lines are used otherwise
 
     Returns:
         Dictionary containing mode-specific explanation and metadata
     """
+    stats = stats or build_text_stats(content)
 
     if mode == "student":
-        return generate_student_explanation(content, filename)
+        return generate_student_explanation(content, filename, stats)
     elif mode == "teacher":
-        return generate_teacher_explanation(content, filename)
+        return generate_teacher_explanation(content, filename, stats)
     elif mode == "exam":
-        return generate_exam_explanation(content, filename)
+        return generate_exam_explanation(content, filename, stats)
     elif mode == "revision":
-        return generate_revision_explanation(content, filename)
+        return generate_revision_explanation(content, filename, stats, key_points)
     else:
         return {
             "title": "Unknown Mode",
             "summary": "The selected mode is not supported.",
-            "content": content[:500] + "..." if len(content) > 500 else content,
+            "content": stats.head[:500] + "..." if stats.char_count > 500 else stats.head,
         }
 
 
-def generate_student_explanation(content: str, filename: str) -> Dict[str, Any]:
+def generate_student_explanation(
+    content: str, filename: str, stats: Optional[DocumentStats] = None
+) -> Dict[str, Any]:
     """Generate student-friendly explanation."""
-    concepts = _first_bits(content, max_items=3, max_len=120)
+    stats = stats or build_text_stats(content)
+    concepts = list(stats.lead_sentences[:3])
 
     summary = _bullets([
         f"Document: {filename}",
-        f"Subject: {extract_subject(content)}",
+        f"Subject: {stats.subject}",
         *concepts,
         "Next: read key points, ask a question, try one example",
     ], max_items=4, max_len=120)
@@ -82,16 +80,19 @@ def generate_student_explanation(content: str, filename: str) -> Dict[str, Any]:
         "summary": summary,
         "mode": "student",
         "learning_points": concepts,
-        "estimated_time": f"{len(content) // 1000 + 5} minutes",
+        "estimated_time": f"{stats.char_count // 1000 + 5} minutes",
     }
 
 
-def generate_teacher_explanation(content: str, filename: str) -> Dict[str, Any]:
+def generate_teacher_explanation(
+    content: str, filename: str, stats: Optional[DocumentStats] = None
+) -> Dict[str, Any]:
     """Generate teacher-focused explanation for lesson planning."""
+    stats = stats or build_text_stats(content)
 
     summary = _bullets([
         f"Teach: {filename}",
-        f"Topic: {extract_subject(content)}",
+        f"Topic: {stats.subject}",
         "Objectives: clarity, examples, engage, quick assess",
         "Plan: intro 5m · explain 15m · Q&A 10m · quiz 5m",
         "Emphasize: simple words, real-world link, visuals",
@@ -101,13 +102,16 @@ def generate_teacher_explanation(content: str, filename: str) -> Dict[str, Any]:
         "title": f"Teaching Guide: {filename}",
         "summary": summary,
         "mode": "teacher",
-        "teaching_duration": f"{len(content) // 1500 + 15} minutes",
-        "difficulty_level": assess_difficulty(content),
+        "teaching_duration": f"{stats.char_count // 1500 + 15} minutes",
+        "difficulty_level": stats.difficulty,
     }
 
 
-def generate_exam_explanation(content: str, filename: str) -> Dict[str, Any]:
+def generate_exam_explanation(
+    content: str, filename: str, stats: Optional[DocumentStats] = None
+) -> Dict[str, Any]:
     """Generate exam-focused content with practice questions."""
+    stats = stats or build_text_stats(content)
 
     # Generate sample questions based on content
     questions = generate_sample_questions(content)
@@ -126,22 +130,28 @@ def generate_exam_explanation(content: str, filename: str) -> Dict[str, Any]:
         "summary": summary,
         "mode": "exam",
         "practice_questions": questions,
-        "topics_count": len(content.split("\n")),
+        "topics_count": stats.line_count,
     }
 
 
-def generate_revision_explanation(content: str, filename: str) -> Dict[str, Any]:
+def generate_revision_explanation(
+    content: str,
+    filename: str,
+    stats: Optional[DocumentStats] = None,
+    key_points: Optional[List[str]] = None,
+) -> Dict[str, Any]:
     """Generate quick revision notes."""
+    stats = stats or build_text_stats(content)
 
-    # Extract main points for quick revision
-    key_points = extract_key_points(content)
+    # Main points for quick revision: summary sentences, else candidate key lines
+    key_points = list(key_points) if key_points else list(stats.key_lines)
 
     summary = _bullets([
         f"Revision: {filename}",
-        f"Quick gist: {(content[:100].strip() + '…') if content else 'n/a'}",
+        f"Quick gist: {(stats.head[:100].strip() + '…') if stats.char_count else 'n/a'}",
         *[f"Point: {p}" for p in key_points],
         "Checklist: review, look at visuals, self-test, note gaps",
-        f"Time: {len(content) // 2000 + 3} min",
+        f"Time: {stats.char_count // 2000 + 3} min",
     ], max_items=6, max_len=120)
 
     return {
@@ -149,41 +159,9 @@ def generate_revision_explanation(content: str, filename: str) -> Dict[str, Any]
         "summary": summary,
         "mode": "revision",
         "key_points": key_points,
-        "revision_time": f"{len(content) // 2000 + 3} minutes",
-    }
-
-
-def extract_subject(content: str) -> str:
-    """Extract likely subject from content (simplified)."""
-    content_lower = content.lower()
-
-    subjects = {
-        "mathematics": ["equation", "theorem", "proof", "calculate", "formula"],
-        "science": ["experiment", "hypothesis", "research", "theory", "observation"],
-        "programming": ["code", "function", "algorithm", "variable", "class"],
-        "history": ["century", "war", "empire", "dynasty", "period"],
-        "literature": ["author", "poem", "novel", "character", "theme"],
+        "revision_time": f"{stats.char_count // 2000 + 3} minutes",
     }
 
-    for subject, keywords in subjects.items():
-        if any(keyword in content_lower for keyword in keywords):
-            return subject
-
-    return "this topic"
-
-
-def assess_difficulty(content: str) -> str:
-    """Assess content difficulty level."""
-    words = content.split()
-    avg_word_length = sum(len(word) for word in words) / max(len(words), 1)
-
-    if avg_word_length < 5:
-        return "Beginner"
-    elif avg_word_length < 7:
-        return "Intermediate"
-    else:
-        return "Advanced"
-
 
 def generate_sample_questions(content: str) -> list:
     """Generate sample questions from content."""
@@ -197,23 +175,3 @@ def generate_sample_questions(content: str) -> list:
     ]
 
     return questions[:3]  # Return top 3
-
-
-def extract_key_points(content: str) -> list:
-    """Extract key points for revision."""
-    lines = [line.strip() for line in content.split("\n") if line.strip()]
-
-    # Filter for likely important lines (simplified heuristic)
-    key_points = []
-    for line in lines:
-        # Look for lines that seem like headings or important statements
-        if len(line) > 30 and len(line) < 150:
-            key_points.append(line)
-        if len(key_points) >= 5:
-            break
-
-    if not key_points:
-        # Fallback to first few substantial lines
-        key_points = [line for line in lines if len(line) > 20][:5]
-
-    return key_points
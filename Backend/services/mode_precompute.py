@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.doc_stats import DocumentStats, build_document_stats
+from services.memory_accounting import measure_document
+from services.mode_execute import generate_mode_explanation
+from services.session_store import DocumentData, PageData
+from services.summarizer import DocumentSummary, summarize_pages
+
+MODES = ("student", "teacher", "exam", "revision")
+
+# Summary sentences used as revision-mode key points
+REVISION_KEY_POINTS = 5
+
+# Explanations memoized by (content hash, filename, mode) across sessions
+MODE_MEMO_MAX_ENTRIES = int(os.getenv("MODE_MEMO_MAX_ENTRIES", "512"))
+
+_memo: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def pages_content_hash(pages: List[PageData]) -> str:
+    h = hashlib.sha256()
+    for p in pages:
+        h.update((p.text or "").encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _memo_get(key: Tuple[str, str, str]) -> Optional[Dict[str, Any]]:
+    with _memo_lock:
+        value = _memo.get(key)
+        if value is not None:
+            _memo.move_to_end(key)
+        return value
+
+
+def _memo_put(key: Tuple[str, str, str], value: Dict[str, Any]) -> None:
+    with _memo_lock:
+        _memo[key] = value
+        _memo.move_to_end(key)
+        while len(_memo) > MODE_MEMO_MAX_ENTRIES:
+            _memo.popitem(last=False)
+
+
+def mode_explanation_for(
+    pages: List[PageData],
+    filename: str,
+    mode: str,
+    content_hash: Optional[str] = None,
+    stats: Optional[DocumentStats] = None,
+    summary: Optional[DocumentSummary] = None,
+) -> Dict[str, Any]:
+    """Memoized generate_mode_explanation for a page list."""
+    content_hash = content_hash or pages_content_hash(pages)
+    key = (content_hash, filename, mode)
+    cached = _memo_get(key)
+    if cached is not None:
+        return cached
+    stats = stats or build_document_stats(p.text for p in pages)
+    key_points = None
+    if mode == "revision":
+        summary = summary or summarize_pages(pages)
+        key_points = summary.top(REVISION_KEY_POINTS)
+    # The generators read only the stats, so the joined text is never built
+    explanation = generate_mode_explanation(mode, "", filename, stats=stats, key_points=key_points)
+    _memo_put(key, explanation)
+    return explanation
+
+
+def precompute_mode_explanations(doc: DocumentData) -> None:
+    """
+    Fill doc.mode_explanations for all modes (run as a background task after upload).
+    Every mode reads the document's ingest-time stats.
+    """
+    content_hash = doc.content_hash or pages_content_hash(doc.pages)
+    doc.content_hash = content_hash
+    stats = doc.get_stats()
+    doc.mode_explanations = {
+        mode: mode_explanation_for(
+            doc.pages,
+            doc.filename,
+            mode,
+            content_hash,
+            stats,
+            doc.get_summary() if mode == "revision" else None,
+        )
+        for mode in MODES
+    }
+    measure_document(doc, ["mode_explanations"])
+
+
+def get_mode_explanation(doc: DocumentData, mode: str) -> Dict[str, Any]:
+    """Stored result when precomputed; otherwise computed (and memoized) now."""
+    stored = doc.mode_explanations.get(mode)
+    if stored is not None:
+        return stored
+    doc.content_hash = doc.content_hash or pages_content_hash(doc.pages)
+    explanation = mode_explanation_for(
+        doc.pages,
+        doc.filename,
+        mode,
+        doc.content_hash,
+        doc.get_stats(),
+        doc.get_summary() if mode == "revision" else None,
+    )
+    doc.mode_explanations[mode] = explanation
+    measure_document(doc, ["mode_explanations"])
+    return explanation
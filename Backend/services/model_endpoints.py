@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from services.model_scheduler import MODEL_SCHEDULER, ModelScheduler
+
+# One or more Ollama /api/generate URLs (comma separated). OLLAMA_UNIFIED_URL still works.
+OLLAMA_UNIFIED_URLS = [
+    u.strip()
+    for u in (os.getenv("OLLAMA_UNIFIED_URLS") or os.getenv("OLLAMA_UNIFIED_URL", "")).split(",")
+    if u.strip()
+]
+MODEL_BREAKER_FAILURES = int(os.getenv("MODEL_BREAKER_FAILURES", "3"))
+MODEL_BREAKER_OPEN_SECONDS = float(os.getenv("MODEL_BREAKER_OPEN_SECONDS", "30"))
+MODEL_HEALTH_INTERVAL_SECONDS = float(os.getenv("MODEL_HEALTH_INTERVAL_SECONDS", "10"))
+MODEL_HEDGE_ENABLED = os.getenv("MODEL_HEDGE_ENABLED", "0").strip() in {"1", "true", "yes"}
+MODEL_HEDGE_MIN_SAMPLES = int(os.getenv("MODEL_HEDGE_MIN_SAMPLES", "20"))
+
+_BREAKER_CLOSED = "closed"
+_BREAKER_OPEN = "open"
+_BREAKER_HALF_OPEN = "half_open"
+
+
+class NoEndpointAvailableError(requests.ConnectionError):
+    """Every configured endpoint is unhealthy or has an open circuit breaker."""
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+class EndpointState:
+    def __init__(self, url: str):
+        self.url = url
+        parts = urlsplit(url)
+        self.health_url = f"{parts.scheme}://{parts.netloc}/"
+        self.outstanding = 0
+        self.healthy = True
+        self.breaker = _BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.requests = 0
+        self.failures = 0
+        self.latencies: Deque[float] = deque(maxlen=200)
+
+
+class EndpointPool:
+    """
+    Routes model calls across Ollama replicas.
+
+    - Least-outstanding-requests selection among healthy endpoints.
+    - Per-endpoint circuit breaker: opens after `failure_threshold` consecutive
+      failures, lets one trial request through after `open_seconds`.
+    - Background health checks (GET on the server root) when >1 endpoint.
+    - Optional hedging: if the primary has not answered after the pool's p95
+      latency, the same request is sent to a second endpoint; first success wins.
+      A hedge takes its own `scheduler` slot and is skipped when none is idle,
+      so duplicates never push the model past its concurrency limit.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        *,
+        failure_threshold: int = MODEL_BREAKER_FAILURES,
+        open_seconds: float = MODEL_BREAKER_OPEN_SECONDS,
+        health_interval: float = MODEL_HEALTH_INTERVAL_SECONDS,
+        hedge_enabled: bool = MODEL_HEDGE_ENABLED,
+        hedge_min_samples: int = MODEL_HEDGE_MIN_SAMPLES,
+        scheduler: Optional[ModelScheduler] = None,
+    ):
+        self.endpoints = [EndpointState(u) for u in urls]
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.health_interval = health_interval
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_samples = hedge_min_samples
+        self.scheduler = scheduler
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.hedges_skipped = 0
+        self._latencies: Deque[float] = deque(maxlen=500)
+        self._lock = threading.Lock()
+        self._health_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def urls(self) -> List[str]:
+        return [e.url for e in self.endpoints]
+
+    # --- selection / breaker -------------------------------------------------
+
+    def _available_locked(self, ep: EndpointState, now: float) -> bool:
+        if ep.breaker == _BREAKER_CLOSED:
+            return True
+        if ep.breaker == _BREAKER_OPEN and now - ep.opened_at >= self.open_seconds:
+            ep.breaker = _BREAKER_HALF_OPEN
+            ep.trial_in_flight = False
+        return ep.breaker == _BREAKER_HALF_OPEN and not ep.trial_in_flight
+
+    def _acquire(self, exclude: Optional[EndpointState] = None) -> EndpointState:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                e for e in self.endpoints if e is not exclude and self._available_locked(e, now)
+            ]
+            healthy = [e for e in candidates if e.healthy]
+            pool = healthy or candidates
+            if not pool:
+                raise NoEndpointAvailableError("No model endpoint available (all circuits open)")
+            ep = min(pool, key=lambda e: e.outstanding)
+            if ep.breaker == _BREAKER_HALF_OPEN:
+                ep.trial_in_flight = True
+            ep.outstanding += 1
+            ep.requests += 1
+            return ep
+
+    def _release(self, ep: EndpointState, ok: bool, latency: float) -> None:
+        with self._lock:
+            ep.outstanding -= 1
+            if ok:
+                ep.consecutive_failures = 0
+                ep.breaker = _BREAKER_CLOSED
+                ep.trial_in_flight = False
+                ep.latencies.append(latency)
+                self._latencies.append(latency)
+                return
+            ep.failures += 1
+            ep.consecutive_failures += 1
+            if ep.breaker == _BREAKER_HALF_OPEN or ep.consecutive_failures >= self.failure_threshold:
+                ep.breaker = _BREAKER_OPEN
+                ep.opened_at = time.monotonic()
+                ep.trial_in_flight = False
+
+    # --- requests ------------------------------------------------------------
+
+    def _post_to(self, ep: EndpointState, payload: Dict[str, Any], timeout: float) -> requests.Response:
+        started = time.monotonic()
+        ok = False
+        try:
+            resp = requests.post(ep.url, json=payload, timeout=timeout)
+            # 5xx counts against the endpoint; 4xx is the caller's problem.
+            ok = resp.status_code < 500
+            return resp
+        finally:
+            self._release(ep, ok, time.monotonic() - started)
+
+    def hedge_delay(self) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            return _percentile(list(self._latencies), 0.95)
+
+    def post(self, payload: Dict[str, Any], *, timeout: float, hedge: bool = False) -> requests.Response:
+        """POST a generate payload to the best endpoint (optionally hedged)."""
+        self._ensure_health_checks()
+        ep = self._acquire()
+
+        delay = self.hedge_delay() if (hedge and self.hedge_enabled and len(self.endpoints) > 1) else None
+        if delay is None:
+            return self._post_to(ep, payload, timeout)
+
+        executor = self._executor()
+        primary = executor.submit(self._post_to, ep, payload, timeout)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        if self.scheduler is not None and not self.scheduler.try_acquire():
+            with self._lock:
+                self.hedges_skipped += 1
+            return primary.result()
+        try:
+            backup_ep = self._acquire(exclude=ep)
+        except NoEndpointAvailableError:
+            if self.scheduler is not None:
+                self.scheduler.release()
+            return primary.result()
+        with self._lock:
+            self.hedges_sent += 1
+        backup = executor.submit(self._post_hedge, backup_ep, payload, timeout)
+
+        pending = {primary, backup}
+        last_error: Optional[BaseException] = None
+        last_resp: Optional[requests.Response] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    resp = fut.result()
+                except requests.RequestException as e:
+                    last_error = e
+                    continue
+                if resp.status_code < 500:
+                    if fut is backup:
+                        with self._lock:
+                            self.hedges_won += 1
+                    return resp
+                last_resp = resp
+        if last_resp is not None:
+            return last_resp
+        raise last_error  # type: ignore[misc]
+
+    def _post_hedge(self, ep: EndpointState, payload: Dict[str, Any], timeout: float) -> requests.Response:
+        # Holds the scheduler slot taken in post() until the duplicate finishes,
+        # even when the primary has already won.
+        started = time.monotonic()
+        try:
+            return self._post_to(ep, payload, timeout)
+        finally:
+            if self.scheduler is not None:
+                self.scheduler.release(time.monotonic() - started)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(
+                    max_workers=max(4, 4 * len(self.endpoints)), thread_name_prefix="model-hedge"
+                )
+            return self._hedge_pool
+
+    # --- health checks -------------------------------------------------------
+
+    def check_health(self) -> None:
+        for ep in self.endpoints:
+            try:
+                ok = requests.get(ep.health_url, timeout=2).status_code < 500
+            except requests.RequestException:
+                ok = False
+            with self._lock:
+                ep.healthy = ok
+                if ok and ep.breaker == _BREAKER_OPEN:
+                    # Recovered replica: allow a trial request right away.
+                    ep.opened_at = time.monotonic() - self.open_seconds
+
+    def _health_loop(self) -> None:
+        while not self._stop.wait(self.health_interval):
+            self.check_health()
+
+    def _ensure_health_checks(self) -> None:
+        if len(self.endpoints) < 2 or self.health_interval <= 0 or self._health_thread is not None:
+            return
+        with self._lock:
+            if self._health_thread is None:
+                self._health_thread = threading.Thread(
+                    target=self._health_loop, name="model-health", daemon=True
+                )
+                self._health_thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = []
+            for e in self.endpoints:
+                lat = list(e.latencies)
+                endpoints.append(
+                    {
+                        "url": e.url,
+                        "healthy": e.healthy,
+                        "breaker": e.breaker,
+                        "outstanding": e.outstanding,
+                        "requests": e.requests,
+                        "failures": e.failures,
+                        "latency_p50_seconds": _percentile(lat, 0.5) if lat else None,
+                        "latency_p95_seconds": _percentile(lat, 0.95) if lat else None,
+                    }
+                )
+            return {
+                "endpoints": endpoints,
+                "hedge_enabled": self.hedge_enabled,
+                "hedges_sent": self.hedges_sent,
+                "hedges_won": self.hedges_won,
+                "hedges_skipped": self.hedges_skipped,
+            }
+
+
+# Global pool used by the text and vision model clients
+MODEL_ENDPOINTS = EndpointPool(OLLAMA_UNIFIED_URLS, scheduler=MODEL_SCHEDULER)
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Priority classes (lower runs first)
+PRIORITY_INTERACTIVE = 0  # Vision Tutor questions, /modes/ask fallback
+PRIORITY_BULK = 1  # per-image analyses in process-mode-with-vision
+
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BULK: "bulk"}
+
+MODEL_MAX_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", "2"))
+MODEL_MAX_QUEUE = int(os.getenv("MODEL_MAX_QUEUE", "32"))  # per priority class
+MODEL_QUEUE_TIMEOUT_SECONDS = float(os.getenv("MODEL_QUEUE_TIMEOUT_SECONDS", "30"))
+
+
+class SchedulerBusyError(RuntimeError):
+    """Raised when a model call cannot be queued (queue full / waited too long)."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Admission:
+    """
+    Priority and queue deadline of one model call. Callers coalesced onto a
+    call that is still queued may promote it (see ModelScheduler.promote).
+    """
+
+    def __init__(self, priority: int, deadline: float):
+        self.priority = priority
+        self.deadline = deadline  # time.monotonic() after which it stops waiting
+        self.ticket: Optional[Tuple[int, int]] = None  # heap entry while queued
+
+
+class ModelScheduler:
+    """
+    Central gate for upstream model calls.
+
+    - At most `max_concurrency` calls run at once.
+    - Waiting calls are served by priority class, FIFO within a class.
+    - Each class may queue at most `max_queue` calls; beyond that (or after
+      waiting `queue_timeout` seconds) SchedulerBusyError carries a Retry-After hint.
+    - run(queue_timeout=...) shortens the wait for one call (e.g. what is left of
+      a batch deadline); a call whose budget is already spent never takes a slot.
+    - try_acquire()/release() hand out a slot only when one is idle, for
+      speculative calls (hedged requests) that must never delay queued work.
+    - promote() moves a queued call to a higher class / shorter deadline when
+      an identical, more urgent call is coalesced onto it.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = MODEL_MAX_CONCURRENCY,
+        max_queue: int = MODEL_MAX_QUEUE,
+        queue_timeout: float = MODEL_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting: List[Tuple[int, int]] = []  # heap of (priority, seq)
+        self._queued: Dict[int, int] = {p: 0 for p in _PRIORITY_NAMES}
+        self._seq = itertools.count()
+
+        # metrics
+        self._completed = 0
+        self._rejected: Dict[int, int] = {p: 0 for p in _PRIORITY_NAMES}
+        self._wait_total: Dict[int, float] = {p: 0.0 for p in _PRIORITY_NAMES}
+        self._wait_count: Dict[int, int] = {p: 0 for p in _PRIORITY_NAMES}
+        self._wait_max: Dict[int, float] = {p: 0.0 for p in _PRIORITY_NAMES}
+        self._service_ewma = 5.0  # seconds, seeds the Retry-After estimate
+
+    def _retry_after_locked(self) -> int:
+        depth = len(self._waiting) + self._active
+        return max(1, math.ceil(self._service_ewma * depth / self.max_concurrency))
+
+    def admission(self, priority: int = PRIORITY_INTERACTIVE, queue_timeout: Optional[float] = None) -> Admission:
+        limit = self.queue_timeout if queue_timeout is None else min(self.queue_timeout, queue_timeout)
+        return Admission(priority, time.monotonic() + limit)
+
+    def _acquire(self, admission: Admission) -> float:
+        started = time.monotonic()
+        with self._cond:
+            if admission.deadline <= started:
+                self._rejected[admission.priority] += 1
+                raise SchedulerBusyError("Model call deadline already passed", self._retry_after_locked())
+
+            if self._active < self.max_concurrency and not self._waiting:
+                self._active += 1
+                return 0.0
+
+            if self._queued[admission.priority] >= self.max_queue:
+                self._rejected[admission.priority] += 1
+                raise SchedulerBusyError(
+                    "Model is busy, please retry shortly", self._retry_after_locked()
+                )
+
+            admission.ticket = (admission.priority, next(self._seq))
+            heapq.heappush(self._waiting, admission.ticket)
+            self._queued[admission.priority] += 1
+            try:
+                while not (self._waiting[0] == admission.ticket and self._active < self.max_concurrency):
+                    remaining = admission.deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._waiting.remove(admission.ticket)
+                        heapq.heapify(self._waiting)
+                        self._rejected[admission.priority] += 1
+                        self._cond.notify_all()
+                        raise SchedulerBusyError(
+                            "Model queue wait timed out, please retry shortly",
+                            self._retry_after_locked(),
+                        )
+                    self._cond.wait(remaining)
+                heapq.heappop(self._waiting)
+                self._active += 1
+            finally:
+                # promote() may have moved the ticket to another class meanwhile
+                self._queued[admission.priority] -= 1
+                admission.ticket = None
+
+        return time.monotonic() - started
+
+    def promote(self, admission: Admission, joiner: Admission) -> None:
+        """Give `admission` the more urgent priority and earlier deadline of `joiner`."""
+        with self._cond:
+            admission.deadline = min(admission.deadline, joiner.deadline)
+            if joiner.priority < admission.priority:
+                if admission.ticket is not None:
+                    # Keep the arrival order, move to the more urgent class
+                    self._waiting.remove(admission.ticket)
+                    admission.ticket = (joiner.priority, admission.ticket[1])
+                    self._waiting.append(admission.ticket)
+                    heapq.heapify(self._waiting)
+                    self._queued[admission.priority] -= 1
+                    self._queued[joiner.priority] += 1
+                admission.priority = joiner.priority
+            self._cond.notify_all()
+
+    def try_acquire(self) -> bool:
+        """Take a slot without waiting; False when none is free or calls are queued."""
+        with self._cond:
+            if self._active < self.max_concurrency and not self._waiting:
+                self._active += 1
+                return True
+            return False
+
+    def release(self, service_seconds: Optional[float] = None) -> None:
+        """Free a slot; service_seconds=None for a slot that was never used."""
+        with self._cond:
+            self._active -= 1
+            if service_seconds is not None:
+                self._completed += 1
+                self._service_ewma = 0.8 * self._service_ewma + 0.2 * service_seconds
+            self._cond.notify_all()
+
+    def run(
+        self,
+        fn: Callable[[], Any],
+        *,
+        priority: int = PRIORITY_INTERACTIVE,
+        queue_timeout: Optional[float] = None,
+        admission: Optional[Admission] = None,
+    ) -> Any:
+        """Run `fn` in a slot; pass `admission` instead of priority/queue_timeout to allow promotion."""
+        if admission is None:
+            admission = self.admission(priority, queue_timeout)
+        waited = self._acquire(admission)
+        priority = admission.priority
+        with self._cond:
+            self._wait_total[priority] += waited
+            self._wait_count[priority] += 1
+            self._wait_max[priority] = max(self._wait_max[priority], waited)
+
+        started = time.monotonic()
+        try:
+            return fn()
+        finally:
+            self.release(time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            per_class = {}
+            for p, name in _PRIORITY_NAMES.items():
+                count = self._wait_count[p]
+                per_class[name] = {
+                    "queued": self._queued[p],
+                    "rejected": self._rejected[p],
+                    "wait_avg_seconds": (self._wait_total[p] / count) if count else 0.0,
+                    "wait_max_seconds": self._wait_max[p],
+                    "admitted": count,
+                }
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queue_depth": len(self._waiting),
+                "completed": self._completed,
+                "service_time_ewma_seconds": self._service_ewma,
+                "classes": per_class,
+            }
+
+
+# Global scheduler for every call to the Ollama endpoint
+MODEL_SCHEDULER = ModelScheduler()
@@ -0,0 +1,318 @@
+"""
+Server-side page rendering (PyMuPDF) with a two-tier cache.
+
+- Renders one PDF page to WebP or PNG at a requested pixel width.
+- Memory tier: LRU bounded by bytes. Disk tier: SQLite blobs, LRU-evicted
+  by size, shared across restarts/processes (empty path disables it).
+- Keys are content addressed (upload digest, page, width, format), so the
+  same file uploaded in another session reuses its renders, and the key
+  doubles as a strong ETag.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from services.session_store import DocumentData
+from services.single_flight import SingleFlight
+
+PAGE_RENDER_DEFAULT_WIDTH = int(os.getenv("PAGE_RENDER_DEFAULT_WIDTH", "1024"))
+PAGE_RENDER_MIN_WIDTH = int(os.getenv("PAGE_RENDER_MIN_WIDTH", "64"))
+PAGE_RENDER_MAX_WIDTH = int(os.getenv("PAGE_RENDER_MAX_WIDTH", "2400"))
+PAGE_RENDER_WEBP_QUALITY = int(os.getenv("PAGE_RENDER_WEBP_QUALITY", "80"))
+# Output size limits: odd page shapes (very narrow and tall) must not become huge pixmaps
+PAGE_RENDER_MAX_PIXELS = int(os.getenv("PAGE_RENDER_MAX_PIXELS", str(16_000_000)))
+PAGE_RENDER_MAX_HEIGHT = int(os.getenv("PAGE_RENDER_MAX_HEIGHT", str(4 * PAGE_RENDER_MAX_WIDTH)))
+PAGE_RENDER_CACHE_MAX_BYTES = int(os.getenv("PAGE_RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_DEFAULT_DISK_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "page_renders.sqlite3"
+)
+PAGE_RENDER_DISK_PATH = os.getenv("PAGE_RENDER_DISK_PATH", _DEFAULT_DISK_PATH).strip()
+PAGE_RENDER_DISK_MAX_BYTES = int(os.getenv("PAGE_RENDER_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Bump when rendering output changes (invalidates old cache entries)
+_RENDER_VERSION = "1"
+
+_MEDIA_TYPES = {"webp": "image/webp", "png": "image/png"}
+RENDER_FORMATS = tuple(_MEDIA_TYPES)
+
+
+class PageRenderError(RuntimeError):
+    pass
+
+
+@dataclass
+class RenderedPage:
+    data: bytes
+    media_type: str
+    etag: str
+    width: int
+    height: int
+
+
+def clamp_width(width: Optional[int]) -> int:
+    if not width:
+        return PAGE_RENDER_DEFAULT_WIDTH
+    return max(PAGE_RENDER_MIN_WIDTH, min(PAGE_RENDER_MAX_WIDTH, int(width)))
+
+
+def render_key(content_digest: str, page_index: int, width: int, fmt: str) -> str:
+    raw = "\x1f".join([content_digest, str(page_index), str(width), fmt, _RENDER_VERSION])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def render_pdf_page(content: bytes, page_index: int, width: int, fmt: str) -> Tuple[bytes, int, int]:
+    """
+    (image bytes, width, height) for one page; the page is scaled to `width` pixels,
+    or less when that would exceed PAGE_RENDER_MAX_PIXELS. Pages that would still be
+    taller than PAGE_RENDER_MAX_HEIGHT are refused.
+    """
+    try:
+        pdf = fitz.open(stream=content, filetype="pdf")
+    except Exception as e:
+        raise PageRenderError(f"Cannot open PDF: {e}") from e
+    try:
+        if page_index < 0 or page_index >= pdf.page_count:
+            raise PageRenderError(f"Page {page_index} out of range (document has {pdf.page_count})")
+        page = pdf.load_page(page_index)
+        rect = page.rect
+        zoom = width / max(rect.width, 1.0)
+        zoom = min(zoom, math.sqrt(PAGE_RENDER_MAX_PIXELS / max(rect.width * rect.height, 1.0)))
+        if rect.height * zoom > PAGE_RENDER_MAX_HEIGHT or rect.width * zoom < 1:
+            raise PageRenderError(
+                f"Page {page_index} is too large to render ({rect.width:.0f}x{rect.height:.0f} pt)"
+            )
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        if fmt == "png":
+            return pix.tobytes("png"), pix.width, pix.height
+        img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        out = io.BytesIO()
+        img.save(out, format="WEBP", quality=PAGE_RENDER_WEBP_QUALITY, method=4)
+        return out.getvalue(), pix.width, pix.height
+    finally:
+        pdf.close()
+
+
+class _RenderDiskTier:
+    """SQLite blobs with LRU eviction once stored renders exceed max_bytes."""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS page_renders ("
+            " key TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " media_type TEXT NOT NULL,"
+            " width INTEGER NOT NULL,"
+            " height INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS page_renders_last_used ON page_renders(last_used)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[RenderedPage]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, media_type, width, height FROM page_renders WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE page_renders SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+        return RenderedPage(data=bytes(row[0]), media_type=row[1], etag=key, width=row[2], height=row[3])
+
+    def put(self, key: str, page: RenderedPage) -> None:
+        size = len(page.data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO page_renders (key, data, media_type, width, height, size, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, page.data, page.media_type, page.width, page.height, size, time.time()),
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM page_renders").fetchone()[0]
+            if total > self.max_bytes:
+                to_free = total - self.max_bytes
+                victims = []
+                for victim, victim_size in self._conn.execute(
+                    "SELECT key, size FROM page_renders ORDER BY last_used ASC"
+                ):
+                    victims.append((victim,))
+                    to_free -= victim_size
+                    if to_free <= 0:
+                        break
+                self._conn.executemany("DELETE FROM page_renders WHERE key = ?", victims)
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM page_renders"
+            ).fetchone()
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes}
+
+
+class PageRenderCache:
+    def __init__(
+        self,
+        max_bytes: int = PAGE_RENDER_CACHE_MAX_BYTES,
+        disk_path: Optional[str] = None,
+        disk_max_bytes: int = PAGE_RENDER_DISK_MAX_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self._entries: "OrderedDict[str, RenderedPage]" = OrderedDict()
+        # Memory accounting: render key -> content digest, digest -> bytes held
+        self._digests: Dict[str, str] = {}
+        self._digest_bytes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._disk: Optional[_RenderDiskTier] = None
+        if disk_path:
+            try:
+                self._disk = _RenderDiskTier(disk_path, disk_max_bytes)
+            except Exception as e:
+                print(f"Page render disk tier disabled ({disk_path}): {e}")
+        self._renders = SingleFlight()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+
+    def _remember(self, key: str, page: RenderedPage, digest: Optional[str] = None) -> None:
+        size = len(page.data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._account(key, -len(old.data))
+            self._entries[key] = page
+            if digest:
+                self._digests[key] = digest
+            self._account(key, size)
+            while self.bytes_used > self.max_bytes and self._entries:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._account(evicted_key, -len(evicted.data))
+                self._digests.pop(evicted_key, None)
+
+    def _account(self, key: str, delta: int) -> None:
+        self.bytes_used += delta
+        digest = self._digests.get(key)
+        if digest is None:
+            return
+        left = self._digest_bytes.get(digest, 0) + delta
+        if left > 0:
+            self._digest_bytes[digest] = left
+        else:
+            self._digest_bytes.pop(digest, None)
+
+    def digest_bytes(self) -> Dict[str, int]:
+        """Bytes of cached renders per document content digest."""
+        with self._lock:
+            return dict(self._digest_bytes)
+
+    def get(self, key: str, digest: Optional[str] = None) -> Optional[RenderedPage]:
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return page
+        if self._disk is not None:
+            try:
+                page = self._disk.get(key)
+            except Exception as e:
+                print(f"Page render disk tier read failed: {e}")
+                page = None
+            if page is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, page, digest)
+                return page
+        return None
+
+    def get_or_render(self, key: str, render, digest: Optional[str] = None) -> RenderedPage:
+        """Cached page, or render once (concurrent requests for one key share the render)."""
+        page = self.get(key, digest)
+        if page is not None:
+            return page
+
+        def produce() -> RenderedPage:
+            fresh = render()
+            self.renders += 1
+            self._remember(key, fresh, digest)
+            if self._disk is not None:
+                try:
+                    self._disk.put(key, fresh)
+                except Exception as e:
+                    print(f"Page render disk tier write failed: {e}")
+            return fresh
+
+        return self._renders.do(key, produce)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {
+                "entries": len(self._entries),
+                "bytes": self.bytes_used,
+                "max_bytes": self.max_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "renders": self.renders,
+            }
+        out["disk"] = self._disk.stats() if self._disk is not None else {"enabled": False}
+        return out
+
+
+def page_render_key(doc: DocumentData, page_index: int, width: Optional[int], fmt: str) -> str:
+    """Cache key / ETag of a render, known without rendering (lets clients revalidate for free)."""
+    fmt = (fmt or "webp").lower()
+    if fmt not in _MEDIA_TYPES:
+        raise PageRenderError(f"Unsupported format: {fmt} (use {', '.join(RENDER_FORMATS)})")
+    if doc.doc_type != "pdf" or not doc.content:
+        raise PageRenderError("Page rendering is only available for uploaded PDF documents")
+    digest = doc.content_digest or hashlib.sha256(doc.content).hexdigest()
+    return render_key(digest, page_index, clamp_width(width), fmt)
+
+
+def render_document_page(
+    doc: DocumentData, page_index: int, width: Optional[int] = None, fmt: str = "webp"
+) -> RenderedPage:
+    key = page_render_key(doc, page_index, width, fmt)
+    fmt = fmt.lower()
+    width = clamp_width(width)
+
+    def render() -> RenderedPage:
+        data, w, h = render_pdf_page(doc.content, page_index, width, fmt)
+        return RenderedPage(data=data, media_type=_MEDIA_TYPES[fmt], etag=key, width=w, height=h)
+
+    return PAGE_RENDERS.get_or_render(key, render, doc.content_digest)
+
+
+# Global render cache (memory + optional disk tier)
+PAGE_RENDERS = PageRenderCache(disk_path=PAGE_RENDER_DISK_PATH or None)
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+# Sliding windows over page text (chars); stride < window gives the overlap.
+PASSAGE_WINDOW_CHARS = int(os.getenv("PASSAGE_WINDOW_CHARS", "600"))
+PASSAGE_STRIDE_CHARS = int(os.getenv("PASSAGE_STRIDE_CHARS", "400"))
+
+# Two characters minimum so acronyms ("AI", "ML", "OS") stay searchable
+_TERM_RE = re.compile(r"[a-z0-9]{2,}")
+
+_STOPWORDS = frozenset(
+    "am an as at be by do go he if in is it me my no of on or so to up us we "
+    "the and for are but not you all any can had has have her his how its may our out "
+    "was who why what when where which will with this that these those from they them "
+    "their there then than into about does did also just been being were would could "
+    "should".split()
+)
+
+
+def index_terms(text: str) -> List[str]:
+    return [t for t in _TERM_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+@dataclass
+class Passage:
+    """A window of one page's text: page_index plus [start, end) char offsets into it."""
+
+    page_index: int
+    start: int
+    end: int
+
+
+@dataclass
+class PassageHit:
+    page_index: int
+    start: int
+    end: int
+    score: float
+    text: str
+    # [start, end) spans of matched query terms, relative to `text`
+    highlights: List[Tuple[int, int]] = field(default_factory=list)
+
+
+def _windows(text: str, window: int, stride: int) -> Iterable[Tuple[int, int]]:
+    """Overlapping [start, end) windows snapped to whitespace so words stay whole."""
+    n = len(text)
+    if n <= window:
+        if n:
+            yield 0, n
+        return
+    start = 0
+    while start < n:
+        end = min(n, start + window)
+        if end < n:
+            cut = text.rfind(" ", start + window // 2, end)
+            end = cut if cut > start else end
+        yield start, end
+        if end >= n:
+            return
+        nxt = start + stride
+        space = text.find(" ", nxt)
+        start = space + 1 if 0 <= space < end else min(nxt, end)
+
+
+class PassageIndex:
+    """
+    Inverted index over overlapping passages of a document's pages.
+
+    Built once at ingest; queries rank passages by idf-weighted query-term
+    coverage and return the passage text with highlight spans. Per-page term
+    sets are kept as well, for page-level overlap scoring without re-tokenizing.
+    """
+
+    def __init__(self):
+        self.passages: List[Passage] = []
+        self.postings: Dict[str, List[int]] = {}
+        self.page_terms: Dict[int, FrozenSet[str]] = {}
+        self._page_text: Dict[int, str] = {}
+
+    @classmethod
+    def build(
+        cls,
+        pages: Iterable,
+        window: int = PASSAGE_WINDOW_CHARS,
+        stride: int = PASSAGE_STRIDE_CHARS,
+    ) -> "PassageIndex":
+        idx = cls()
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for page in pages:
+            text = page.text or ""
+            idx._page_text[page.index] = text
+            idx.page_terms[page.index] = frozenset(index_terms(text))
+            for start, end in _windows(text, window, max(1, stride)):
+                pid = len(idx.passages)
+                idx.passages.append(Passage(page_index=page.index, start=start, end=end))
+                for term in set(index_terms(text[start:end])):
+                    postings[term].append(pid)
+        idx.postings = dict(postings)
+        return idx
+
+    def passage_text(self, passage: Passage) -> str:
+        return self._page_text.get(passage.page_index, "")[passage.start : passage.end]
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1.0 + len(self.passages) / (1.0 + df)) if df else 0.0
+
+    def search(self, query: str, top_k: int = 3, per_page: int = 1) -> List[PassageHit]:
+        """Best passages for `query` (at most `per_page` per page), with highlight spans."""
+        terms = set(index_terms(query))
+        if not terms or not self.passages:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in terms:
+            weight = self._idf(term)
+            for pid in self.postings.get(term, ()):
+                scores[pid] += weight
+        if not scores:
+            return []
+
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        hits: List[PassageHit] = []
+        taken: Dict[int, int] = defaultdict(int)
+        for pid, score in ranked:
+            passage = self.passages[pid]
+            if taken[passage.page_index] >= per_page:
+                continue
+            taken[passage.page_index] += 1
+            text = self.passage_text(passage)
+            hits.append(
+                PassageHit(
+                    page_index=passage.page_index,
+                    start=passage.start,
+                    end=passage.end,
+                    score=round(score, 4),
+                    text=text,
+                    highlights=highlight_spans(text, terms),
+                )
+            )
+            if len(hits) >= top_k:
+                break
+        return hits
+
+
+def highlight_spans(text: str, terms: Iterable[str]) -> List[Tuple[int, int]]:
+    wanted = set(terms)
+    return [
+        (m.start(), m.end())
+        for m in re.finditer(r"[A-Za-z0-9]{2,}", text or "")
+        if m.group(0).lower() in wanted
+    ]
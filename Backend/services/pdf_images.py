@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+import fitz  # PyMuPDF
+
+# Filters applied before / after decoding embedded images
+PDF_IMAGE_MIN_SIDE = int(os.getenv("PDF_IMAGE_MIN_SIDE", "64"))
+PDF_IMAGE_MIN_BYTES = int(os.getenv("PDF_IMAGE_MIN_BYTES", "5000"))
+PDF_IMAGE_MAX_PER_DOC = int(os.getenv("PDF_IMAGE_MAX_PER_DOC", "24"))
+
+
+@dataclass
+class ExtractedImage:
+    """
+    One distinct image in a document.
+
+    pages lists every page the image appears on (0-based). For PDFs, an image
+    whose bytes match one already yielded is merged into it, so `pages` of an
+    earlier image can grow while the extractor is still being iterated.
+    """
+
+    data: bytes
+    digest: str
+    pages: List[int] = field(default_factory=list)
+    width: int = 0
+    height: int = 0
+    xref: Optional[int] = None
+
+
+def image_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def iter_pdf_images(
+    pdf_content: bytes,
+    *,
+    min_side: Optional[int] = None,
+    min_bytes: Optional[int] = None,
+    max_images: Optional[int] = None,
+) -> Iterator[ExtractedImage]:
+    """
+    Lazily yield distinct images from a PDF, largest first.
+
+    1) Metadata pass: collect xrefs with width/height and the pages using them
+       (no decoding). Repeated xrefs (logos, backgrounds) collapse to one entry.
+    2) Drop images smaller than `min_side` on either side, rank by area.
+    3) Decode candidates one at a time; skip tiny payloads (< min_bytes) and
+       merge byte-identical images under different xrefs. Stop after `max_images`.
+    """
+    min_side = PDF_IMAGE_MIN_SIDE if min_side is None else min_side
+    min_bytes = PDF_IMAGE_MIN_BYTES if min_bytes is None else min_bytes
+    max_images = PDF_IMAGE_MAX_PER_DOC if max_images is None else max_images
+
+    try:
+        pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
+    except Exception as e:
+        print(f"Error in image extraction: {e}")
+        return
+
+    try:
+        candidates: Dict[int, ExtractedImage] = {}
+        for page_num in range(len(pdf_document)):
+            for img in pdf_document[page_num].get_images(full=True):
+                xref, width, height = img[0], img[2], img[3]
+                entry = candidates.get(xref)
+                if entry is None:
+                    if width < min_side or height < min_side:
+                        continue
+                    entry = ExtractedImage(
+                        data=b"", digest="", width=width, height=height, xref=xref
+                    )
+                    candidates[xref] = entry
+                if page_num not in entry.pages:
+                    entry.pages.append(page_num)
+
+        ranked = sorted(candidates.values(), key=lambda c: c.width * c.height, reverse=True)
+
+        by_digest: Dict[str, ExtractedImage] = {}
+        yielded = 0
+        for entry in ranked:
+            if max_images and yielded >= max_images:
+                break
+            try:
+                data = pdf_document.extract_image(entry.xref)["image"]
+            except Exception as e:
+                print(f"Error extracting image xref={entry.xref}: {e}")
+                continue
+
+            if len(data) < min_bytes:
+                continue
+
+            digest = image_digest(data)
+            existing = by_digest.get(digest)
+            if existing is not None:
+                existing.pages.extend(p for p in entry.pages if p not in existing.pages)
+                continue
+
+            entry.data = data
+            entry.digest = digest
+            by_digest[digest] = entry
+            yielded += 1
+            yield entry
+    finally:
+        pdf_document.close()
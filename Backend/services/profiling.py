@@ -0,0 +1,374 @@
+"""
+Opt-in request profiling with flame-graph output.
+
+- On demand: a request carrying `X-Profile: <PROFILE_TOKEN>` (or
+  `?profile=<PROFILE_TOKEN>`) is profiled when its endpoint template or path
+  session id is in PROFILE_ALLOWLIST ("*" allows everything).
+- Sampled: every PROFILE_SAMPLE_EVERY-th request to PROFILE_SAMPLE_ENDPOINTS
+  is profiled without any header (0 disables).
+- Profilers: "sample" (default) snapshots every busy thread's stack each
+  PROFILE_INTERVAL_MS, so threadpool work is included; other requests running
+  at the same time show up too. "trace" (`X-Profile-Mode: trace`) records
+  every call via sys.setprofile: exact but slow, and on Python < 3.12 it only
+  sees the event-loop thread. The hook is process-wide, so only one trace
+  runs at a time (a trace request arriving meanwhile is sampled instead) and
+  other requests served during the trace appear in it.
+- Output: speedscope JSON (https://www.speedscope.app) or collapsed stacks
+  (flamegraph.pl / speedscope import) in PROFILE_DIR, trimmed to
+  PROFILE_MAX_FILES / PROFILE_MAX_BYTES / PROFILE_MAX_AGE_HOURS. The file
+  name is returned in the X-Profile-File response header.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from starlette.concurrency import run_in_threadpool
+
+from services.metrics import route_template
+
+_DEFAULT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "profiles"
+)
+PROFILE_DIR = os.getenv("PROFILE_DIR", _DEFAULT_DIR).strip()
+# Admin secret for on-demand profiling; empty disables the header/query trigger
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "").strip()
+# Endpoint templates and/or session ids that may be profiled on demand ("*" = any)
+PROFILE_ALLOWLIST = {x.strip() for x in os.getenv("PROFILE_ALLOWLIST", "").split(",") if x.strip()}
+PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))
+PROFILE_SAMPLE_ENDPOINTS = {
+    x.strip()
+    for x in os.getenv(
+        "PROFILE_SAMPLE_ENDPOINTS",
+        "/vision/session/{session_id}/ask,/vision/session/{session_id}/documents,"
+        "/modes/process-mode,/modes/process-mode-with-vision,/modes/summarize,/modes/ask",
+    ).split(",")
+    if x.strip()
+}
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "speedscope").strip().lower()
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", str(100 * 1024 * 1024)))
+PROFILE_MAX_AGE_HOURS = float(os.getenv("PROFILE_MAX_AGE_HOURS", "72"))
+
+PROFILING_ENABLED = bool(PROFILE_TOKEN) or PROFILE_SAMPLE_EVERY > 0
+
+PROFILE_FORMATS = ("speedscope", "collapsed")
+_SUFFIXES = {"speedscope": ".speedscope.json", "collapsed": ".collapsed.txt"}
+
+# Leaf frames of threads that are parked, not working (skipped by the sampler)
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socket.py", "accept"),
+}
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+Stack = Tuple[str, ...]
+
+
+def _frame_label(code) -> str:
+    parts = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(parts[-2:])}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Background thread sampling the stacks of all other busy threads."""
+
+    def __init__(self, interval_seconds: float):
+        self.interval = interval_seconds
+        self.samples: Counter = Counter()  # (thread name, *frames root->leaf) -> count
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Dict[Stack, float]:
+        self._stop.set()
+        self._thread.join()
+        return {stack: n * self.interval for stack, n in self.samples.items()}
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                leaf = frame.f_code
+                if (os.path.basename(leaf.co_filename), leaf.co_name) in _IDLE_LEAVES:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                frames.append(names.get(ident, f"thread-{ident}"))
+                self.samples[tuple(reversed(frames))] += 1
+
+
+# sys.setprofile is process-global: one CallTracer at a time
+_TRACE_LOCK = threading.Lock()
+
+
+class CallTracer:
+    """Deterministic profiler: self time per exact call stack via sys.setprofile."""
+
+    def __init__(self):
+        self.totals: Dict[Stack, float] = {}
+        self._stacks: Dict[int, List[Stack]] = {}
+        self._last: Dict[int, float] = {}
+
+    def start(self) -> None:
+        if hasattr(threading, "setprofile_all_threads"):  # Python 3.12+
+            threading.setprofile_all_threads(self._event)
+        else:
+            sys.setprofile(self._event)
+
+    def stop(self) -> Dict[Stack, float]:
+        if hasattr(threading, "setprofile_all_threads"):
+            threading.setprofile_all_threads(None)
+        else:
+            sys.setprofile(None)
+        return self.totals
+
+    def _event(self, frame, event, arg) -> None:
+        now = time.perf_counter()
+        ident = threading.get_ident()
+        stack = self._stacks.get(ident)
+        if stack is None:
+            # First event on this thread: seed with the frames already running
+            outer = []
+            f = frame.f_back
+            while f is not None:
+                outer.append(_frame_label(f.f_code))
+                f = f.f_back
+            path: Stack = (threading.current_thread().name,)
+            stack = [path]
+            for label in reversed(outer):
+                path = path + (label,)
+                stack.append(path)
+            self._stacks[ident] = stack
+        else:
+            top = stack[-1]
+            self.totals[top] = self.totals.get(top, 0.0) + (now - self._last[ident])
+
+        if event == "call":
+            stack.append(stack[-1] + (_frame_label(frame.f_code),))
+        elif event == "c_call":
+            stack.append(stack[-1] + (f"{getattr(arg, '__qualname__', repr(arg))} (builtin)",))
+        elif event in ("return", "c_return", "c_exception") and len(stack) > 1:
+            stack.pop()
+        self._last[ident] = time.perf_counter()
+
+
+def to_collapsed(totals: Dict[Stack, float]) -> str:
+    """`frame;frame;frame <microseconds>` lines (flamegraph.pl, speedscope)."""
+    lines = [
+        f"{';'.join(stack)} {max(1, int(round(seconds * 1e6)))}"
+        for stack, seconds in sorted(totals.items())
+        if seconds > 0
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(totals: Dict[Stack, float], name: str, duration: float) -> str:
+    """One sampled profile per thread, weights in seconds."""
+    frames: List[dict] = []
+    index: Dict[str, int] = {}
+    by_thread: Dict[str, List[Tuple[List[int], float]]] = {}
+    for stack, seconds in sorted(totals.items()):
+        if seconds <= 0:
+            continue
+        ids = []
+        for label in stack[1:]:
+            if label not in index:
+                index[label] = len(frames)
+                func, _, where = label.partition(" (")
+                file, _, line = where.rstrip(")").rpartition(":")
+                frame = {"name": func}
+                if file:
+                    frame["file"] = file
+                    frame["line"] = int(line) if line.isdigit() else 0
+                frames.append(frame)
+            ids.append(index[label])
+        by_thread.setdefault(stack[0], []).append((ids, seconds))
+    profiles = []
+    for thread, samples in by_thread.items():
+        profiles.append(
+            {
+                "type": "sampled",
+                "name": thread,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": max(duration, sum(w for _, w in samples)),
+                "samples": [ids for ids, _ in samples],
+                "weights": [w for _, w in samples],
+            }
+        )
+    if not profiles:  # request finished within one sampling interval
+        profiles.append(
+            {
+                "type": "sampled",
+                "name": "no samples",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": duration,
+                "samples": [],
+                "weights": [],
+            }
+        )
+    return json.dumps(
+        {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "insighthub-profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+    )
+
+
+def enforce_retention(directory: str = PROFILE_DIR) -> int:
+    """Delete the oldest profiles beyond the count / size / age limits. Returns deleted count."""
+    try:
+        entries = []
+        for name in os.listdir(directory):
+            if not name.endswith(tuple(_SUFFIXES.values())):
+                continue
+            path = os.path.join(directory, name)
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, path))
+    except FileNotFoundError:
+        return 0
+    entries.sort(reverse=True)  # newest first
+    cutoff = time.time() - PROFILE_MAX_AGE_HOURS * 3600
+    kept_bytes, deleted = 0, 0
+    for position, (mtime, size, path) in enumerate(entries):
+        if position < PROFILE_MAX_FILES and kept_bytes + size <= PROFILE_MAX_BYTES and mtime >= cutoff:
+            kept_bytes += size
+            continue
+        try:
+            os.remove(path)
+            deleted += 1
+        except OSError:
+            pass
+    return deleted
+
+
+def list_profiles(directory: str = PROFILE_DIR) -> List[dict]:
+    try:
+        names = [n for n in os.listdir(directory) if n.endswith(tuple(_SUFFIXES.values()))]
+    except FileNotFoundError:
+        return []
+    out = []
+    for name in names:
+        st = os.stat(os.path.join(directory, name))
+        out.append({"name": name, "bytes": st.st_size, "created_at": st.st_mtime})
+    return sorted(out, key=lambda p: p["created_at"], reverse=True)
+
+
+def profile_path(name: str, directory: str = PROFILE_DIR) -> Optional[str]:
+    """Path of a stored profile, or None (also for names that try to leave the directory)."""
+    if not name or os.path.basename(name) != name or not name.endswith(tuple(_SUFFIXES.values())):
+        return None
+    path = os.path.join(directory, name)
+    return path if os.path.isfile(path) else None
+
+
+def _write_profile(name: str, text: str) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    tmp = os.path.join(PROFILE_DIR, f".{name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, os.path.join(PROFILE_DIR, name))
+    enforce_retention()
+
+
+def _token_matches(value: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN and value and secrets.compare_digest(value, PROFILE_TOKEN))
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._sample_counter = itertools.count(1)
+        self.profiled = 0
+
+    def _decide(self, scope, endpoint: str) -> Optional[Tuple[str, str, str]]:
+        """(trigger, profiler mode, output format) when this request is profiled."""
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers") or []}
+        query = dict(parse_qsl((scope.get("query_string") or b"").decode("latin-1")))
+        fmt = (headers.get("x-profile-format") or query.get("profile_format") or PROFILE_FORMAT).lower()
+        fmt = fmt if fmt in PROFILE_FORMATS else "speedscope"
+
+        if _token_matches(headers.get("x-profile") or query.get("profile")):
+            parts = scope["path"].strip("/").split("/")
+            session_id = parts[2] if len(parts) >= 3 and parts[1] == "session" else None
+            if "*" in PROFILE_ALLOWLIST or endpoint in PROFILE_ALLOWLIST or (
+                session_id and session_id in PROFILE_ALLOWLIST
+            ):
+                mode = (headers.get("x-profile-mode") or query.get("profile_mode") or "sample").lower()
+                return "on_demand", ("trace" if mode == "trace" else "sample"), fmt
+
+        if PROFILE_SAMPLE_EVERY > 0 and endpoint in PROFILE_SAMPLE_ENDPOINTS:
+            if next(self._sample_counter) % PROFILE_SAMPLE_EVERY == 0:
+                return "sampled", "sample", PROFILE_FORMAT if PROFILE_FORMAT in PROFILE_FORMATS else "speedscope"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = route_template(scope)
+        decision = self._decide(scope, endpoint)
+        if decision is None:
+            await self.app(scope, receive, send)
+            return
+
+        trigger, mode, fmt = decision
+        tracing = mode == "trace" and _TRACE_LOCK.acquire(blocking=False)
+        if mode == "trace" and not tracing:
+            mode = "sample"  # another trace owns the profile hook
+        slug = _SAFE_NAME.sub("_", endpoint.strip("/")) or "root"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{trigger}-{uuid.uuid4().hex[:8]}{_SUFFIXES[fmt]}"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers") or [])
+                headers.append((b"x-profile-file", name.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = CallTracer() if tracing else StackSampler(PROFILE_INTERVAL_MS / 1000.0)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            totals = profiler.stop()
+            if tracing:
+                _TRACE_LOCK.release()
+            duration = time.perf_counter() - started
+            title = f"{scope.get('method', '')} {scope['path']} ({mode}, {trigger}, {duration * 1000:.0f} ms)"
+            text = to_collapsed(totals) if fmt == "collapsed" else to_speedscope(totals, title, duration)
+            self.profiled += 1
+            try:
+                await run_in_threadpool(_write_profile, name, text)
+            except OSError as e:
+                print(f"Profile {name} not written: {e}")
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Model response cache (text + vision clients). Disk tier is off unless a path is set.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1").strip() not in {"0", "false", "no"}
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(60 * 60)))
+RESPONSE_CACHE_DISK_PATH = os.getenv("RESPONSE_CACHE_DISK_PATH", "").strip()
+
+_SPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCT = " \t\n.?!,;:"
+
+
+def normalize_prompt(text: str) -> str:
+    """Case-fold, collapse whitespace and drop edge punctuation ("What is recursion?" == "what is recursion")."""
+    return _SPACE_RE.sub(" ", (text or "").casefold()).strip(_EDGE_PUNCT)
+
+
+def make_cache_key(
+    *,
+    prompt: str,
+    system: str,
+    model_id: str,
+    options: Dict[str, Any],
+    image_hash: Optional[str] = None,
+    normalized: bool = False,
+) -> str:
+    body = {
+        "prompt": normalize_prompt(prompt) if normalized else prompt,
+        "system": system,
+        "model": model_id,
+        "options": options,
+        "image": image_hash,
+        "normalized": normalized,
+    }
+    raw = json.dumps(body, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def payload_cache_keys(payload: Dict[str, Any], image_hash: Optional[str] = None) -> Tuple[str, str]:
+    """(exact, normalized) keys for an Ollama /api/generate payload."""
+    args = dict(
+        prompt=payload.get("prompt") or "",
+        system=payload.get("system") or "",
+        model_id=payload.get("model") or "",
+        options=payload.get("options") or {},
+        image_hash=image_hash,
+    )
+    return make_cache_key(**args), make_cache_key(**args, normalized=True)
+
+
+class _DiskTier:
+    """SQLite tier for cached responses (expired rows are ignored and pruned on write)."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[1], json.loads(row[0])
+
+    def put(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at),
+            )
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache for model responses with an optional on-disk tier.
+
+    Lookups try the exact key first and then the normalized-prompt key, so
+    trivially different phrasings of the same question share one answer.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        disk_path: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[_DiskTier] = None
+        if disk_path:
+            try:
+                self._disk = _DiskTier(disk_path)
+            except Exception as e:
+                print(f"Response cache disk tier disabled ({disk_path}): {e}")
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _get_one(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                self._entries.pop(key, None)
+
+        if self._disk is not None:
+            try:
+                item = self._disk.get(key)
+            except Exception as e:
+                print(f"Response cache disk read failed: {e}")
+                item = None
+            if item is not None:
+                expires_at, value = item
+                self._set_memory(key, value, expires_at)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+        return None
+
+    def _set_memory(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, *keys: str) -> Optional[Any]:
+        """Return the first live value among `keys` (e.g. exact, then normalized)."""
+        for key in keys:
+            value = self._get_one(key)
+            if value is not None:
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, value: Any, *keys: str) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        for key in keys:
+            self._set_memory(key, value, expires_at)
+            if self._disk is not None:
+                try:
+                    self._disk.put(key, value, expires_at)
+                except Exception as e:
+                    print(f"Response cache disk write failed: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_tier": self._disk is not None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+            }
+
+
+# Global cache shared by the text and vision model clients (None when disabled)
+RESPONSE_CACHE: Optional[ResponseCache] = (
+    ResponseCache(disk_path=RESPONSE_CACHE_DISK_PATH or None) if RESPONSE_CACHE_ENABLED else None
+)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from services.response_cache import normalize_prompt
+
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+CacheKey = Tuple[str, int, str, str]
+
+# Free-text params normalized like prompts; everything else (doc ids, modes) is an exact identifier
+_TEXT_PARAMS = frozenset({"question"})
+
+
+def result_key(session_id: str, version: int, endpoint: str, **params: Any) -> CacheKey:
+    """
+    (session, session version, endpoint, params with the free text normalized).
+
+    The session version is bumped on every document upsert, so entries built
+    on older documents are never looked up again. SessionStore also drops a
+    session's entries on upsert, expiry and delete.
+    """
+    normalized = {
+        k: normalize_prompt(v) if k in _TEXT_PARAMS and isinstance(v, str) else v
+        for k, v in sorted(params.items())
+    }
+    return session_id, version, endpoint, json.dumps(normalized, sort_keys=True)
+
+
+class ResultCache:
+    """LRU cache of endpoint results bounded by an approximate byte budget."""
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[int, Any]]" = OrderedDict()
+        # session_id -> bytes of its entries (memory accounting)
+        self._session_bytes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size_of(value: Any) -> int:
+        return len(json.dumps(value, ensure_ascii=False, default=str))
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key: CacheKey, value: Any) -> None:
+        size = self._size_of(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._account(key[0], -old[0])
+            self._entries[key] = (size, value)
+            self._account(key[0], size)
+            while self.bytes_used > self.max_bytes and self._entries:
+                evicted_key, (evicted, _) = self._entries.popitem(last=False)
+                self._account(evicted_key[0], -evicted)
+
+    def _account(self, session_id: str, delta: int) -> None:
+        self.bytes_used += delta
+        left = self._session_bytes.get(session_id, 0) + delta
+        if left > 0:
+            self._session_bytes[session_id] = left
+        else:
+            self._session_bytes.pop(session_id, None)
+
+    def drop_session(self, session_id: str) -> int:
+        with self._lock:
+            stale = [k for k in self._entries if k[0] == session_id]
+            for k in stale:
+                self._account(session_id, -self._entries.pop(k)[0])
+            return len(stale)
+
+    def session_bytes(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._session_bytes)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes_used,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+# Per-session endpoint results (/modes/ask, /modes/summarize)
+RESULT_CACHE = ResultCache()
@@ -1,8 +1,16 @@
 from __future__ import annotations
 
+import base64
+import hashlib
 import time
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
+
+from services.doc_stats import DocumentStats, build_document_stats
+from services.memory_accounting import DOC_STRUCTURES, measure_document, model_context_bytes
+from services.passage_index import PassageIndex
+from services.result_cache import RESULT_CACHE
+from services.summarizer import DocumentSummary, summarize_pages
 
 
 @dataclass
@@ -24,16 +32,82 @@ class DocumentData:
     filename: str
     doc_type: str  # "pdf" | "pptx" | "docx"
     pages: List[PageData] = field(default_factory=list)
+    # Original upload bytes, kept so later steps (image analysis) need no re-upload
+    content: Optional[bytes] = None
+    # sha256 of `content` (content-addressed caches such as page renders)
+    content_digest: Optional[str] = None
+    # Sliding-window passage index over `pages` (built at ingest)
+    passage_index: Optional[PassageIndex] = None
+    # Single-pass text statistics read by the mode generators (built at ingest)
+    stats: Optional[DocumentStats] = None
+    # Extractive summary (ranked sentences), computed on first use and kept
+    summary: Optional[DocumentSummary] = None
+    # Hash of the page texts and per-mode explanations (filled after upload)
+    content_hash: Optional[str] = None
+    mode_explanations: Dict[str, Dict[str, Any]] = field(default_factory=dict)
     created_at: float = field(default_factory=time.time)
+    # Approximate bytes per structure (services.memory_accounting), refreshed when one is built
+    memory: Dict[str, int] = field(default_factory=dict, repr=False)
+
+    def get_passage_index(self) -> PassageIndex:
+        if self.passage_index is None:
+            self.passage_index = PassageIndex.build(self.pages)
+            measure_document(self, ["passage_index"])
+        return self.passage_index
+
+    def get_stats(self) -> DocumentStats:
+        if self.stats is None:
+            self.stats = build_document_stats(p.text for p in self.pages)
+            measure_document(self, ["stats"])
+        return self.stats
+
+    def get_summary(self) -> DocumentSummary:
+        if self.summary is None:
+            self.summary = summarize_pages(self.pages)
+            measure_document(self, ["summary"])
+        return self.summary
+
+    def memory_bytes(self) -> int:
+        return sum(self.memory.values())
+
+
+@dataclass
+class ModelContext:
+    """
+    Ollama conversation handle for one session "slot" (e.g. Vision Tutor):
+    the `context` token array of the last answer, valid while `anchor`
+    (the reference material it was built on) stays the same.
+    """
+
+    anchor: str
+    tokens: List[int]
+    turns: int = 1
+    updated_at: float = field(default_factory=time.time)
 
 
 @dataclass
 class SessionData:
     session_id: str
     documents: Dict[str, DocumentData] = field(default_factory=dict)
+    # Per-slot model conversation handles; dropped together with the session
+    model_contexts: Dict[str, ModelContext] = field(default_factory=dict)
+    # Bumped on every document change; part of result-cache keys.
+    # New sessions start from a clock reading (see SessionStore._new_version).
+    version: int = 0
     created_at: float = field(default_factory=time.time)
     last_accessed: float = field(default_factory=time.time)
 
+    def memory_usage(self) -> Dict[str, Any]:
+        """Approximate bytes per structure (summed over documents) and per document."""
+        structures = dict.fromkeys(DOC_STRUCTURES, 0)
+        documents = {}
+        for doc in self.documents.values():
+            for name, size in doc.memory.items():
+                structures[name] = structures.get(name, 0) + size
+            documents[doc.doc_id] = doc.memory_bytes()
+        structures["model_contexts"] = model_context_bytes(self.model_contexts)
+        return {"bytes": sum(structures.values()), "structures": structures, "documents": documents}
+
 
 class SessionStore:
     """
@@ -49,6 +123,9 @@ class SessionStore:
     def __init__(self, ttl_seconds: int = 60 * 60):
         self.ttl_seconds = ttl_seconds
         self._sessions: Dict[str, SessionData] = {}
+        # Approximate bytes released by TTL eviction / delete (see memory_usage)
+        self.evicted_sessions = 0
+        self.evicted_bytes = 0
 
     def _now(self) -> float:
         return time.time()
@@ -65,9 +142,20 @@ class SessionStore:
             if (now - s.last_accessed) > self.ttl_seconds
         ]
         for sid in expired:
-            self._sessions.pop(sid, None)
+            self._release(self._sessions.pop(sid, None))
         return len(expired)
 
+    def _new_version(self) -> int:
+        # Microseconds: a session recreated under the same id never counts up
+        # through the versions (and result-cache keys) of its predecessor.
+        return time.time_ns() // 1000
+
+    def _release(self, session: Optional[SessionData]) -> None:
+        if session is not None:
+            self.evicted_sessions += 1
+            self.evicted_bytes += session.memory_usage()["bytes"]
+            RESULT_CACHE.drop_session(session.session_id)
+
     def get_or_create(self, session_id: str) -> SessionData:
         if not session_id or not session_id.strip():
             raise ValueError("session_id is required")
@@ -76,7 +164,7 @@ class SessionStore:
 
         session = self._sessions.get(session_id)
         if session is None:
-            session = SessionData(session_id=session_id)
+            session = SessionData(session_id=session_id, version=self._new_version())
             self._sessions[session_id] = session
 
         session.last_accessed = self._now()
@@ -95,7 +183,9 @@ class SessionStore:
         if not session_id or not session_id.strip():
             return False
         self.cleanup_expired()
-        return self._sessions.pop(session_id, None) is not None
+        session = self._sessions.pop(session_id, None)
+        self._release(session)
+        return session is not None
 
     def upsert_document(
         self,
@@ -104,6 +194,7 @@ class SessionStore:
         filename: str,
         doc_type: str,
         pages: List[PageData],
+        content: Optional[bytes] = None,
     ) -> DocumentData:
         session = self.get_or_create(session_id)
 
@@ -112,11 +203,154 @@ class SessionStore:
             filename=filename,
             doc_type=doc_type,
             pages=pages or [],
+            content=content,
+            content_digest=hashlib.sha256(content).hexdigest() if content else None,
         )
+        doc.passage_index = PassageIndex.build(doc.pages)
+        doc.stats = build_document_stats(p.text for p in doc.pages)
+        measure_document(doc)
         session.documents[doc_id] = doc
+        session.version += 1
         session.last_accessed = self._now()
+        # Results computed on the previous document set can never be hit again; free them now.
+        RESULT_CACHE.drop_session(session_id)
         return doc
 
+    def session_ids(self) -> List[str]:
+        self.cleanup_expired()
+        return list(self._sessions)
+
+    def session_versions(self) -> Dict[str, int]:
+        self.cleanup_expired()
+        return {sid: s.version for sid, s in self._sessions.items()}
+
+    def export_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        JSON-safe snapshot of a session for handing it to another shard.
+        Derived structures (passage index, stats, summary) are rebuilt by the
+        importer; precomputed mode explanations travel along.
+        """
+        session = self.get(session_id)
+        if not session:
+            return None
+        return {
+            "session_id": session.session_id,
+            "version": session.version,
+            "created_at": session.created_at,
+            "documents": [
+                {
+                    "doc_id": d.doc_id,
+                    "filename": d.filename,
+                    "doc_type": d.doc_type,
+                    "pages": [{"index": p.index, "text": p.text} for p in d.pages],
+                    "content": base64.b64encode(d.content).decode("ascii") if d.content else None,
+                    "content_hash": d.content_hash,
+                    "mode_explanations": d.mode_explanations,
+                    "created_at": d.created_at,
+                }
+                for d in session.documents.values()
+            ],
+            "model_contexts": {
+                slot: {"anchor": c.anchor, "tokens": c.tokens, "turns": c.turns, "updated_at": c.updated_at}
+                for slot, c in session.model_contexts.items()
+            },
+        }
+
+    def import_session(self, data: Dict[str, Any]) -> SessionData:
+        """Install a session exported by export_session (replaces a local copy)."""
+        session_id = str(data.get("session_id") or "")
+        if not session_id.strip():
+            raise ValueError("session_id is required")
+
+        session = SessionData(
+            session_id=session_id,
+            version=int(data.get("version") or 0),
+            created_at=float(data.get("created_at") or self._now()),
+        )
+        for d in data.get("documents") or []:
+            content = base64.b64decode(d["content"]) if d.get("content") else None
+            doc = DocumentData(
+                doc_id=d["doc_id"],
+                filename=d["filename"],
+                doc_type=d["doc_type"],
+                pages=[PageData(index=int(p["index"]), text=p["text"]) for p in d.get("pages") or []],
+                content=content,
+                content_digest=hashlib.sha256(content).hexdigest() if content else None,
+                content_hash=d.get("content_hash"),
+                mode_explanations=d.get("mode_explanations") or {},
+                created_at=float(d.get("created_at") or self._now()),
+            )
+            doc.passage_index = PassageIndex.build(doc.pages)
+            doc.stats = build_document_stats(p.text for p in doc.pages)
+            measure_document(doc)
+            session.documents[doc.doc_id] = doc
+        for slot, c in (data.get("model_contexts") or {}).items():
+            session.model_contexts[slot] = ModelContext(
+                anchor=c["anchor"],
+                tokens=list(c.get("tokens") or []),
+                turns=int(c.get("turns") or 1),
+                updated_at=float(c.get("updated_at") or self._now()),
+            )
+
+        self.cleanup_expired()
+        self._sessions[session_id] = session
+        RESULT_CACHE.drop_session(session_id)  # results of an older local copy
+        return session
+
+    def memory_usage(
+        self,
+        top_n: int = 10,
+        extra: Optional[Callable[[SessionData], Dict[str, int]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Store-wide totals per structure plus the `top_n` largest sessions.
+        Reads the per-document sizes cached at build time, so it is O(documents).
+        `extra(session)` adds structures held outside the store (e.g. caches).
+        """
+        self.cleanup_expired()
+        totals: Dict[str, int] = {}
+        sessions = []
+        for session in list(self._sessions.values()):
+            usage = session.memory_usage()
+            if extra is not None:
+                usage["structures"].update(extra(session))
+                usage["bytes"] = sum(usage["structures"].values())
+            for name, size in usage["structures"].items():
+                totals[name] = totals.get(name, 0) + size
+            sessions.append((usage["bytes"], session, usage))
+        sessions.sort(key=lambda item: item[0], reverse=True)
+        return {
+            "sessions": len(sessions),
+            "bytes": sum(totals.values()),
+            "structures": totals,
+            "evicted_sessions": self.evicted_sessions,
+            "evicted_bytes": self.evicted_bytes,
+            "top": [
+                {
+                    "session_id": session.session_id,
+                    "document_count": len(session.documents),
+                    "last_accessed": session.last_accessed,
+                    **usage,
+                }
+                for _, session, usage in sessions[: max(0, top_n)]
+            ],
+        }
+
+    def get_model_context(self, session_id: str, slot: str) -> Optional[ModelContext]:
+        session = self.get(session_id)
+        if not session:
+            return None
+        return session.model_contexts.get(slot)
+
+    def set_model_context(
+        self, session_id: str, slot: str, context: Optional[ModelContext]
+    ) -> None:
+        session = self.get_or_create(session_id)
+        if context is None:
+            session.model_contexts.pop(slot, None)
+        else:
+            session.model_contexts[slot] = context
+
     def list_documents(self, session_id: str) -> List[DocumentData]:
         session = self.get(session_id)
         if not session:
@@ -0,0 +1,351 @@
+"""
+Session-sharded deployment: a thin router in front of several backend processes.
+
+- Each shard is a normal backend (app.py) that owns the sessions whose
+  session_id hashes onto it (services.hash_ring, consistent hashing).
+- The router finds the session id in the path (/vision/session/{id}/...,
+  /modes/session/{id}/...) or in the session_id form/query field (/modes/*)
+  and streams the request and response through unchanged (compression,
+  NDJSON streaming and CORS stay the shards' job). The follow-mode WebSocket
+  is bridged to the owning shard as well.
+- Changing the shard list rebalances: sessions whose owner changed are
+  exported from the old shard, imported on the new one and dropped from the
+  old one (/shard/* endpoints, SHARD_TOKEN). Requests for a session wait
+  while it moves; sessions not moved yet keep going to where they live.
+- A session listed by several shards (a handoff whose final delete failed)
+  keeps its highest-version copy (the one requests were routed to on a tie);
+  the other copies are dropped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Set
+
+import httpx
+from fastapi import Request, WebSocket
+from fastapi.responses import Response, StreamingResponse
+from websockets.asyncio.client import connect as ws_connect
+
+from services.fast_json import FastJSONResponse
+from services.hash_ring import HashRing
+
+# Shard base URLs (comma separated), e.g. http://127.0.0.1:8001,http://127.0.0.1:8002
+SHARD_NODES = [u.strip().rstrip("/") for u in os.getenv("SHARD_NODES", "").split(",") if u.strip()]
+# Shared secret between the router and its shards (guards the /shard/* handoff endpoints)
+SHARD_TOKEN = os.getenv("SHARD_TOKEN", "").strip()
+SHARD_PROXY_TIMEOUT = float(os.getenv("SHARD_PROXY_TIMEOUT", "300"))
+# How long a handoff waits for a session's in-flight requests before moving it anyway
+SHARD_HANDOFF_DRAIN_SECONDS = float(os.getenv("SHARD_HANDOFF_DRAIN_SECONDS", "30"))
+SHARD_HANDOFF_CONCURRENCY = int(os.getenv("SHARD_HANDOFF_CONCURRENCY", "4"))
+
+# Not forwarded (connection-specific); content-length is kept for the raw body
+_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+    "host",
+}
+
+
+def path_session_id(path: str) -> Optional[str]:
+    """session id of /vision/session/{id}/... and /modes/session/{id}/... paths."""
+    parts = path.strip("/").split("/")
+    if len(parts) >= 3 and parts[1] == "session" and parts[2]:
+        return parts[2]
+    return None
+
+
+class ShardRouter:
+    def __init__(self, nodes: List[str], token: str = ""):
+        self.ring = HashRing(nodes)
+        self.token = token
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Sessions that still live on a pre-rebalance owner (session_id -> node)
+        self._overrides: Dict[str, str] = {}
+        # Sessions being handed off right now; their requests wait for the event
+        self._moving: Dict[str, asyncio.Event] = {}
+        self._inflight: Dict[str, int] = {}
+        self._sockets: Dict[str, Set] = {}
+        # Cleared while a rebalance lists sessions, so no request creates one unseen
+        self._open = asyncio.Event()
+        self._open.set()
+        self._rebalance_lock = asyncio.Lock()
+
+        self.forwarded: Dict[str, int] = {}
+        self.upstream_errors = 0
+        self.handoffs = 0
+        self.handoff_failures = 0
+        self.last_rebalance: Optional[dict] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(SHARD_PROXY_TIMEOUT, connect=5.0),
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=256),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def owner(self, session_id: str) -> str:
+        await self._open.wait()
+        moving = self._moving.get(session_id)
+        if moving is not None:
+            await moving.wait()
+        return self._overrides.get(session_id) or self.ring.owner(session_id)
+
+    def _enter(self, session_id: Optional[str], node: str) -> None:
+        self.forwarded[node] = self.forwarded.get(node, 0) + 1
+        if session_id:
+            self._inflight[session_id] = self._inflight.get(session_id, 0) + 1
+
+    def _leave(self, session_id: Optional[str]) -> None:
+        if not session_id:
+            return
+        left = self._inflight.get(session_id, 1) - 1
+        if left > 0:
+            self._inflight[session_id] = left
+        else:
+            self._inflight.pop(session_id, None)
+
+    async def _request_session_id(self, request: Request) -> tuple:
+        """(session_id, buffered body or None); /modes/* carry it in the form."""
+        session_id = path_session_id(request.url.path)
+        if session_id:
+            return session_id, None
+        body = await request.body()
+        session_id = request.query_params.get("session_id")
+        content_type = request.headers.get("content-type", "")
+        if not session_id and body and content_type.startswith(
+            ("multipart/form-data", "application/x-www-form-urlencoded")
+        ):
+            form = await request.form()
+            try:
+                value = form.get("session_id")
+                session_id = value if isinstance(value, str) else None
+            finally:
+                await form.close()
+        return session_id or None, body
+
+    async def forward(self, request: Request) -> Response:
+        session_id, body = await self._request_session_id(request)
+        if session_id:
+            node = await self.owner(session_id)
+        else:
+            node = self.ring.owner(request.url.path)
+
+        headers = [(k, v) for k, v in request.headers.raw if k.decode("latin-1").lower() not in _HOP_HEADERS]
+        upstream_request = self.client.build_request(
+            request.method,
+            httpx.URL(node + request.url.path, query=request.url.query.encode("latin-1")),
+            headers=headers,
+            content=body if body is not None else request.stream(),
+        )
+        self._enter(session_id, node)
+        try:
+            upstream = await self.client.send(upstream_request, stream=True)
+        except httpx.HTTPError as e:
+            self._leave(session_id)
+            self.upstream_errors += 1
+            return FastJSONResponse({"detail": f"Shard {node} unavailable: {e}"}, status_code=502)
+
+        async def relay():
+            try:
+                async for chunk in upstream.aiter_raw():
+                    yield chunk
+            finally:
+                await upstream.aclose()
+                self._leave(session_id)
+
+        response = StreamingResponse(relay(), status_code=upstream.status_code)
+        response.raw_headers = [
+            (k.encode("latin-1"), v.encode("latin-1"))
+            for k, v in upstream.headers.multi_items()
+            if k.lower() not in _HOP_HEADERS
+        ]
+        return response
+
+    async def forward_websocket(self, websocket: WebSocket) -> None:
+        path = websocket.url.path
+        session_id = path_session_id(path)
+        node = await self.owner(session_id) if session_id else self.ring.owner(path)
+        query = websocket.url.query
+        url = "ws" + node[len("http"):] + path + (f"?{query}" if query else "")
+        try:
+            upstream = await ws_connect(url, max_size=None)
+        except Exception as e:
+            print(f"Shard websocket {url} unavailable: {e}")
+            self.upstream_errors += 1
+            await websocket.close(code=1011)
+            return
+
+        await websocket.accept()
+        self._enter(None, node)
+        sockets = self._sockets.setdefault(session_id or "", set())
+        sockets.add(upstream)
+
+        async def client_to_shard():
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("bytes") is not None:
+                    await upstream.send(message["bytes"])
+                elif message.get("text") is not None:
+                    await upstream.send(message["text"])
+
+        async def shard_to_client():
+            async for message in upstream:
+                if isinstance(message, bytes):
+                    await websocket.send_bytes(message)
+                else:
+                    await websocket.send_text(message)
+
+        pumps = [asyncio.ensure_future(client_to_shard()), asyncio.ensure_future(shard_to_client())]
+        try:
+            await asyncio.wait(pumps, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for pump in pumps:
+                pump.cancel()
+            sockets.discard(upstream)
+            if not sockets:
+                self._sockets.pop(session_id or "", None)
+            await upstream.close()
+            try:
+                # 1012 (session moved to another shard): the client reconnects
+                await websocket.close(code=upstream.close_code or 1000)
+            except RuntimeError:
+                pass  # client already gone
+
+    def _shard_headers(self) -> Dict[str, str]:
+        return {"X-Shard-Token": self.token}
+
+    async def _hand_off(self, session_id: str, source: str, target: str) -> bool:
+        moving = asyncio.Event()
+        self._moving[session_id] = moving
+        try:
+            # Follow sockets hold per-connection state on the old shard: make them reconnect
+            for upstream in list(self._sockets.get(session_id, ())):
+                await upstream.close(code=1012, reason="session moved")
+            deadline = time.monotonic() + SHARD_HANDOFF_DRAIN_SECONDS
+            while self._inflight.get(session_id) and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+
+            url = f"/shard/sessions/{session_id}"
+            exported = await self.client.get(source + url, headers=self._shard_headers())
+            if exported.status_code == 404:  # expired meanwhile
+                self._overrides.pop(session_id, None)
+                return True
+            exported.raise_for_status()
+            imported = await self.client.put(
+                target + url,
+                content=exported.content,
+                headers={**self._shard_headers(), "Content-Type": "application/json"},
+            )
+            imported.raise_for_status()
+            self._overrides.pop(session_id, None)
+            try:
+                await self.client.delete(source + url, headers=self._shard_headers())
+            except httpx.HTTPError as e:
+                print(f"Session {session_id} moved, but {source} kept a copy: {e}")
+            self.handoffs += 1
+            return True
+        except httpx.HTTPError as e:
+            # Stays pinned to the old shard (override) until the next rebalance
+            print(f"Session handoff {session_id} {source} -> {target} failed: {e}")
+            self.handoff_failures += 1
+            return False
+        finally:
+            self._moving.pop(session_id, None)
+            moving.set()
+
+    async def set_nodes(self, nodes: List[str]) -> dict:
+        """Switch to a new shard list and hand off every session whose owner changed."""
+        new_ring = HashRing(n.strip().rstrip("/") for n in nodes)
+        async with self._rebalance_lock:
+            started = time.perf_counter()
+            current = list(dict.fromkeys(self.ring.nodes + list(self._overrides.values())))
+
+            self._open.clear()
+            stale: List[tuple] = []
+            try:
+                located: Dict[str, str] = {}
+                versions: Dict[str, int] = {}
+                for node in current:
+                    try:
+                        r = await self.client.get(node + "/shard/sessions", headers=self._shard_headers())
+                        r.raise_for_status()
+                    except httpx.HTTPError as e:
+                        print(f"Rebalance: cannot list sessions of {node}, they are not moved: {e}")
+                        continue
+                    listed = r.json()
+                    node_versions = listed.get("versions") or dict.fromkeys(listed.get("session_ids", []), 0)
+                    for session_id, version in node_versions.items():
+                        held = located.get(session_id)
+                        if held is not None:
+                            routed = self._overrides.get(session_id) or self.ring.owner(session_id)
+                            if version < versions[session_id] or (
+                                version == versions[session_id] and held == routed
+                            ):
+                                stale.append((session_id, node))
+                                continue
+                            stale.append((session_id, held))
+                        located[session_id] = node
+                        versions[session_id] = version
+                self._overrides = {
+                    sid: node for sid, node in located.items() if new_ring.owner(sid) != node
+                }
+                self.ring = new_ring
+            finally:
+                self._open.set()
+
+            for session_id, node in stale:
+                try:
+                    await self.client.delete(node + f"/shard/sessions/{session_id}", headers=self._shard_headers())
+                except httpx.HTTPError as e:
+                    print(f"Rebalance: cannot drop stale copy of {session_id} on {node}: {e}")
+
+            limit = asyncio.Semaphore(max(1, SHARD_HANDOFF_CONCURRENCY))
+
+            async def move(session_id: str, source: str) -> bool:
+                async with limit:
+                    return await self._hand_off(session_id, source, new_ring.owner(session_id))
+
+            results = await asyncio.gather(*(move(sid, node) for sid, node in list(self._overrides.items())))
+            self.last_rebalance = {
+                "nodes": new_ring.nodes,
+                "sessions": len(located),
+                "moved": sum(1 for ok in results if ok),
+                "failed": sum(1 for ok in results if not ok),
+                "stale_copies": len(stale),
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+            return self.last_rebalance
+
+    def stats(self) -> dict:
+        return {
+            "nodes": self.ring.nodes,
+            "ring_share": {n: round(s, 4) for n, s in self.ring.share().items()},
+            "forwarded": dict(self.forwarded),
+            "in_flight_sessions": len(self._inflight),
+            "follow_sockets": sum(len(s) for s in self._sockets.values()),
+            "pinned_sessions": len(self._overrides),
+            "moving_sessions": len(self._moving),
+            "upstream_errors": self.upstream_errors,
+            "handoffs": self.handoffs,
+            "handoff_failures": self.handoff_failures,
+            "last_rebalance": self.last_rebalance,
+        }
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+        self.shared: Any = None
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls: the first caller for a key runs `fn`,
+    every caller arriving while it is in flight waits and receives the same
+    result (or the same exception). Nothing is remembered after completion;
+    caching is the response cache's job.
+
+    The leader may publish `shared` state (e.g. its scheduler admission);
+    each caller that joins it calls `on_join(shared)` before waiting.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        *,
+        shared: Any = None,
+        on_join: Optional[Callable[[Any], None]] = None,
+    ) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                call.shared = shared
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            if on_join is not None and call.shared is not None:
+                on_join(call.shared)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+# Shared by the text and vision model clients (keys include the full payload)
+MODEL_CALLS = SingleFlight()
@@ -0,0 +1,215 @@
+"""
+Local extractive summarizer (TF-IDF sentence graph, TextRank + MMR, NumPy).
+
+- Sentences are ranked per page first, so every matrix is at most
+  SUMMARY_GROUP_SIZE x SUMMARY_GROUP_SIZE no matter how long the document is.
+- Each page keeps its best few sentences; those candidates are merged in
+  groups and re-ranked until one group is left (a tournament), and the final
+  pick uses MMR so near-duplicate sentences are not repeated.
+- IDF is computed over the whole document; sentences repeated verbatim on
+  several pages (running headers / footers) are dropped before ranking.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from services.passage_index import index_terms
+
+SUMMARY_MAX_ITEMS = int(os.getenv("SUMMARY_MAX_ITEMS", "12"))
+# Sentences kept per page / per merged group for the next round
+SUMMARY_PAGE_KEEP = int(os.getenv("SUMMARY_PAGE_KEEP", "3"))
+# Upper bound on the sentences ranked together (page or merge group)
+SUMMARY_GROUP_SIZE = int(os.getenv("SUMMARY_GROUP_SIZE", "64"))
+SUMMARY_MMR_LAMBDA = float(os.getenv("SUMMARY_MMR_LAMBDA", "0.7"))
+
+_DAMPING = 0.85
+_ITERATIONS = 30
+_MIN_TERMS = 3
+_MAX_SENTENCE_CHARS = 300
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass
+class SummarySentence:
+    page_index: int
+    position: int  # sentence number within the page
+    text: str
+    score: float = 0.0
+    terms: List[str] = field(default_factory=list, repr=False)
+
+
+@dataclass
+class DocumentSummary:
+    # In MMR rank order; a shorter summary is always a prefix of a longer one
+    sentences: List[SummarySentence] = field(default_factory=list)
+    sentence_count: int = 0
+
+    def top(self, max_items: int) -> List[str]:
+        """Best `max_items` sentences, returned in document order."""
+        chosen = sorted(self.sentences[: max(0, max_items)], key=lambda s: (s.page_index, s.position))
+        return [s.text for s in chosen]
+
+
+def _cut(text: str, limit: int = _MAX_SENTENCE_CHARS) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0]
+
+
+def page_sentences(text: str) -> List[str]:
+    """
+    Sentences of one page. Paragraph-internal line breaks are layout wraps and
+    are joined; a "sentence" that is still too long (slides, lists without
+    punctuation) falls back to its lines.
+    """
+    out: List[str] = []
+    for para in _PARAGRAPH_RE.split(text or ""):
+        flat = " ".join(para.split())
+        for sent in _SENTENCE_RE.split(flat):
+            if len(sent) <= _MAX_SENTENCE_CHARS:
+                out.append(sent)
+                continue
+            # map back to the paragraph's own lines
+            lines = [" ".join(ln.split()) for ln in para.split("\n")]
+            lines = [ln for ln in lines if ln and ln in sent]
+            out.extend(_cut(ln) for ln in (lines or [sent]))
+    return [s for s in out if s]
+
+
+def _tfidf(sentences: Sequence[SummarySentence], idf: Dict[str, float]) -> np.ndarray:
+    """Row-normalized TF-IDF matrix (sentences x local vocabulary), log-scaled tf."""
+    vocab: Dict[str, int] = {}
+    rows: List[int] = []
+    cols: List[int] = []
+    for r, s in enumerate(sentences):
+        for t in s.terms:
+            rows.append(r)
+            cols.append(vocab.setdefault(t, len(vocab)))
+    x = np.zeros((len(sentences), max(1, len(vocab))), dtype=np.float32)
+    if rows:
+        np.add.at(x, (np.asarray(rows), np.asarray(cols)), 1.0)
+        nz = x > 0
+        x[nz] = 1.0 + np.log(x[nz])
+        weights = np.ones(x.shape[1], dtype=np.float32)
+        for t, c in vocab.items():
+            weights[c] = idf.get(t, 1.0)
+        x *= weights
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def _textrank(sim: np.ndarray) -> np.ndarray:
+    n = sim.shape[0]
+    if n == 1:
+        return np.ones(1, dtype=np.float32)
+    w = sim.copy()
+    np.fill_diagonal(w, 0.0)
+    out_weight = w.sum(axis=1, keepdims=True)
+    # Isolated sentences link uniformly so the walk stays stochastic
+    w = np.where(out_weight > 0, w / np.where(out_weight > 0, out_weight, 1.0), 1.0 / n)
+    rank = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(_ITERATIONS):
+        nxt = (1.0 - _DAMPING) / n + _DAMPING * (w.T @ rank)
+        if np.abs(nxt - rank).sum() < 1e-6:
+            rank = nxt
+            break
+        rank = nxt
+    return rank
+
+
+def _mmr(sim: np.ndarray, relevance: np.ndarray, k: int, lam: float) -> List[int]:
+    """Greedy maximal marginal relevance; returns indices in pick order."""
+    n = sim.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return []
+    rel = relevance / (relevance.max() or 1.0)
+    picked: List[int] = []
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    for _ in range(k):
+        score = lam * rel - (1.0 - lam) * redundancy
+        score[~available] = -np.inf
+        i = int(np.argmax(score))
+        picked.append(i)
+        available[i] = False
+        redundancy = np.maximum(redundancy, sim[i])
+    return picked
+
+
+def _rank(sentences: List[SummarySentence], idf: Dict[str, float], keep: int) -> List[SummarySentence]:
+    """TextRank within one group, then MMR down to `keep` sentences (scores updated)."""
+    if len(sentences) <= 1:
+        return sentences[:keep]
+    x = _tfidf(sentences, idf)
+    sim = x @ x.T
+    rank = _textrank(sim)
+    order = _mmr(sim, rank, keep, SUMMARY_MMR_LAMBDA)
+    for i in order:
+        sentences[i].score = float(rank[i])
+    return [sentences[i] for i in order]
+
+
+def summarize_pages(pages: Iterable, max_items: int = SUMMARY_MAX_ITEMS) -> DocumentSummary:
+    """Hierarchical extractive summary of PageData-like objects (index, text)."""
+    per_page: List[List[SummarySentence]] = []
+    seen_on_pages: Dict[str, int] = {}
+    for page in pages:
+        sents: List[SummarySentence] = []
+        for pos, text in enumerate(page_sentences(page.text)):
+            terms = index_terms(text)
+            if len(terms) < _MIN_TERMS:
+                continue
+            sents.append(SummarySentence(page_index=page.index, position=pos, text=text, terms=terms))
+        for key in {s.text.lower() for s in sents}:
+            seen_on_pages[key] = seen_on_pages.get(key, 0) + 1
+        if sents:
+            per_page.append(sents)
+
+    # Sentences repeated on several pages are running headers / footers
+    per_page = [[s for s in sents if seen_on_pages[s.text.lower()] == 1] for sents in per_page]
+    per_page = [sents for sents in per_page if sents]
+
+    df: Dict[str, int] = {}
+    total = 0
+    for sents in per_page:
+        total += len(sents)
+        for s in sents:
+            for t in set(s.terms):
+                df[t] = df.get(t, 0) + 1
+
+    if not total:
+        return DocumentSummary(sentences=[], sentence_count=0)
+
+    idf = {t: math.log(1.0 + total / (1.0 + n)) for t, n in df.items()}
+
+    # Round 1: per page (long pages are ranked in windows of SUMMARY_GROUP_SIZE)
+    candidates: List[SummarySentence] = []
+    for sents in per_page:
+        for i in range(0, len(sents), SUMMARY_GROUP_SIZE):
+            candidates.extend(_rank(sents[i : i + SUMMARY_GROUP_SIZE], idf, SUMMARY_PAGE_KEEP))
+
+    # Merge rounds: neighbouring candidates compete in groups until one group is left
+    keep = max(SUMMARY_PAGE_KEEP, max_items)
+    while len(candidates) > SUMMARY_GROUP_SIZE:
+        merged: List[SummarySentence] = []
+        for i in range(0, len(candidates), SUMMARY_GROUP_SIZE):
+            group = candidates[i : i + SUMMARY_GROUP_SIZE]
+            merged.extend(_rank(group, idf, max(SUMMARY_PAGE_KEEP, len(group) // 4)))
+        merged.sort(key=lambda s: (s.page_index, s.position))
+        if len(merged) >= len(candidates):
+            break
+        candidates = merged
+
+    final = _rank(candidates, idf, keep)
+    return DocumentSummary(sentences=final, sentence_count=total)
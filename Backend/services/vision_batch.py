@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from services.context_packer import IMAGE_CONTEXT_TOKEN_BUDGET, pack_context, page_sources
+from services.model_scheduler import PRIORITY_BULK, SchedulerBusyError
+from services.pdf_images import ExtractedImage
+from services.session_store import PageData
+from services.vision_cache import VISION_CACHE, VisionCache
+from services.vision_model import OLLAMA_MODEL_ID, VisionModelError, ask_vision_model
+
+# Bulk per-image analysis limits (one document at a time)
+VISION_ANALYSIS_CONCURRENCY = int(os.getenv("VISION_ANALYSIS_CONCURRENCY", "4"))
+VISION_ANALYSIS_DEADLINE_SECONDS = float(os.getenv("VISION_ANALYSIS_DEADLINE_SECONDS", "180"))
+VISION_ANALYSIS_TIMEOUT_SECONDS = int(os.getenv("VISION_ANALYSIS_TIMEOUT_SECONDS", "60"))
+
+# Bump the version whenever the template changes so cached answers are not reused.
+IMAGE_ANALYSIS_PROMPT = (
+    "Analyze this diagram or image from the document. Explain what it shows and how it "
+    "relates to the learning content in {mode} mode."
+)
+IMAGE_ANALYSIS_PROMPT_VERSION = "1"
+
+
+@dataclass
+class BatchResult:
+    """
+    analyses: completed analyses ordered by page_index (one entry per page an image is on)
+    complete: False when the deadline hit before every image finished
+    skipped: number of distinct images without an analysis (deadline)
+    image_count: number of distinct images seen
+    cache_hits: distinct images answered from the vision cache (no model call)
+    """
+
+    analyses: List[Dict[str, Any]] = field(default_factory=list)
+    complete: bool = True
+    skipped: int = 0
+    image_count: int = 0
+    cache_hits: int = 0
+
+
+def _analyze_one(
+    *,
+    image_bytes: bytes,
+    query: str,
+    context_text: Optional[str],
+    timeout: int,
+    cache: Optional[VisionCache],
+    cache_key: Optional[str],
+    deadline_at: float,
+) -> str:
+    try:
+        vision_result = ask_vision_model(
+            query=query,
+            image_bytes=image_bytes,
+            context_text=context_text,
+            timeout_seconds=timeout,
+            priority=PRIORITY_BULK,
+            # Queued past the batch deadline -> dropped before it takes a model slot
+            queue_timeout=deadline_at - time.monotonic(),
+        )
+    except (VisionModelError, SchedulerBusyError) as e:
+        return f"Vision analysis unavailable: {str(e)}"
+    except Exception as e:
+        # One bad image (decode error, unexpected upstream failure) must not fail the batch
+        print(f"Image analysis failed: {type(e).__name__}: {e}")
+        return f"Vision analysis unavailable: {str(e)}"
+
+    answer = vision_result["answer"]
+    # A blank model response is a transient failure: never persist its placeholder
+    if cache is not None and cache_key and not vision_result.get("empty"):
+        try:
+            cache.put(cache_key, answer)
+        except Exception as e:
+            print(f"Vision cache write failed: {e}")
+    return answer
+
+
+def _image_context(img: ExtractedImage, pages: List[PageData]) -> Optional[str]:
+    """Token-budgeted text from the page(s) showing the image (document lead as fallback)."""
+    on_pages = set(img.pages)
+    sources = page_sources(p for p in pages if p.index in on_pages) or page_sources(pages[:3])
+    packed = pack_context(sources, budget=IMAGE_CONTEXT_TOKEN_BUDGET)
+    return packed.text or None
+
+
+def analyze_images(
+    images: Iterable[ExtractedImage],
+    *,
+    mode: str,
+    pages: Optional[List[PageData]] = None,
+    max_concurrency: Optional[int] = None,
+    deadline_seconds: Optional[float] = None,
+) -> BatchResult:
+    """
+    Run ask_vision_model once per distinct image, concurrently.
+
+    - `images` may be a lazy iterator: analyses start while extraction continues.
+    - At most `max_concurrency` model calls are in flight at once.
+    - Once `deadline_seconds` elapse, queued images are dropped and whatever
+      has finished is returned (complete=False); images the iterator had not
+      handed out yet are still counted in `skipped` / `image_count`.
+    - An image shared by several pages is analysed once; every page gets the answer.
+    - Answers are looked up in / stored to the persistent vision cache first.
+    - Each image gets reference text packed from the pages it appears on.
+    """
+    query = IMAGE_ANALYSIS_PROMPT.format(mode=mode)
+    cache = VISION_CACHE
+    workers = max(1, max_concurrency or VISION_ANALYSIS_CONCURRENCY)
+    deadline = deadline_seconds if deadline_seconds is not None else VISION_ANALYSIS_DEADLINE_SECONDS
+    timeout = max(1, min(VISION_ANALYSIS_TIMEOUT_SECONDS, int(deadline) or 1))
+    started = time.monotonic()
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    submitted = []
+    cached = []
+    unsubmitted = 0
+    remaining = iter(images)
+    try:
+        for img in remaining:
+            context_text = _image_context(img, pages or [])
+            cache_key = None
+            if cache is not None:
+                cache_key = VisionCache.make_key(
+                    image_hash=img.digest,
+                    mode=mode,
+                    prompt_version=IMAGE_ANALYSIS_PROMPT_VERSION,
+                    model_id=OLLAMA_MODEL_ID,
+                    context_text=context_text,
+                )
+                hit = cache.get(cache_key)
+                if hit is not None:
+                    cached.append((img, hit))
+                    continue
+
+            if time.monotonic() - started >= deadline:
+                # This image and everything the iterator still holds go unanalysed
+                unsubmitted = 1 + sum(1 for _ in remaining)
+                break
+            # Each task runs in a copy of the caller's context (metrics labels, profiling)
+            future = pool.submit(
+                contextvars.copy_context().run,
+                _analyze_one,
+                image_bytes=img.data,
+                query=query,
+                context_text=context_text,
+                timeout=timeout,
+                cache=cache,
+                cache_key=cache_key,
+                deadline_at=started + deadline,
+            )
+            submitted.append((img, future))
+
+        futures = [f for _, f in submitted]
+        done, not_done = wait(futures, timeout=max(0.0, deadline - (time.monotonic() - started)))
+    finally:
+        # Drop queued work; in-flight calls finish in the background and are discarded
+        # (calls still waiting for a scheduler slot give up at the deadline).
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    answered = list(cached)
+    answered.extend((img, f.result()) for img, f in submitted if f in done)
+
+    analyses: List[Dict[str, Any]] = []
+    for img, answer in answered:
+        for page_index in img.pages:
+            analyses.append(
+                {
+                    "page_index": page_index,
+                    "analysis": answer,
+                    "image_hash": img.digest[:16],
+                }
+            )
+    # Stable sort keeps the largest-image-first order within a page.
+    analyses.sort(key=lambda a: a["page_index"])
+
+    return BatchResult(
+        analyses=analyses,
+        complete=not not_done and not unsubmitted,
+        skipped=len(not_done) + unsubmitted,
+        image_count=len(submitted) + len(cached) + unsubmitted,
+        cache_hits=len(cached),
+    )
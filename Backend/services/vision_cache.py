@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# Persistent cache of vision answers for document images (shared by all sessions).
+# Set VISION_CACHE_PATH to an empty string to disable.
+_DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "vision_cache.sqlite3"
+)
+VISION_CACHE_PATH = os.getenv("VISION_CACHE_PATH", _DEFAULT_PATH).strip()
+VISION_CACHE_MAX_BYTES = int(os.getenv("VISION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class VisionCache:
+    """
+    SQLite-backed answer cache keyed by (image hash, mode, prompt version, model id).
+
+    - Survives restarts and is shared by every process pointing at the same file.
+    - Size-capped: once stored answers exceed max_bytes, least recently used
+      entries are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int = VISION_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vision_answers ("
+            " key TEXT PRIMARY KEY,"
+            " answer TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS vision_answers_last_used ON vision_answers(last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(
+        *, image_hash: str, mode: str, prompt_version: str, model_id: str, context_text: Optional[str] = None
+    ) -> str:
+        # The reference text is part of the prompt: the same image next to other text is another question
+        context_digest = hashlib.sha256(context_text.encode("utf-8")).hexdigest() if context_text else ""
+        raw = "\x1f".join([image_hash, mode or "", prompt_version, model_id, context_digest])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer FROM vision_answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE vision_answers SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, answer: str) -> None:
+        size = len(answer.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO vision_answers (key, answer, size, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, answer, size, now, now),
+            )
+            self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM vision_answers").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk oldest-first and delete until back under budget.
+        to_free = total - self.max_bytes
+        victims = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM vision_answers ORDER BY last_used ASC"
+        ):
+            victims.append((key,))
+            to_free -= size
+            if to_free <= 0:
+                break
+        self._conn.executemany("DELETE FROM vision_answers WHERE key = ?", victims)
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM vision_answers"
+            ).fetchone()
+        return {
+            "entries": count,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _open_default() -> Optional[VisionCache]:
+    if not VISION_CACHE_PATH:
+        return None
+    try:
+        return VisionCache(VISION_CACHE_PATH)
+    except Exception as e:
+        print(f"Vision cache disabled (cannot open {VISION_CACHE_PATH}): {e}")
+        return None
+
+
+# Global cache (None when disabled or unavailable)
+VISION_CACHE = _open_default()
@@ -0,0 +1,96 @@
+"""
+State for the Vision Tutor "follow my screen" WebSocket.
+
+The client streams low-rate frames of what it shows; FollowState keeps a tiny
+grayscale signature of the last matched view and only re-runs OCR + page
+matching when a new frame differs materially (or the session's documents
+changed). Questions on the socket reuse the warm OCR text (re-packed for the
+query) and the latest frame.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from PIL import Image, ImageChops, ImageStat
+
+from services.context_selector import MatchedPage
+
+# Mean absolute difference (0..1) between frame signatures that counts as a new view
+VISION_FOLLOW_DIFF_THRESHOLD = float(os.getenv("VISION_FOLLOW_DIFF_THRESHOLD", "0.03"))
+# Minimum seconds between two OCR/matching runs (changes in between are matched lazily)
+VISION_FOLLOW_MIN_MATCH_INTERVAL = float(os.getenv("VISION_FOLLOW_MIN_MATCH_INTERVAL", "1.0"))
+VISION_FOLLOW_MAX_FRAME_BYTES = int(os.getenv("VISION_FOLLOW_MAX_FRAME_BYTES", str(4 * 1024 * 1024)))
+
+_SIGNATURE_SIZE = (48, 48)
+
+
+def frame_signature(image_bytes: bytes) -> Image.Image:
+    """
+    48x48 grayscale thumbnail of a frame. JPEG frames are decoded at reduced
+    scale (draft mode), so this costs a few milliseconds even for full-HD frames.
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    img.draft("L", (_SIGNATURE_SIZE[0] * 4, _SIGNATURE_SIZE[1] * 4))
+    return img.convert("L").resize(_SIGNATURE_SIZE, Image.BILINEAR)
+
+
+def signature_diff(a: Image.Image, b: Image.Image) -> float:
+    """Mean absolute pixel difference, 0 (identical) .. 1."""
+    return ImageStat.Stat(ImageChops.difference(a, b)).mean[0] / 255.0
+
+
+@dataclass
+class FollowState:
+    session_id: str
+    selected_doc_ids: List[str] = field(default_factory=list)
+
+    # latest frame received (what a question is asked about)
+    frame: Optional[bytes] = None
+    frame_signature: Optional[Image.Image] = None
+    # signature / session version the current match was built from
+    matched_signature: Optional[Image.Image] = None
+    matched_version: int = -1
+    matched_at: float = 0.0
+    ocr_text: Optional[str] = None
+    matched_pages: List[MatchedPage] = field(default_factory=list)
+
+    frames: int = 0
+    matches: int = 0
+    questions: int = 0
+
+    def observe(self, image_bytes: bytes) -> float:
+        """Record a new frame; returns its difference from the matched view."""
+        signature = frame_signature(image_bytes)
+        self.frames += 1
+        self.frame = image_bytes
+        self.frame_signature = signature
+        if self.matched_signature is None:
+            return 1.0
+        return signature_diff(signature, self.matched_signature)
+
+    def needs_match(self, session_version: int, diff: Optional[float] = None) -> bool:
+        if self.frame is None:
+            return False
+        if self.ocr_text is None or self.matched_version != session_version:
+            return True
+        if diff is None and self.frame_signature is not None and self.matched_signature is not None:
+            diff = signature_diff(self.frame_signature, self.matched_signature)
+        return (diff or 0.0) >= VISION_FOLLOW_DIFF_THRESHOLD
+
+    def match_due(self) -> bool:
+        return time.monotonic() - self.matched_at >= VISION_FOLLOW_MIN_MATCH_INTERVAL
+
+    def remember_match(
+        self, ocr_text: str, matched_pages: List[MatchedPage], session_version: int
+    ) -> None:
+        self.ocr_text = ocr_text
+        self.matched_pages = matched_pages
+        self.matched_signature = self.frame_signature
+        self.matched_version = session_version
+        self.matched_at = time.monotonic()
+        self.matches += 1
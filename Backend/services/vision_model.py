@@ -1,18 +1,25 @@
 from __future__ import annotations
 
 import base64
+import hashlib
 import os
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import requests
 
+from services.image_budget import fit_image_to_budget
+from services.metrics import timed
+from services.model_endpoints import MODEL_ENDPOINTS
+from services.model_scheduler import MODEL_SCHEDULER, PRIORITY_INTERACTIVE
+from services.response_cache import RESPONSE_CACHE, payload_cache_keys
+from services.single_flight import MODEL_CALLS
+
 
 class VisionModelError(RuntimeError):
     pass
 
 
-# Same as your previous project: unified Ollama API endpoint + model id
-OLLAMA_UNIFIED_URL = os.getenv("OLLAMA_UNIFIED_URL", "").strip()
+# Same as your previous project: unified Ollama model id (endpoints: services/model_endpoints.py)
 OLLAMA_MODEL_ID = os.getenv(
     "OLLAMA_MODEL_ID",
     "redule26/huihui_ai_qwen2.5-vl-7b-abliterated",
@@ -31,9 +38,11 @@ SYSTEM_PROTOCOL = (
 )
 
 
+@timed("prompt_build")
 def _image_bytes_to_base64(image_bytes: bytes) -> str:
-    # Keep original quality (accuracy-first). Strip any data-url logic; UploadFile gives raw bytes.
-    return base64.b64encode(image_bytes).decode("utf-8")
+    # Fit to the configured image budget first (small images pass through untouched).
+    # Strip any data-url logic; UploadFile gives raw bytes.
+    return base64.b64encode(fit_image_to_budget(image_bytes)).decode("utf-8")
 
 
 def ask_vision_model(
@@ -42,14 +51,27 @@ def ask_vision_model(
     image_bytes: bytes,
     context_text: Optional[str] = None,
     timeout_seconds: int = 60,
+    priority: int = PRIORITY_INTERACTIVE,
+    conversation_context: Optional[List[int]] = None,
+    keep_alive: Optional[str] = None,
+    queue_timeout: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     Calls the unified Ollama /api/generate endpoint with an image + prompt.
 
-    Returns: {"answer": str, "raw": dict}
+    conversation_context: the `context` token array from a previous answer in
+    the same conversation. The model continues from it (its prompt cache covers
+    the shared prefix), so the system prompt is not re-sent and the response
+    is neither cached nor coalesced.
+
+    queue_timeout: longest wait for a scheduler slot (SchedulerBusyError after);
+    batch callers pass what is left of their deadline.
+
+    Returns: {"answer": str, "raw": dict, "empty": bool}  (raw["context"] continues the
+    conversation; empty=True means the answer is the placeholder for a blank response)
     """
-    if not OLLAMA_UNIFIED_URL:
-        raise VisionModelError("Missing OLLAMA_UNIFIED_URL in environment")
+    if not MODEL_ENDPOINTS.endpoints:
+        raise VisionModelError("Missing OLLAMA_UNIFIED_URL(S) in environment")
 
     if not query or not query.strip():
         raise VisionModelError("Missing query")
@@ -69,7 +91,6 @@ def ask_vision_model(
         "model": OLLAMA_MODEL_ID,
         "prompt": prompt,
         "system": SYSTEM_PROTOCOL,
-        "images": [_image_bytes_to_base64(image_bytes)],
         "stream": False,
         "options": {
             "temperature": 0.3,
@@ -79,9 +100,64 @@ def ask_vision_model(
             "max_tokens": 400,
         },
     }
+    if keep_alive:
+        payload["keep_alive"] = keep_alive
+
+    if conversation_context:
+        # Follow-up turn: continue the stored context (stateful -> no cache / coalescing).
+        payload.pop("system")
+        payload["context"] = list(conversation_context)
+        payload["images"] = [_image_bytes_to_base64(image_bytes)]
+        result = MODEL_SCHEDULER.run(
+            lambda: _post_generate(payload, timeout_seconds, hedge=priority == PRIORITY_INTERACTIVE),
+            priority=priority,
+            queue_timeout=queue_timeout,
+        )
+        result["empty"] = bool(result.get("empty"))
+        return result
+
+    cache = RESPONSE_CACHE
+    cache_keys = payload_cache_keys(payload, image_hash=hashlib.sha256(image_bytes).hexdigest())
+    if cache is not None:
+        cached = cache.get(*cache_keys)
+        if cached is not None:
+            return {**cached, "empty": False}
+
+    def call_model() -> Dict[str, Any]:
+        # Encode only when the model is really called (not on cache hits / coalesced waits).
+        payload["images"] = [_image_bytes_to_base64(image_bytes)]
+        # Waits for a scheduler slot; raises SchedulerBusyError when overloaded.
+        result = MODEL_SCHEDULER.run(
+            # Only interactive calls are worth a hedged duplicate request
+            # (read at run time: an interactive caller may have joined meanwhile).
+            lambda: _post_generate(
+                payload, timeout_seconds, hedge=admission.priority == PRIORITY_INTERACTIVE
+            ),
+            admission=admission,
+        )
+        if cache is not None and not result.get("empty"):
+            cache.put(result, *cache_keys)
+        return result
+
+    # Identical concurrent requests (same image + prompt) share one upstream generation;
+    # a more urgent caller joining a queued call promotes it to its priority / deadline.
+    admission = MODEL_SCHEDULER.admission(priority, queue_timeout)
+    result = dict(
+        MODEL_CALLS.do(
+            f"vision:{cache_keys[0]}",
+            call_model,
+            shared=admission,
+            on_join=lambda leader: MODEL_SCHEDULER.promote(leader, admission),
+        )
+    )
+    result["empty"] = bool(result.get("empty"))
+    return result
+
 
+@timed("model_call")
+def _post_generate(payload: Dict[str, Any], timeout_seconds: int, hedge: bool) -> Dict[str, Any]:
     try:
-        resp = requests.post(OLLAMA_UNIFIED_URL, json=payload, timeout=timeout_seconds)
+        resp = MODEL_ENDPOINTS.post(payload, timeout=timeout_seconds, hedge=hedge)
     except requests.RequestException as e:
         raise VisionModelError(f"Failed to reach vision model: {e}") from e
 
@@ -96,5 +172,6 @@ def ask_vision_model(
     answer = (data.get("response") or "").strip()
     if not answer:
         answer = "I received the screenshot, but the vision model returned an empty response."
+        return {"answer": answer, "raw": data, "empty": True}
 
     return {"answer": answer, "raw": data}
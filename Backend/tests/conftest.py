@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Tests import the backend the way app.py does (services.*, api.*) and never
+# touch the on-disk caches under Backend/.cache.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("VISION_CACHE_PATH", "")
+os.environ.setdefault("PAGE_RENDER_DISK_PATH", "")
+os.environ.setdefault("RESPONSE_CACHE_DISK_PATH", "")
@@ -0,0 +1,43 @@
+import pytest
+
+from services.hash_ring import HashRing
+
+NODES = ["http://a", "http://b", "http://c"]
+KEYS = [f"session-{i}" for i in range(2000)]
+
+
+def test_owner_is_deterministic_and_a_node():
+    ring = HashRing(NODES)
+    again = HashRing(list(reversed(NODES)))
+    for key in KEYS[:200]:
+        assert ring.owner(key) in NODES
+        assert ring.owner(key) == again.owner(key)
+
+
+def test_keys_spread_over_all_nodes():
+    ring = HashRing(NODES)
+    counts = {n: 0 for n in NODES}
+    for key in KEYS:
+        counts[ring.owner(key)] += 1
+    assert min(counts.values()) > len(KEYS) / len(NODES) / 2
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    before = HashRing(NODES)
+    after = HashRing(NODES + ["http://d"])
+    moved = [k for k in KEYS if before.owner(k) != after.owner(k)]
+    assert all(after.owner(k) == "http://d" for k in moved)
+    assert len(moved) < len(KEYS) / 2
+
+
+def test_removing_a_node_only_moves_its_keys():
+    before = HashRing(NODES)
+    after = HashRing(NODES[:2])
+    for key in KEYS:
+        if before.owner(key) != NODES[2]:
+            assert after.owner(key) == before.owner(key)
+
+
+def test_empty_ring_is_rejected():
+    with pytest.raises(ValueError):
+        HashRing([])
@@ -0,0 +1,52 @@
+import io
+import os
+
+from PIL import Image
+
+from services.image_budget import ImageBudget, fit_image_to_budget
+
+
+def _encode(img: Image.Image, fmt: str) -> bytes:
+    out = io.BytesIO()
+    img.save(out, format=fmt)
+    return out.getvalue()
+
+
+def _noise(size, mode="RGB") -> Image.Image:
+    # Random pixels do not compress, so re-encoding is never skipped as "not smaller"
+    bands = len(mode)
+    return Image.frombytes(mode, size, os.urandom(size[0] * size[1] * bands))
+
+
+def test_small_image_is_returned_untouched():
+    data = _encode(Image.new("RGB", (64, 48), "white"), "PNG")
+    assert fit_image_to_budget(data, ImageBudget()) is data
+
+
+def test_disabled_budget_and_undecodable_bytes_pass_through():
+    big = _encode(_noise((400, 400)), "PNG")
+    assert fit_image_to_budget(big, ImageBudget(enabled=False, max_pixels=1000)) is big
+    junk = b"not an image" * 100
+    assert fit_image_to_budget(junk, ImageBudget(fast_path_bytes=0)) is junk
+
+
+def test_large_image_is_downscaled_to_the_pixel_budget():
+    data = _encode(_noise((1000, 500)), "PNG")
+    out = fit_image_to_budget(data, ImageBudget(max_pixels=50_000))
+
+    img = Image.open(io.BytesIO(out))
+    assert img.format == "JPEG"
+    assert img.width * img.height <= 50_000
+    assert abs(img.width / img.height - 2.0) < 0.05
+
+
+def test_rgba_is_flattened_onto_white_for_jpeg():
+    rgba = _noise((300, 300), "RGBA")
+    rgba.putalpha(0)  # fully transparent -> white after flattening
+    data = _encode(rgba, "PNG")
+    out = fit_image_to_budget(data, ImageBudget(max_pixels=40_000, fast_path_bytes=0))
+
+    img = Image.open(io.BytesIO(out))
+    assert img.format == "JPEG"
+    assert img.mode == "RGB"
+    assert min(img.convert("L").getextrema()) > 240
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from benchmarks.mock_ollama import MockOllamaServer
+from services.model_endpoints import EndpointPool, NoEndpointAvailableError
+from services.model_scheduler import ModelScheduler
+
+PAYLOAD = {"model": "mock", "prompt": "Explain photosynthesis", "stream": False}
+
+
+@pytest.fixture
+def replicas():
+    servers = [MockOllamaServer().start(), MockOllamaServer().start()]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def _wait_until(predicate):
+    deadline = time.monotonic() + 5
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def _breakers(pool):
+    return [e["breaker"] for e in pool.stats()["endpoints"]]
+
+
+def test_least_outstanding_endpoint_is_picked(replicas):
+    a, b = replicas
+    pool = EndpointPool([a.url, b.url], health_interval=0)
+    busy = pool._acquire()  # a call in flight on the first replica
+
+    assert pool.post(PAYLOAD, timeout=5).status_code == 200
+    assert (a.request_count, b.request_count) == (0, 1)
+
+    pool._release(busy, True, 0.01)
+    pool.post(PAYLOAD, timeout=5)
+    assert (a.request_count, b.request_count) == (1, 1)
+
+
+def test_breaker_opens_then_half_opens_then_closes(replicas):
+    a, _ = replicas
+    pool = EndpointPool([a.url], health_interval=0, failure_threshold=2, open_seconds=0.2)
+    a.error_status = 500
+    for _ in range(2):
+        assert pool.post(PAYLOAD, timeout=5).status_code == 500
+    assert _breakers(pool) == ["open"]
+    with pytest.raises(NoEndpointAvailableError):
+        pool.post(PAYLOAD, timeout=5)
+
+    time.sleep(0.25)
+    a.error_status = None
+    a.latency_seconds = 0.3
+    trial = threading.Thread(target=pool.post, args=(PAYLOAD,), kwargs={"timeout": 5})
+    trial.start()
+    _wait_until(lambda: a.request_count == 3)
+    assert _breakers(pool) == ["half_open"]
+    with pytest.raises(NoEndpointAvailableError):
+        pool.post(PAYLOAD, timeout=5)  # one trial at a time
+
+    trial.join(5)
+    assert _breakers(pool) == ["closed"]
+
+
+def test_hedge_wins_over_a_slow_primary(replicas):
+    a, b = replicas
+    a.latency_seconds = 0.5
+    scheduler = ModelScheduler(max_concurrency=2)
+    pool = EndpointPool(
+        [a.url, b.url], health_interval=0, hedge_enabled=True, hedge_min_samples=1, scheduler=scheduler
+    )
+    pool._latencies.append(0.05)
+
+    started = time.monotonic()
+    resp = scheduler.run(lambda: pool.post(PAYLOAD, timeout=5, hedge=True))
+    assert resp.status_code == 200
+    assert time.monotonic() - started < 0.4
+    assert (pool.hedges_sent, pool.hedges_won, pool.hedges_skipped) == (1, 1, 0)
+    assert b.request_count == 1
+
+    # The hedge's slot is returned once the duplicate finishes
+    _wait_until(lambda: scheduler.stats()["active"] == 0)
+    assert scheduler.stats()["active"] == 0
+    pool.close()
+
+
+def test_hedge_is_skipped_without_a_free_scheduler_slot(replicas):
+    a, b = replicas
+    a.latency_seconds = 0.2
+    scheduler = ModelScheduler(max_concurrency=1)
+    pool = EndpointPool(
+        [a.url, b.url], health_interval=0, hedge_enabled=True, hedge_min_samples=1, scheduler=scheduler
+    )
+    pool._latencies.append(0.05)
+
+    resp = scheduler.run(lambda: pool.post(PAYLOAD, timeout=5, hedge=True))
+    assert resp.status_code == 200
+    assert (pool.hedges_sent, pool.hedges_skipped) == (0, 1)
+    assert (a.request_count, b.request_count) == (1, 0)
+    pool.close()
@@ -0,0 +1,155 @@
+import threading
+import time
+
+import pytest
+
+from services.model_scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE, ModelScheduler, SchedulerBusyError
+from services.single_flight import SingleFlight
+
+
+def _occupy(scheduler, release: threading.Event) -> threading.Thread:
+    """Hold the only slot until `release` is set."""
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    thread = threading.Thread(target=scheduler.run, args=(hold,))
+    thread.start()
+    started.wait(5)
+    return thread
+
+
+def _wait_queued(scheduler, depth):
+    deadline = time.monotonic() + 5
+    while scheduler.stats()["queue_depth"] < depth and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_interactive_calls_run_before_queued_bulk_calls():
+    scheduler = ModelScheduler(max_concurrency=1, max_queue=8, queue_timeout=5)
+    release = threading.Event()
+    holder = _occupy(scheduler, release)
+    order = []
+
+    def submit(name, priority):
+        thread = threading.Thread(target=scheduler.run, args=(lambda: order.append(name),), kwargs={"priority": priority})
+        thread.start()
+        return thread
+
+    threads = [submit("bulk1", PRIORITY_BULK)]
+    _wait_queued(scheduler, 1)
+    threads.append(submit("bulk2", PRIORITY_BULK))
+    _wait_queued(scheduler, 2)
+    threads.append(submit("interactive", PRIORITY_INTERACTIVE))
+    _wait_queued(scheduler, 3)
+
+    release.set()
+    for thread in [holder, *threads]:
+        thread.join(5)
+    assert order == ["interactive", "bulk1", "bulk2"]
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    scheduler = ModelScheduler(max_concurrency=1, max_queue=1, queue_timeout=5)
+    release = threading.Event()
+    holder = _occupy(scheduler, release)
+    waiter = threading.Thread(target=scheduler.run, args=(lambda: None,), kwargs={"priority": PRIORITY_BULK})
+    waiter.start()
+    _wait_queued(scheduler, 1)
+
+    with pytest.raises(SchedulerBusyError) as e:
+        scheduler.run(lambda: None, priority=PRIORITY_BULK)
+    assert e.value.retry_after >= 1
+    # The limit is per priority class: an interactive call may still queue
+    interactive = threading.Thread(target=scheduler.run, args=(lambda: None,))
+    interactive.start()
+    _wait_queued(scheduler, 2)
+
+    release.set()
+    for thread in (holder, waiter, interactive):
+        thread.join(5)
+    assert scheduler.stats()["classes"]["bulk"]["rejected"] == 1
+
+
+def test_queue_timeout_and_spent_budget():
+    scheduler = ModelScheduler(max_concurrency=1, max_queue=4, queue_timeout=5)
+    release = threading.Event()
+    holder = _occupy(scheduler, release)
+
+    started = time.monotonic()
+    with pytest.raises(SchedulerBusyError):
+        scheduler.run(lambda: None, queue_timeout=0.1)
+    assert time.monotonic() - started < 1
+
+    release.set()
+    holder.join(5)
+    # A spent budget never takes a slot, even when one is free
+    with pytest.raises(SchedulerBusyError):
+        scheduler.run(lambda: None, queue_timeout=0)
+    assert scheduler.run(lambda: 42) == 42
+    assert scheduler.stats()["active"] == 0
+
+
+def test_promoted_call_keeps_its_place_in_the_interactive_class():
+    scheduler = ModelScheduler(max_concurrency=1, max_queue=8, queue_timeout=5)
+    release = threading.Event()
+    holder = _occupy(scheduler, release)
+    order = []
+    promoted = scheduler.admission(PRIORITY_BULK)
+
+    def submit(name, **kwargs):
+        thread = threading.Thread(target=scheduler.run, args=(lambda: order.append(name),), kwargs=kwargs)
+        thread.start()
+        return thread
+
+    threads = [submit("bulk1", admission=promoted)]
+    _wait_queued(scheduler, 1)
+    threads.append(submit("bulk2", priority=PRIORITY_BULK))
+    _wait_queued(scheduler, 2)
+    threads.append(submit("interactive", priority=PRIORITY_INTERACTIVE))
+    _wait_queued(scheduler, 3)
+    scheduler.promote(promoted, scheduler.admission(PRIORITY_INTERACTIVE))
+    assert scheduler.stats()["classes"]["interactive"]["queued"] == 2
+
+    release.set()
+    for thread in [holder, *threads]:
+        thread.join(5)
+    assert order == ["bulk1", "interactive", "bulk2"]
+    assert scheduler.stats()["classes"]["bulk"]["queued"] == 0
+
+
+def test_coalesced_interactive_caller_promotes_the_queued_leader():
+    scheduler = ModelScheduler(max_concurrency=1, max_queue=8, queue_timeout=5)
+    flights = SingleFlight()
+    release = threading.Event()
+    holder = _occupy(scheduler, release)
+    results = {}
+
+    def call(name, priority, queue_timeout):
+        admission = scheduler.admission(priority, queue_timeout)
+        try:
+            results[name] = flights.do(
+                "same-prompt",
+                lambda: scheduler.run(lambda: "answer", admission=admission),
+                shared=admission,
+                on_join=lambda leader: scheduler.promote(leader, admission),
+            )
+        except SchedulerBusyError:
+            results[name] = "busy"
+
+    leader = threading.Thread(target=call, args=("bulk", PRIORITY_BULK, 5))
+    leader.start()
+    _wait_queued(scheduler, 1)
+
+    started = time.monotonic()
+    call("interactive", PRIORITY_INTERACTIVE, 0.1)
+    # The shorter interactive budget now bounds the shared wait
+    assert time.monotonic() - started < 1
+    leader.join(5)
+    assert results == {"bulk": "busy", "interactive": "busy"}
+    assert scheduler.stats()["classes"]["interactive"]["rejected"] == 1
+
+    release.set()
+    holder.join(5)
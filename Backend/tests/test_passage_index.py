@@ -0,0 +1,41 @@
+from services.passage_index import PassageIndex, index_terms
+from services.session_store import PageData
+
+PAGES = [
+    PageData(index=0, text="Introduction to AI. Machine learning builds models from data."),
+    PageData(index=1, text="Entropy measures disorder. The second law says entropy of an isolated system grows."),
+    PageData(index=2, text="Graphs have vertices and edges. Trees are connected graphs without cycles."),
+]
+
+
+def test_index_terms_drop_stopwords_but_keep_acronyms():
+    assert index_terms("What is AI?") == ["ai"]
+    assert index_terms("the entropy of a GAS") == ["entropy", "gas"]
+
+
+def test_search_ranks_the_matching_page_first():
+    hits = PassageIndex.build(PAGES).search("what does entropy measure", top_k=2)
+    assert hits[0].page_index == 1
+    text = hits[0].text
+    assert [text[s:e].lower() for s, e in hits[0].highlights] == ["entropy", "entropy"]
+
+
+def test_search_finds_acronym_questions():
+    hits = PassageIndex.build(PAGES).search("what is AI")
+    assert [h.page_index for h in hits] == [0]
+
+
+def test_search_without_known_terms_is_empty():
+    index = PassageIndex.build(PAGES)
+    assert index.search("the and of") == []
+    assert index.search("quantum chromodynamics") == []
+
+
+def test_long_pages_yield_one_hit_per_page_by_default():
+    long_page = PageData(index=0, text=" ".join(["entropy rises in closed systems."] * 200))
+    index = PassageIndex.build([long_page], window=200, stride=100)
+    assert len(index.passages) > 10
+    assert len(index.search("entropy", top_k=5)) == 1
+    assert len(index.search("entropy", top_k=5, per_page=3)) == 3
+    for passage in index.passages:
+        assert len(index.passage_text(passage)) <= 200
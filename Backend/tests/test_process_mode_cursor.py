@@ -0,0 +1,17 @@
+import pytest
+from fastapi import HTTPException
+
+from api.modes_api import _decode_cursor, _encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = _encode_cursor(7, 2, 35)
+    assert "=" not in cursor
+    assert _decode_cursor(cursor) == (7, 2, 35)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", _encode_cursor(1, -1, 0), "WzEsMl0"])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        _decode_cursor(cursor)
+    assert e.value.status_code == 400
@@ -0,0 +1,41 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import create_app
+from services.session_store import SESSION_STORE, PageData
+
+
+@pytest.fixture
+def client():
+    SESSION_STORE.delete("pmv")
+    SESSION_STORE.upsert_document("pmv", "pmv:notes.txt", "notes.txt", "txt", [PageData(index=0, text="Cells divide.")])
+    yield TestClient(create_app())
+    SESSION_STORE.delete("pmv")
+
+
+def test_unknown_doc_ids_are_a_400(client):
+    r = client.post(
+        "/modes/process-mode-with-vision",
+        data={"mode": "revision", "session_id": "pmv", "doc_ids": ["pmv:notes.txt", "pmv:gone.pdf"]},
+    )
+    assert r.status_code == 400
+    assert "pmv:gone.pdf" in r.json()["detail"]
+    assert "pmv:notes.txt" not in r.json()["detail"]
+
+
+def test_files_and_doc_ids_together_are_a_400(client):
+    r = client.post(
+        "/modes/process-mode-with-vision",
+        data={"mode": "revision", "session_id": "pmv", "doc_ids": ["pmv:notes.txt"]},
+        files={"files": ("other.txt", b"Other text.", "text/plain")},
+    )
+    assert r.status_code == 400
+
+
+def test_known_doc_ids_are_processed(client):
+    r = client.post(
+        "/modes/process-mode-with-vision",
+        data={"mode": "revision", "session_id": "pmv", "doc_ids": ["pmv:notes.txt"]},
+    )
+    assert r.status_code == 200
+    assert [d["filename"] for d in r.json()["results"]] == ["notes.txt"]
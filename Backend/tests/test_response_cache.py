@@ -0,0 +1,56 @@
+import services.response_cache as response_cache
+from services.response_cache import ResponseCache, payload_cache_keys
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(response_cache.time, "time", clock)
+    cache = ResponseCache(max_entries=10, ttl_seconds=60)
+
+    cache.put({"answer": "a"}, "k")
+    clock.now += 59
+    assert cache.get("k") == {"answer": "a"}
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.put(1, "a")
+    cache.put(2, "b")
+    assert cache.get("a") == 1  # b is now the oldest
+    cache.put(3, "c")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_lookup_falls_back_to_normalized_prompt():
+    cache = ResponseCache()
+    payload = {"model": "m", "prompt": "What is recursion?", "options": {}}
+    exact, normalized = payload_cache_keys(payload)
+    cache.put({"answer": "r"}, exact, normalized)
+
+    other_exact, other_normalized = payload_cache_keys({**payload, "prompt": "  what is RECURSION "})
+    assert other_exact != exact
+    assert cache.get(other_exact, other_normalized) == {"answer": "r"}
+    assert cache.get(*payload_cache_keys(payload, image_hash="img")) is None
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    ResponseCache(disk_path=path).put({"answer": "kept"}, "k")
+
+    fresh = ResponseCache(disk_path=path)
+    assert fresh.get("k") == {"answer": "kept"}
+    assert fresh.stats()["disk_hits"] == 1
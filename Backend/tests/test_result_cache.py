@@ -0,0 +1,76 @@
+from services.result_cache import RESULT_CACHE, ResultCache, result_key
+from services.session_store import PageData, SessionStore
+
+
+def test_result_key_normalizes_question_only():
+    assert result_key("s", 1, "ask", question="What is AI?") == result_key("s", 1, "ask", question="what is ai")
+    assert result_key("s", 1, "ask", doc_id="s:Notes.pdf") != result_key("s", 1, "ask", doc_id="s:notes.pdf")
+    assert result_key("s", 1, "ask", mode="Revision") != result_key("s", 1, "ask", mode="revision")
+
+
+def test_result_key_includes_session_version_and_endpoint():
+    base = result_key("s", 1, "ask", question="q")
+    assert base != result_key("s", 2, "ask", question="q")
+    assert base != result_key("t", 1, "ask", question="q")
+    assert base != result_key("s", 1, "summarize", question="q")
+    assert result_key("s", 1, "summarize", max_items=6, doc_id=None) == result_key(
+        "s", 1, "summarize", doc_id=None, max_items=6
+    )
+
+
+def test_result_cache_evicts_lru_within_byte_budget():
+    cache = ResultCache(max_bytes=60)
+    cache.put(("a", 1, "ask", "1"), "x" * 20)
+    cache.put(("b", 1, "ask", "1"), "y" * 20)
+    assert cache.get(("a", 1, "ask", "1")) is not None  # a is now most recent
+    cache.put(("c", 1, "ask", "1"), "z" * 20)
+
+    assert cache.get(("b", 1, "ask", "1")) is None
+    assert cache.get(("a", 1, "ask", "1")) == "x" * 20
+    assert cache.bytes_used <= 60
+    assert sum(cache.session_bytes().values()) == cache.bytes_used
+
+
+def test_result_cache_drop_session():
+    cache = ResultCache()
+    cache.put(("a", 1, "ask", "1"), {"answer": 1})
+    cache.put(("a", 2, "summarize", "1"), {"answer": 2})
+    cache.put(("b", 1, "ask", "1"), {"answer": 3})
+
+    assert cache.drop_session("a") == 2
+    assert cache.get(("a", 1, "ask", "1")) is None
+    assert cache.get(("b", 1, "ask", "1")) == {"answer": 3}
+    assert set(cache.session_bytes()) == {"b"}
+
+
+def _store_with_result(session_id):
+    store = SessionStore(ttl_seconds=60)
+    store.upsert_document(session_id, f"{session_id}:a.txt", "a.txt", "txt", [PageData(index=0, text="Text.")])
+    key = result_key(session_id, store.get(session_id).version, "ask", question="q")
+    RESULT_CACHE.put(key, {"answer": 1})
+    return store, key
+
+
+def test_expired_and_deleted_sessions_drop_their_results():
+    store, key = _store_with_result("rc-expire")
+    store.ttl_seconds = -1
+    assert store.cleanup_expired() == 1
+    assert RESULT_CACHE.get(key) is None
+
+    store, key = _store_with_result("rc-delete")
+    assert store.delete("rc-delete")
+    assert RESULT_CACHE.get(key) is None
+
+
+def test_upsert_drops_results_of_the_previous_documents():
+    store, key = _store_with_result("rc-upsert")
+    store.upsert_document("rc-upsert", "rc-upsert:b.txt", "b.txt", "txt", [PageData(index=0, text="More.")])
+    assert RESULT_CACHE.get(key) is None
+    assert store.get("rc-upsert").version == key[1] + 1
+
+
+def test_recreated_session_does_not_reuse_versions():
+    store, key = _store_with_result("rc-recreate")
+    store.delete("rc-recreate")
+    store.upsert_document("rc-recreate", "rc-recreate:a.txt", "a.txt", "txt", [PageData(index=0, text="Text.")])
+    assert store.get("rc-recreate").version > key[1]
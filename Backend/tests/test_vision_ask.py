@@ -0,0 +1,23 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import create_app
+from services.session_store import SESSION_STORE, PageData
+
+
+@pytest.fixture
+def client():
+    SESSION_STORE.delete("va")
+    for name in ("a.txt", "b.txt"):
+        SESSION_STORE.upsert_document("va", f"va:{name}", name, "txt", [PageData(index=0, text="Cells divide.")])
+    yield TestClient(create_app())
+    SESSION_STORE.delete("va")
+
+
+def test_page_reference_must_be_a_selected_document(client):
+    r = client.post(
+        "/vision/session/va/ask",
+        data={"query": "Explain", "selected_doc_ids": ["va:a.txt"], "doc_id": "va:b.txt", "page_index": 0},
+    )
+    assert r.status_code == 400
+    assert "selected" in r.json()["detail"]
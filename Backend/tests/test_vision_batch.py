@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+import services.vision_batch as vision_batch
+from services.pdf_images import ExtractedImage
+from services.vision_cache import VisionCache
+
+
+def _images(n):
+    return [ExtractedImage(data=b"img%d" % i, digest=f"digest{i}", pages=[i]) for i in range(n)]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Stand-in for ask_vision_model; tests set .delay / .answer / .error per call."""
+
+    class FakeModel:
+        delay = 0.0
+        answer = "analysis"
+        empty = False
+        error = None
+        calls = 0
+
+        def __call__(self, **kwargs):
+            self.calls += 1
+            if self.error is not None:
+                raise self.error
+            time.sleep(self.delay)
+            return {"answer": self.answer, "raw": {}, "empty": self.empty}
+
+    fake = FakeModel()
+    monkeypatch.setattr(vision_batch, "ask_vision_model", fake)
+    monkeypatch.setattr(vision_batch, "VISION_CACHE", None)
+    return fake
+
+
+def test_all_images_analysed(model):
+    result = vision_batch.analyze_images(_images(3), mode="revision", deadline_seconds=10)
+    assert result.complete
+    assert (result.image_count, result.skipped, result.cache_hits) == (3, 0, 0)
+    assert [a["page_index"] for a in result.analyses] == [0, 1, 2]
+
+
+def test_unexpected_error_is_a_failed_analysis(model):
+    model.error = KeyError("boom")
+    result = vision_batch.analyze_images(_images(2), mode="revision", deadline_seconds=10)
+    assert result.complete
+    assert all(a["analysis"].startswith("Vision analysis unavailable") for a in result.analyses)
+
+
+def test_deadline_counts_unsubmitted_images(model):
+    result = vision_batch.analyze_images(iter(_images(5)), mode="revision", deadline_seconds=0)
+    assert not result.complete
+    assert result.image_count == 5
+    assert result.skipped == 5
+    assert result.analyses == []
+    assert model.calls == 0
+
+
+def test_deadline_counts_unfinished_calls(model):
+    model.delay = 0.5
+    result = vision_batch.analyze_images(_images(2), mode="revision", deadline_seconds=0.1, max_concurrency=2)
+    assert not result.complete
+    assert (result.image_count, result.skipped) == (2, 2)
+
+
+def test_deadline_during_lazy_extraction(model):
+    def slow_images():
+        for img in _images(4):
+            yield img
+            time.sleep(0.1)
+
+    result = vision_batch.analyze_images(slow_images(), mode="revision", deadline_seconds=0.15)
+    assert not result.complete
+    assert result.image_count == 4
+    assert result.skipped == 4 - len(result.analyses)
+    assert 0 < len(result.analyses) < 4
+
+
+def test_cache_hits_and_empty_answers_not_cached(model, monkeypatch, tmp_path):
+    cache = VisionCache(str(tmp_path / "vision.sqlite3"))
+    monkeypatch.setattr(vision_batch, "VISION_CACHE", cache)
+
+    model.empty = True
+    vision_batch.analyze_images(_images(1), mode="revision", deadline_seconds=10)
+    assert cache.stats()["entries"] == 0
+
+    model.empty = False
+    vision_batch.analyze_images(_images(1), mode="revision", deadline_seconds=10)
+    again = vision_batch.analyze_images(_images(1), mode="revision", deadline_seconds=10)
+    assert again.cache_hits == 1
+    assert model.calls == 2
+
+
+def test_tasks_keep_the_callers_context(model, monkeypatch):
+    from services import metrics
+
+    seen = []
+
+    def record(**kwargs):
+        seen.append(metrics._labels.get().endpoint)
+        return {"answer": "analysis", "raw": {}, "empty": False}
+
+    monkeypatch.setattr(vision_batch, "ask_vision_model", record)
+    token = metrics._labels.set(metrics._RequestLabels("/modes/process-mode-with-vision"))
+    try:
+        vision_batch.analyze_images(_images(2), mode="revision", deadline_seconds=10)
+    finally:
+        metrics._labels.reset(token)
+    assert seen == ["/modes/process-mode-with-vision"] * 2
@@ -111,6 +111,8 @@ export const LearningModes = () => {
             const formData = new FormData();
             formData.append('mode', modeId);
             formData.append('session_id', sessionId);
+            // Only the explanations are rendered; skip per-page text
+            formData.append('fields', 'explanation');
             
             console.log('Calling API:', `${API_BASE}/modes/process-mode`);
 
@@ -72,3 +72,30 @@ export async function askVisionTutor({ query, imageBlob, selectedDocIds }) {
   }
   return res.json();
 }
+
+// "Follow my screen": stream low-rate frames over one WebSocket; the backend
+// only re-runs OCR/page matching when the view changes, and questions reuse it.
+export function openVisionFollow({ selectedDocIds, onMessage }) {
+  const sessionId = getOrCreateSessionId();
+  const wsUrl = DEFAULT_BASE_URL.replace(/^http/, "ws");
+  const socket = new WebSocket(
+    `${wsUrl}/vision/session/${encodeURIComponent(sessionId)}/follow`
+  );
+
+  socket.onopen = () => {
+    socket.send(JSON.stringify({ type: "select", doc_ids: selectedDocIds }));
+  };
+  socket.onmessage = (event) => onMessage?.(JSON.parse(event.data));
+
+  return {
+    socket,
+    sendFrame: (frameBlob) => {
+      if (socket.readyState === WebSocket.OPEN) socket.send(frameBlob);
+    },
+    select: (docIds) =>
+      socket.send(JSON.stringify({ type: "select", doc_ids: docIds })),
+    ask: (query, conversation = false) =>
+      socket.send(JSON.stringify({ type: "ask", query, conversation })),
+    close: () => socket.close(),
+  };
+}